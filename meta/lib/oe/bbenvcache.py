@@ -0,0 +1,198 @@
+#
+# Cache of parsed "bitbake -e" output
+#
+# Running "bitbake -e [target]" parses the whole configuration (and the
+# recipe) and prints megabytes of text, which callers such as wic and the
+# oeqa get_bb_vars() helper then scan for a handful of variables. Both
+# tend to ask for the same environment over and over. This stores the
+# parsed variables under a key derived from the target, the postconfig
+# text and the build directory, together with the mtime and size of every
+# file the include and variable history of the output names, and of the
+# directories holding them. The directories the BBFILES globs of the
+# layers walk through are recorded as well, so that a recipe or bbappend
+# added in a directory nothing was parsed from before is noticed. An entry
+# is only used while all of those are unchanged and the environment
+# variables bitbake passes through still have the same values, so editing
+# local.conf, a recipe or a class, or adding a file next to one of them,
+# invalidates it.
+#
+# Setting OE_BBENV_NOCACHE in the environment disables the cache.
+#
+
+import glob
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+VERSION = 3
+
+_var_re = re.compile(r'^(export )?(?P<var>[\w\-+./~]+(_.*)?)="(?P<value>.*)"$')
+_unset_re = re.compile(r'^unset (?P<var>\w+)$')
+# "# /path/to/file.conf" and "# /path/to/bitbake.conf includes:" lines of
+# the include history, and "#   set /path/to/file.conf:12" lines of the
+# variable history
+_include_re = re.compile(r'^#\s+(/\S+?)(?: includes:)?$')
+_history_re = re.compile(r'^#\s+\S+\s+(/[^\s:]+):\d+')
+
+# Passed through from the environment whatever BB_ENV_EXTRAWHITE says
+_ENV_ALWAYS = ["BBPATH", "BB_ENV_EXTRAWHITE", "BB_PRESERVE_ENV",
+               "BB_ENV_WHITELIST", "BUILDDIR"]
+
+def cache_dir():
+    """
+    Return the default cache directory, in the build directory, or None if
+    the cache is disabled
+    """
+    builddir = os.environ.get("BUILDDIR")
+    if not builddir or os.environ.get("OE_BBENV_NOCACHE"):
+        return None
+    return os.path.join(builddir, "cache", "bbenv")
+
+def parse(bbenv):
+    """
+    Parse "bitbake -e" output into a dictionary of variable values, and
+    return it with the set of files the output says were parsed.
+    Exported variables are included; unexported ones are taken from the
+    variable history. The first assignment of a variable with a non-empty
+    value wins, later ones being lines of function bodies; a variable is
+    only given an empty value if it has no other.
+    """
+    values = {}
+    files = set()
+    lastline = ""
+    for line in bbenv.splitlines():
+        if line.startswith("#"):
+            match = _history_re.match(line) or _include_re.match(line)
+            if match:
+                files.add(match.group(1))
+            lastline = line
+            continue
+        val = None
+        match = _var_re.match(line)
+        if match:
+            val = match.group("value")
+        else:
+            match = _unset_re.match(line)
+            # Handle [unexport] variables
+            if match and lastline.startswith('#   "'):
+                val = lastline.split('"')[1]
+        if val is not None and not values.get(match.group("var")):
+            values[match.group("var")] = val
+        lastline = line
+    return values, files
+
+def _key(target, postconfig):
+    data = json.dumps([VERSION, target or "", postconfig or "", os.getcwd()])
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+def _bbfiles_dirs(bbfiles):
+    """
+    Return the directories the BBFILES globs go through: for
+    "/layer/recipes-*/*/*.bb", /layer, the recipes-* directories in it and
+    the directories in those. A recipe or bbappend can't appear without
+    changing the mtime of one of them.
+    """
+    dirs = set()
+    for pattern in bbfiles.split():
+        parts = pattern.split(os.sep)
+        wild = [i for i, part in enumerate(parts) if glob.has_magic(part)]
+        start = wild[0] if wild else len(parts) - 1
+        for i in range(start, len(parts)):
+            prefix = os.sep.join(parts[:i]) or (os.sep if i else os.curdir)
+            if glob.has_magic(prefix):
+                dirs.update(d for d in glob.glob(prefix) if os.path.isdir(d))
+            else:
+                dirs.add(prefix)
+    return dirs
+
+def _passthrough(values):
+    names = set(_ENV_ALWAYS)
+    names.update(values.get("BB_ENV_EXTRAWHITE", "").split())
+    return {name: os.environ.get(name) for name in sorted(names)}
+
+def load(target=None, postconfig=None, cachedir=None):
+    """
+    Return the cached variables of "bitbake -e [target]" run with
+    postconfig, or None if there is no valid entry.
+    """
+    cachedir = cachedir or cache_dir()
+    if not cachedir:
+        return None
+    try:
+        with open(os.path.join(cachedir, _key(target, postconfig))) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if entry.get("version") != VERSION:
+        return None
+    for path, stamp in entry["deps"].items():
+        if _stat(path) != stamp:
+            return None
+    if _passthrough(entry["vars"]) != entry["env"]:
+        return None
+    return entry["vars"]
+
+def store(target, postconfig, bbenv, cachedir=None):
+    """
+    Parse the output of "bitbake -e [target]" run with postconfig, cache
+    the result and return the variables.
+    """
+    values, files = parse(bbenv)
+    cachedir = cachedir or cache_dir()
+    if not cachedir:
+        return values
+
+    deps = {}
+    for path in files:
+        stamp = _stat(path)
+        if stamp:
+            deps[path] = stamp
+            # A file appearing next to one that was parsed, e.g. an
+            # include which didn't exist before, invalidates the entry
+            dirname = os.path.dirname(path)
+            if dirname not in deps:
+                deps[dirname] = _stat(dirname)
+    # The build's conf directory, where files such as auto.conf are picked
+    # up from if they appear
+    confdir = os.path.join(os.getcwd(), "conf")
+    if os.path.isdir(confdir):
+        deps[confdir] = _stat(confdir)
+    # Recipes and bbappends in directories nothing was parsed from yet
+    for dirname in _bbfiles_dirs(values.get("BBFILES", "")):
+        if dirname not in deps:
+            deps[dirname] = _stat(dirname)
+
+    entry = {"version": VERSION, "target": target, "deps": deps,
+             "env": _passthrough(values), "vars": values}
+    tmpname = None
+    try:
+        os.makedirs(cachedir, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=cachedir, prefix=".tmp",
+                                         delete=False) as f:
+            tmpname = f.name
+            json.dump(entry, f, separators=(",", ":"))
+        os.rename(tmpname, os.path.join(cachedir, _key(target, postconfig)))
+    except OSError:
+        if tmpname and os.path.exists(tmpname):
+            os.unlink(tmpname)
+    return values
+
+def invalidate(cachedir=None):
+    """Remove all cached entries"""
+    cachedir = cachedir or cache_dir()
+    if not cachedir or not os.path.isdir(cachedir):
+        return
+    for name in os.listdir(cachedir):
+        try:
+            os.unlink(os.path.join(cachedir, name))
+        except OSError:
+            pass
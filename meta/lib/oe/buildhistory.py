@@ -0,0 +1,114 @@
+#
+# Helpers for writing buildhistory data
+#
+# The package file listings used to be produced by running
+# "find | sort | sed" under pseudo once per package. list_files() produces
+# the same output from a single directory walk, and main() lets the
+# buildhistory class list all of a recipe's packages from one python
+# process run under pseudo, so ownership matches what ends up in the
+# packages. Files are only rewritten when their content changes, which
+# keeps unchanged history cheap to write and to commit.
+#
+
+import os
+import stat
+import sys
+
+def _sortkey_func():
+    # Sort the way "sort -k5" did under the build's locale
+    import locale
+    try:
+        locale.setlocale(locale.LC_COLLATE, '')
+        return locale.strxfrm
+    except locale.Error:
+        return str
+
+def _walk(path):
+    with os.scandir(path) as it:
+        entries = sorted(it, key=lambda e: e.name)
+    for entry in entries:
+        yield entry
+        if entry.is_dir(follow_symlinks=False):
+            yield from _walk(entry.path)
+
+def list_files(rootdir):
+    """
+    Return the listing of the files under rootdir in the format used by
+    files-in-package.txt, i.e. that of
+    find . ! -path . -printf "%M %-10u %-10g %10s %p -> %l\\n" | sort -k5 | sed 's/ * -> $//'
+    """
+    import grp
+    import pwd
+    import re
+
+    users = {}
+    groups = {}
+    def username(uid):
+        if uid not in users:
+            try:
+                users[uid] = pwd.getpwuid(uid).pw_name
+            except KeyError:
+                users[uid] = str(uid)
+        return users[uid]
+    def groupname(gid):
+        if gid not in groups:
+            try:
+                groups[gid] = grp.getgrgid(gid).gr_name
+            except KeyError:
+                groups[gid] = str(gid)
+        return groups[gid]
+
+    lines = []
+    for entry in _walk(rootdir):
+        st = entry.stat(follow_symlinks=False)
+        target = ''
+        if stat.S_ISLNK(st.st_mode):
+            target = os.readlink(entry.path)
+        relpath = './' + os.path.relpath(entry.path, rootdir)
+        prefix = '%s %-10s %-10s %10d' % (stat.filemode(st.st_mode), username(st.st_uid), groupname(st.st_gid), st.st_size)
+        lines.append((prefix, ' %s -> %s' % (relpath, target)))
+
+    strxfrm = _sortkey_func()
+    lines.sort(key=lambda l: (strxfrm(l[1]), strxfrm(l[0] + l[1]), l[0] + l[1]))
+    strip_re = re.compile(' * -> $')
+    return ''.join(strip_re.sub('', prefix + rest) + '\n' for prefix, rest in lines)
+
+def write_if_changed(path, content):
+    """Write content to path unless it already holds it, returns True if written"""
+    try:
+        with open(path, 'r') as f:
+            if f.read() == content:
+                return False
+    except (OSError, UnicodeDecodeError):
+        pass
+    with open(path, 'w') as f:
+        f.write(content)
+    return True
+
+def write_pkg_file_lists(pkgdest, histdir, pkgs):
+    """
+    Write histdir/<pkg>/files-in-package.txt for each package directory in
+    pkgdest, for the packages in pkgs whose history directory exists.
+    Returns the number of files written.
+    """
+    written = 0
+    for pkg in pkgs:
+        pkgdir = os.path.join(pkgdest, pkg)
+        outdir = os.path.join(histdir, pkg)
+        if not os.path.isdir(pkgdir) or not os.path.isdir(outdir):
+            continue
+        if write_if_changed(os.path.join(outdir, 'files-in-package.txt'), list_files(pkgdir)):
+            written += 1
+    return written
+
+def main(argv):
+    # Usage: buildhistory.py <pkgdest> <histdir> <pkg>...
+    # Prints the number of files written
+    if len(argv) < 2:
+        sys.stderr.write('Usage: %s <pkgdest> <histdir> [pkg...]\n' % sys.argv[0])
+        return 1
+    print(write_pkg_file_lists(argv[0], argv[1], argv[2:]))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -45,50 +45,164 @@ def runstrip(arg):
     return
 
 
-def strip_execs(pn, dstdir, strip_cmd, libdir, base_libdir, qa_already_stripped=False):
+def parse_debugsources_from_dwarfsrcfiles_output(dwarfsrcfiles_output):
+    debugfiles = {}
+
+    for line in dwarfsrcfiles_output.splitlines():
+        if line.startswith("\t"):
+            debugfiles[os.path.normpath(line.split()[0])] = ""
+
+    return debugfiles.keys()
+
+def source_info(file, fatal=True):
     """
-    Strip executable code (like executables, shared libraries) _in_place_
-    - Based on sysroot_strip in staging.bbclass
-    :param dstdir: directory in which to strip files
-    :param strip_cmd: Strip command (usually ${STRIP})
-    :param libdir: ${libdir} - strip .so files in this directory
-    :param base_libdir: ${base_libdir} - strip .so files in this directory
-    :param qa_already_stripped: Set to True if already-stripped' in ${INSANE_SKIP}
-    This is for proper logging and messages only.
+    Return the list of source files referenced by the DWARF information of
+    file, as reported by dwarfsrcfiles.
     """
-    import stat, errno, oe.path, oe.utils, mmap
+    import oe.utils
 
-    # Detect .ko module by searching for "vermagic=" string
-    def is_kernel_module(path):
-        with open(path) as f:
-            return mmap.mmap(f.fileno(), 0, prot=mmap.PROT_READ).find(b"vermagic=") >= 0
+    cmd = "'dwarfsrcfiles' '%s'" % (file)
+    (retval, output) = oe.utils.getstatusoutput(cmd)
+    # 255 means a specific file wasn't fully parsed to get the debug file list, which is not a fatal failure
+    if retval != 0 and retval != 255:
+        msg = "dwarfsrcfiles failed with exit code %s (cmd was %s)%s" % (retval, cmd, ":\n%s" % output if output else "")
+        if fatal:
+            bb.fatal(msg)
+        bb.note(msg)
+
+    return list(parse_debugsources_from_dwarfsrcfiles_output(output))
+
+def source_info_nonfatal(file):
+    # Helper for collecting sources of static libraries through multiprocess_exec
+    return source_info(file, fatal=False)
+
+def splitdebuginfo(arg):
+    # Function to split a single file into two components, one is the stripped
+    # target system binary, the other contains any debugging information. The
+    # two files are linked to reference each other. Called from
+    # split_and_strip_files below through multiprocess_exec.
+    #
+    # Returns the list of debug sources referenced by the file (None if
+    # debugsrcdir isn't set or the file was skipped) so that the caller can
+    # write them out in a deterministic order.
 
-    # Return type (bits):
-    # 0 - not elf
-    # 1 - ELF
-    # 2 - stripped
-    # 4 - executable
-    # 8 - shared library
-    # 16 - kernel module
-    def is_elf(path):
-        exec_type = 0
-        ret, result = oe.utils.getstatusoutput("file -b '%s'" % path)
+    import stat, oe.utils
+
+    (file, debugfile, debugsrcdir, objcopy) = arg
+    sources = None
+
+    # We ignore kernel modules, we don't generate debug info files.
+    if file.find("/lib/modules/") != -1 and file.endswith(".ko"):
+        return sources
+
+    newmode = None
+    if not os.access(file, os.W_OK) or os.access(file, os.R_OK):
+        origmode = os.stat(file)[stat.ST_MODE]
+        newmode = origmode | stat.S_IWRITE | stat.S_IREAD
+        os.chmod(file, newmode)
+
+    # We need to extract the debug src information here...
+    if debugsrcdir:
+        sources = source_info(file)
+
+    bb.utils.mkdirhier(os.path.dirname(debugfile))
+
+    cmd = "'%s' --only-keep-debug '%s' '%s'" % (objcopy, file, debugfile)
+    (retval, output) = oe.utils.getstatusoutput(cmd)
+    if retval:
+        bb.fatal("objcopy failed with exit code %s (cmd was %s)%s" % (retval, cmd, ":\n%s" % output if output else ""))
+
+    # Set the debuglink to have the view of the file path on the target
+    cmd = "'%s' --add-gnu-debuglink='%s' '%s'" % (objcopy, debugfile, file)
+    (retval, output) = oe.utils.getstatusoutput(cmd)
+    if retval:
+        bb.fatal("objcopy failed with exit code %s (cmd was %s)%s" % (retval, cmd, ":\n%s" % output if output else ""))
+
+    if newmode:
+        os.chmod(file, origmode)
+
+    return sources
 
-        if ret:
-            bb.error("split_and_strip_files: 'file %s' failed" % path)
+def is_elf(path):
+    """
+    Classify path the way 'file -b' output used to be interpreted, reading
+    the ELF header and section headers directly instead of running 'file'.
+
+    Return type (bits):
+    0 - not elf
+    1 - ELF
+    2 - stripped
+    4 - executable
+    8 - shared library
+    16 - kernel module
+    """
+    import os, struct, oe.qa
+
+    exec_type = 0
+    if not os.path.isfile(path):
+        return exec_type
+
+    with oe.qa.ELFFile(path) as elf:
+        try:
+            elf.open()
+        except oe.qa.NotELFFileError:
             return exec_type
 
-        if "ELF" in result:
-            exec_type |= 1
-            if "not stripped" not in result:
+        exec_type |= 1
+        try:
+            if elf.isStripped():
                 exec_type |= 2
-            if "executable" in result:
+            elftype = elf.elfType()
+            if elftype == oe.qa.ELFFile.ET_EXEC or elf.isPIE():
                 exec_type |= 4
-            if "shared" in result:
+            elif elftype == oe.qa.ELFFile.ET_DYN:
                 exec_type |= 8
-            if "relocatable" in result and is_kernel_module(path):
+            elif elftype == oe.qa.ELFFile.ET_REL and elf.data.find(b"vermagic=") >= 0:
                 exec_type |= 16
-        return exec_type
+        except struct.error:
+            # Truncated or corrupt headers, 'file' would still call it ELF
+            pass
+    return exec_type
+
+def elf_dynamic_info(file):
+    """
+    Return (needed, sonames, rpath) from the dynamic section of file, the
+    information package_do_shlibs used to extract from 'objdump -p'. needed
+    and sonames are lists, rpath is the DT_RPATH string or None. Files which
+    aren't ELF return empty results.
+    """
+    import os, struct, oe.qa
+
+    needed = []
+    sonames = []
+    rpath = None
+    if not os.path.isfile(file):
+        return (needed, sonames, rpath)
+
+    with oe.qa.ELFFile(file) as elf:
+        try:
+            elf.open()
+            needed = elf.neededLibs()
+            sonames = elf.dynamicStrings(oe.qa.ELFFile.DT_SONAME)
+            rpaths = elf.rpath()
+            if rpaths:
+                rpath = rpaths[-1]
+        except (oe.qa.NotELFFileError, struct.error):
+            pass
+    return (needed, sonames, rpath)
+
+def strip_execs(pn, dstdir, strip_cmd, libdir, base_libdir, qa_already_stripped=False):
+    """
+    Strip executable code (like executables, shared libraries) _in_place_
+    - Based on sysroot_strip in staging.bbclass
+    :param dstdir: directory in which to strip files
+    :param strip_cmd: Strip command (usually ${STRIP})
+    :param libdir: ${libdir} - strip .so files in this directory
+    :param base_libdir: ${base_libdir} - strip .so files in this directory
+    :param qa_already_stripped: Set to True if already-stripped' in ${INSANE_SKIP}
+    This is for proper logging and messages only.
+    """
+    import stat, errno, oe.path, oe.utils
 
     elffiles = {}
     inodes = {}
@@ -162,10 +276,57 @@ def file_translate(file):
     ft = ft.replace("_", "@underscore@")
     return ft
 
+# Bump this when the processing of rpmdeps output below changes, to invalidate
+# results stored in the filedeps cache
+FILEDEPS_CACHE_VERSION = 1
+
+def filedeps_tool_id(rpmdeps):
+    """
+    Return a string identifying the rpmdeps command line and the rpm scripts
+    and configuration installed next to it, to key cached filedeps results on
+    """
+    import os, hashlib, shlex
+
+    args = shlex.split(rpmdeps)
+    h = hashlib.sha256()
+    h.update(("%d %s\n" % (FILEDEPS_CACHE_VERSION, " ".join(args[1:]))).encode("utf-8"))
+    tooldir = os.path.dirname(args[0])
+    for root, dirs, files in os.walk(tooldir):
+        dirs.sort()
+        for f in sorted(files):
+            path = os.path.join(root, f)
+            try:
+                st = os.lstat(path)
+            except OSError:
+                continue
+            h.update(("%s %d %d\n" % (os.path.relpath(path, tooldir), st.st_size, st.st_mtime_ns)).encode("utf-8"))
+    return h.hexdigest()
+
+def filedeps_cache_key(file, relpath, toolid):
+    """
+    Return the cache key for the rpmdeps results of file, installed at
+    relpath in its package, or None if the results shouldn't be cached.
+    """
+    import os, hashlib, stat
+
+    st = os.lstat(file)
+    # What rpmdeps reports for symlinks and special files can depend on more
+    # than the file itself, so only cache regular files
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    h = hashlib.sha256()
+    h.update(("%s\0%s\0%o\0" % (toolid, relpath, st.st_mode)).encode("utf-8", "surrogateescape"))
+    with open(file, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
 def filedeprunner(arg):
-    import re, subprocess, shlex
+    import os, re, subprocess, shlex, json
 
-    (pkg, pkgfiles, rpmdeps, pkgdest) = arg
+    # cachedir and toolid are optional, results are cached if both are set
+    (pkg, pkgfiles, rpmdeps, pkgdest) = arg[:4]
+    (cachedir, toolid) = arg[4:6] if len(arg) > 4 else (None, None)
     provides = {}
     requires = {}
 
@@ -173,15 +334,16 @@ def filedeprunner(arg):
     dep_re = re.compile(r'\s+(\S)\s+(.*)')
     r = re.compile(r'[<>=]+\s+\S*')
 
-    def process_deps(pipe, pkg, pkgdest, provides, requires):
+    def process_deps(pipe):
+        # Returns a dictionary of file -> (provides, requires) in output order
+        filedeps = {}
         file = None
         for line in pipe.split("\n"):
 
             m = file_re.match(line)
             if m:
                 file = m.group(1)
-                file = file.replace(pkgdest + "/" + pkg, "")
-                file = file_translate(file)
+                filedeps.setdefault(file, ([], []))
                 continue
 
             m = dep_re.match(line)
@@ -191,9 +353,9 @@ def filedeprunner(arg):
             type, dep = m.groups()
 
             if type == 'R':
-                i = requires
+                i = filedeps[file][1]
             elif type == 'P':
-                i = provides
+                i = filedeps[file][0]
             else:
                continue
 
@@ -218,14 +380,67 @@ def filedeprunner(arg):
             # Put parentheses around any version specifications.
             dep = r.sub(r'(\g<0>)',dep)
 
-            if file not in i:
-                i[file] = []
-            i[file].append(dep)
+            i.append(dep)
 
-        return provides, requires
+        return filedeps
 
-    output = subprocess.check_output(shlex.split(rpmdeps) + pkgfiles, stderr=subprocess.STDOUT).decode("utf-8")
-    provides, requires = process_deps(output, pkg, pkgdest, provides, requires)
+    def cachefile(key):
+        return os.path.join(cachedir, key[:2], key)
+
+    prefix = pkgdest + "/" + pkg
+    filedeps = {}
+    keys = {}
+    if cachedir and toolid:
+        for file in pkgfiles:
+            try:
+                key = filedeps_cache_key(file, file.replace(prefix, ""), toolid)
+            except OSError:
+                key = None
+            if not key:
+                continue
+            try:
+                with open(cachefile(key), "r") as f:
+                    filedeps[file] = tuple(json.load(f))
+            except (OSError, ValueError):
+                keys[file] = key
+
+    missing = set(file for file in pkgfiles if file not in filedeps)
+    if missing:
+        output = subprocess.check_output(shlex.split(rpmdeps) + [file for file in pkgfiles if file in missing], stderr=subprocess.STDOUT).decode("utf-8")
+        scanned = process_deps(output)
+        # If rpmdeps reported files under the names it was given, any it
+        # didn't mention have no dependencies and can be cached as such
+        exact = all(file in missing for file in scanned)
+        for file in keys:
+            if file not in scanned and not exact:
+                continue
+            deps = scanned.get(file, ([], []))
+            path = cachefile(keys[file])
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmpfile = "%s.%d" % (path, os.getpid())
+                with open(tmpfile, "w") as f:
+                    json.dump(deps, f)
+                os.replace(tmpfile, path)
+            except OSError:
+                pass
+        # Report in the order files were passed in, whether or not they were
+        # cached, followed by anything rpmdeps named differently
+        for file in pkgfiles:
+            if file in scanned:
+                filedeps[file] = scanned.pop(file)
+        filedeps.update(scanned)
+
+    ordered = [file for file in pkgfiles if file in filedeps]
+    seen = set(ordered)
+    ordered.extend(file for file in filedeps if file not in seen)
+    for file in ordered:
+        (fileprovides, filerequires) = filedeps[file]
+        name = file_translate(file.replace(prefix, ""))
+        if fileprovides:
+            provides.setdefault(name, []).extend(fileprovides)
+        if filerequires:
+            requires.setdefault(name, []).extend(filerequires)
 
     return (pkg, provides, requires)
 
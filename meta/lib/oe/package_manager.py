@@ -10,6 +10,7 @@ import bb
 import tempfile
 import oe.utils
 import oe.path
+import oe.pkgdatautil
 import string
 from oe.gpg_sign import get_signer
 import hashlib
@@ -469,17 +470,10 @@ class PackageManager(object, metaclass=ABCMeta):
         else:
             pkgdatadir = self.d.getVar("PKGDATA_DIR")
 
-        try:
-            bb.note("Installing globbed packages...")
-            cmd = ["oe-pkgdata-util", "-p", pkgdatadir, "list-pkgs", globs]
-            pkgs = subprocess.check_output(cmd, stderr=subprocess.STDOUT).decode("utf-8")
-            self.install(pkgs.split(), attempt_only=True)
-        except subprocess.CalledProcessError as e:
-            # Return code 1 means no packages matched
-            if e.returncode != 1:
-                bb.fatal("Could not compute globbed packages list. Command "
-                         "'%s' returned %d:\n%s" %
-                         (' '.join(cmd), e.returncode, e.output.decode("utf-8")))
+        bb.note("Installing globbed packages...")
+        pkgs = oe.pkgdatautil.PkgData(pkgdatadir, self.d.getVar("PKGDATA_INDEX")).list_pkgs(globs.split())
+        if pkgs:
+            self.install(pkgs, attempt_only=True)
 
     def install_complementary(self, globs=None):
         """
@@ -505,29 +499,17 @@ class PackageManager(object, metaclass=ABCMeta):
         if globs is None:
             return
 
-        # we need to write the list of installed packages to a file because the
-        # oe-pkgdata-util reads it from a file
-        with tempfile.NamedTemporaryFile(mode="w+", prefix="installed-pkgs") as installed_pkgs:
-            pkgs = self.list_installed()
-            output = oe.utils.format_pkg_list(pkgs, "arch")
-            installed_pkgs.write(output)
-            installed_pkgs.flush()
-
-            cmd = ["oe-pkgdata-util",
-                   "-p", self.d.getVar('PKGDATA_DIR'), "glob", installed_pkgs.name,
-                   globs]
-            exclude = self.d.getVar('PACKAGE_EXCLUDE_COMPLEMENTARY')
-            if exclude:
-                cmd.extend(['--exclude=' + '|'.join(exclude.split())])
-            try:
-                bb.note("Installing complementary packages ...")
-                bb.note('Running %s' % cmd)
-                complementary_pkgs = subprocess.check_output(cmd, stderr=subprocess.STDOUT).decode("utf-8")
-                self.install(complementary_pkgs.split(), attempt_only=True)
-            except subprocess.CalledProcessError as e:
-                bb.fatal("Could not compute complementary packages list. Command "
-                         "'%s' returned %d:\n%s" %
-                         (' '.join(cmd), e.returncode, e.output.decode("utf-8")))
+        bb.note("Installing complementary packages ...")
+        pkgs = self.list_installed()
+        exclude = self.d.getVar('PACKAGE_EXCLUDE_COMPLEMENTARY')
+        if exclude:
+            exclude = '|'.join(exclude.split())
+        pkgdata = oe.pkgdatautil.PkgData(self.d.getVar('PKGDATA_DIR'), self.d.getVar('PKGDATA_INDEX'))
+        try:
+            complementary_pkgs = pkgdata.glob(sorted(pkgs), globs.split(), exclude)
+        except (OSError, re.error) as e:
+            bb.fatal("Could not compute complementary packages list: %s" % e)
+        self.install(sorted(complementary_pkgs), attempt_only=True)
 
     def deploy_dir_lock(self):
         if self.deploy_dir is None:
@@ -1384,7 +1366,7 @@ class OpkgPM(OpkgDpkgPM):
                                                 opkg_args,
                                                 ' '.join(pkgs))
         try:
-            output = subprocess.check_output(cmd, stderr=subprocess.STDOUT, shell=True)
+            output = subprocess.check_output(cmd, stderr=subprocess.STDOUT, shell=True).decode("utf-8")
         except subprocess.CalledProcessError as e:
             bb.fatal("Unable to dummy install packages. Command '%s' "
                      "returned %d:\n%s" % (cmd, e.returncode, e.output.decode("utf-8")))
@@ -1462,6 +1444,12 @@ class DpkgPM(OpkgDpkgPM):
 
         self._create_configs(archs, base_archs)
 
+        self.dpkg_dir = os.path.join(self.target_rootfs, "var/lib/dpkg")
+
+        self.saved_dpkg_dir = self.d.expand('${T}/saved/dpkg')
+        if not os.path.exists(self.d.expand('${T}/saved')):
+            bb.utils.mkdirhier(self.d.expand('${T}/saved'))
+
         self.indexer = DpkgIndexer(self.d, self.deploy_dir)
 
     def mark_packages(self, status_tag, packages=None):
@@ -1492,10 +1480,11 @@ class DpkgPM(OpkgDpkgPM):
 
         os.rename(status_file + ".tmp", status_file)
 
-    def run_pre_post_installs(self, package_name=None):
+    def run_pre_post_installs(self, package_name=None, packages=None):
         """
-        Run the pre/post installs for package "package_name". If package_name is
-        None, then run all pre/post install scriptlets.
+        Run the pre/post installs for package "package_name", or for the
+        packages in the 'packages' list. If both are None, then run all pre/post
+        install scriptlets.
         """
         info_dir = self.target_rootfs + "/var/lib/dpkg/info"
         ControlScript = collections.namedtuple("ControlScript", ["suffix", "name", "argument"])
@@ -1511,7 +1500,11 @@ class DpkgPM(OpkgDpkgPM):
                 if m is not None:
                     installed_pkgs.append(m.group(1))
 
-        if package_name is not None and not package_name in installed_pkgs:
+        if package_name is not None:
+            packages = [package_name]
+        if packages is not None:
+            installed_pkgs = [pkg for pkg in installed_pkgs if pkg in packages]
+        if not installed_pkgs:
             return
 
         os.environ['D'] = self.target_rootfs
@@ -1741,6 +1734,53 @@ class DpkgPM(OpkgDpkgPM):
     def list_installed(self):
         return DpkgPkgsList(self.d, self.target_rootfs).list_pkgs()
 
+    def dummy_install(self, pkgs):
+        """
+        The following function dummy installs pkgs in an empty rootfs and returns
+        the log of output.
+        """
+        if len(pkgs) == 0:
+            return
+
+        os.environ['APT_CONFIG'] = self.apt_conf_file
+
+        # An empty status file makes apt resolve all the dependencies
+        temp_dpkg_dir = self.d.expand('${T}/dpkg')
+        bb.utils.mkdirhier(temp_dpkg_dir)
+        temp_status = os.path.join(temp_dpkg_dir, "status")
+        open(temp_status, "w+").close()
+
+        cmd = "%s %s -o Dir::State::status=%s --simulate install %s" % \
+              (self.apt_get_cmd, self.apt_args, temp_status, ' '.join(pkgs))
+        try:
+            output = subprocess.check_output(cmd.split(), stderr=subprocess.STDOUT).decode("utf-8")
+        except subprocess.CalledProcessError as e:
+            bb.fatal("Unable to dummy install packages. Command '%s' "
+                     "returned %d:\n%s" % (cmd, e.returncode, e.output.decode("utf-8")))
+
+        bb.utils.remove(temp_dpkg_dir, True)
+
+        return output
+
+    def backup_packaging_data(self):
+        # Save the dpkg database for incremental deb image generation
+        if os.path.exists(self.saved_dpkg_dir):
+            bb.utils.remove(self.saved_dpkg_dir, True)
+        shutil.copytree(self.dpkg_dir,
+                        self.saved_dpkg_dir,
+                        symlinks=True)
+
+    def recover_packaging_data(self):
+        # Move the dpkg database back
+        if os.path.exists(self.saved_dpkg_dir):
+            if os.path.exists(self.dpkg_dir):
+                bb.utils.remove(self.dpkg_dir, True)
+
+            bb.note('Recover packaging data')
+            shutil.copytree(self.saved_dpkg_dir,
+                            self.dpkg_dir,
+                            symlinks=True)
+
     def package_info(self, pkg):
         """
         Returns a dictionary with the package info.
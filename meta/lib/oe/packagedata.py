@@ -1,28 +1,19 @@
-import codecs
 import os
 
 def packaged(pkg, d):
     return os.access(get_subpkgedata_fn(pkg, d) + '.packaged', os.R_OK)
 
-def read_pkgdatafile(fn):
-    pkgdata = {}
+def _index(d):
+    import oe.pkgdataindex
+    return oe.pkgdataindex.get_index(d.getVar("PKGDATA_INDEX") if d else None)
 
-    def decode(str):
-        c = codecs.getdecoder("unicode_escape")
-        return c(str)[0]
-
-    if os.access(fn, os.R_OK):
-        import re
-        f = open(fn, 'r')
-        lines = f.readlines()
-        f.close()
-        r = re.compile("([^:]+):\s*(.*)")
-        for l in lines:
-            m = r.match(l)
-            if m:
-                pkgdata[m.group(1)] = decode(m.group(2))
-
-    return pkgdata
+def read_pkgdatafile(fn, d=None):
+    """
+    Return the contents of the pkgdata file fn as a dictionary. Parsed files
+    are cached in the index named by PKGDATA_INDEX if d is given, and in
+    memory otherwise.
+    """
+    return _index(d).read(fn)
 
 def get_subpkgedata_fn(pkg, d):
     return d.expand('${PKGDATA_DIR}/runtime/%s' % pkg)
@@ -31,7 +22,7 @@ def has_subpkgdata(pkg, d):
     return os.access(get_subpkgedata_fn(pkg, d), os.R_OK)
 
 def read_subpkgdata(pkg, d):
-    return read_pkgdatafile(get_subpkgedata_fn(pkg, d))
+    return read_pkgdatafile(get_subpkgedata_fn(pkg, d), d)
 
 def has_pkgdata(pn, d):
     fn = d.expand('${PKGDATA_DIR}/%s' % pn)
@@ -39,14 +30,14 @@ def has_pkgdata(pn, d):
 
 def read_pkgdata(pn, d):
     fn = d.expand('${PKGDATA_DIR}/%s' % pn)
-    return read_pkgdatafile(fn)
+    return read_pkgdatafile(fn, d)
 
 #
 # Collapse FOO_pkg variables into FOO
 #
 def read_subpkgdata_dict(pkg, d):
     ret = {}
-    subd = read_pkgdatafile(get_subpkgedata_fn(pkg, d))
+    subd = read_pkgdatafile(get_subpkgedata_fn(pkg, d), d)
     for var in subd:
         newvar = var.replace("_" + pkg, "")
         if newvar == var and var + "_" + pkg in subd:
@@ -61,18 +52,13 @@ def _pkgmap(d):
 
     pkgmap = {}
     try:
-        files = os.listdir(pkgdatadir)
+        recipes = _index(d).read_dir(pkgdatadir)
     except OSError:
         bb.warn("No files in %s?" % pkgdatadir)
-        files = []
-
-    for pn in [f for f in files if not os.path.isdir(os.path.join(pkgdatadir, f))]:
-        try:
-            pkgdata = read_pkgdatafile(os.path.join(pkgdatadir, pn))
-        except OSError:
-            continue
+        recipes = {}
 
-        packages = pkgdata.get("PACKAGES") or ""
+    for pn in sorted(recipes):
+        packages = recipes[pn].get("PACKAGES") or ""
         for pkg in packages.split():
             pkgmap[pkg] = pn
 
@@ -0,0 +1,183 @@
+#
+# Index of parsed pkgdata files
+#
+# The pkgdata files in PKGDATA_DIR are plain text with escaped values, so
+# reading them means a regex match and a unicode_escape decode per line.
+# Tasks such as do_package_qa and do_rootfs read the same files over and
+# over. This keeps the decoded contents in an sqlite database, keyed on the
+# file path and validated against the file's mtime, size and inode, so a
+# lookup is a stat() and an indexed query. Files rewritten by emit_pkgdata
+# or replaced by sstate fail validation and are reparsed on next use; no
+# separate invalidation step is needed.
+#
+
+import json
+import os
+import sqlite3
+import threading
+
+def parse_pkgdatafile(fn):
+    """Parse a pkgdata file into a dictionary, raising OSError on failure"""
+    import codecs
+    import re
+
+    pkgdata = {}
+    decode = codecs.getdecoder("unicode_escape")
+    r = re.compile(r"([^:]+):\s*(.*)")
+    with open(fn, 'r') as f:
+        for l in f:
+            m = r.match(l)
+            if m:
+                pkgdata[m.group(1)] = decode(m.group(2))[0]
+    return pkgdata
+
+def _statkey(st):
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+class PkgDataIndex(object):
+    VERSION = 1
+
+    def __init__(self, dbfile=None):
+        self.dbfile = dbfile
+        self.lock = threading.RLock()
+        self.conn = None
+        self.pid = None
+        # In-process cache, avoids the query and JSON decode for repeat reads
+        self.cache = {}
+
+    def _connect(self):
+        # Connections can't be shared with forked children, reopen if needed
+        if self.pid == os.getpid():
+            return self.conn
+        self.conn = None
+        self.pid = os.getpid()
+        if not self.dbfile:
+            return None
+        try:
+            os.makedirs(os.path.dirname(self.dbfile), exist_ok=True)
+            conn = sqlite3.connect(self.dbfile, timeout=30, isolation_level=None,
+                                   check_same_thread=False)
+            # This is only a cache of PKGDATA_DIR so durability doesn't matter
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.execute("PRAGMA journal_mode = WAL")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != self.VERSION:
+                conn.execute("DROP TABLE IF EXISTS pkgdata")
+                conn.execute("PRAGMA user_version = %d" % self.VERSION)
+            conn.execute("CREATE TABLE IF NOT EXISTS pkgdata (path TEXT PRIMARY KEY, dir TEXT NOT NULL, "
+                         "mtime INTEGER, size INTEGER, inode INTEGER, data TEXT)")
+            conn.execute("CREATE INDEX IF NOT EXISTS pkgdata_dir ON pkgdata (dir)")
+        except sqlite3.Error:
+            # Carry on without the database rather than failing the task
+            self.dbfile = None
+            return None
+        self.conn = conn
+        return conn
+
+    def _store(self, rows):
+        conn = self._connect()
+        if conn is None or not rows:
+            return
+        try:
+            conn.executemany("INSERT OR REPLACE INTO pkgdata VALUES (?, ?, ?, ?, ?, ?)", rows)
+        except sqlite3.Error:
+            pass
+
+    def _parse(self, fn, st):
+        data = parse_pkgdatafile(fn)
+        key = _statkey(st)
+        self.cache[fn] = (key, data)
+        return (fn, os.path.dirname(fn), key[0], key[1], key[2], json.dumps(data))
+
+    def read(self, fn):
+        """Return the parsed contents of fn, or an empty dictionary if it can't be read"""
+        with self.lock:
+            conn = self._connect()
+            try:
+                st = os.stat(fn)
+            except OSError:
+                self.cache.pop(fn, None)
+                return {}
+            key = _statkey(st)
+
+            cached = self.cache.get(fn)
+            if cached and cached[0] == key:
+                return dict(cached[1])
+
+            if conn is not None:
+                try:
+                    row = conn.execute("SELECT mtime, size, inode, data FROM pkgdata WHERE path = ?", (fn,)).fetchone()
+                except sqlite3.Error:
+                    row = None
+                if row and tuple(row[:3]) == key:
+                    data = json.loads(row[3])
+                    self.cache[fn] = (key, data)
+                    return dict(data)
+
+            try:
+                row = self._parse(fn, st)
+            except OSError:
+                return {}
+            self._store([row])
+            return dict(self.cache[fn][1])
+
+    def read_dir(self, path):
+        """
+        Return a dictionary mapping the name of each file directly within
+        path to its parsed contents. Raises OSError if path can't be listed.
+        """
+        with self.lock:
+            conn = self._connect()
+            rows = {}
+            if conn is not None:
+                try:
+                    for row in conn.execute("SELECT path, mtime, size, inode, data FROM pkgdata WHERE dir = ?", (path,)):
+                        rows[row[0]] = row
+                except sqlite3.Error:
+                    rows = {}
+
+            result = {}
+            updates = []
+            with os.scandir(path) as it:
+                for entry in it:
+                    fn = entry.path
+                    try:
+                        if entry.is_dir():
+                            continue
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    key = _statkey(st)
+                    cached = self.cache.get(fn)
+                    if cached and cached[0] == key:
+                        result[entry.name] = cached[1]
+                        continue
+                    row = rows.get(fn)
+                    if row and tuple(row[1:4]) == key:
+                        data = json.loads(row[4])
+                        self.cache[fn] = (key, data)
+                        result[entry.name] = data
+                        continue
+                    try:
+                        updates.append(self._parse(fn, st))
+                    except OSError:
+                        continue
+                    result[entry.name] = self.cache[fn][1]
+            self._store(updates)
+            # Drop entries for files which have since been removed
+            stale = [(fn,) for fn in rows if os.path.basename(fn) not in result]
+            if stale:
+                try:
+                    conn.executemany("DELETE FROM pkgdata WHERE path = ?", stale)
+                except sqlite3.Error:
+                    pass
+            return {name: dict(data) for name, data in result.items()}
+
+_indexes = {}
+
+def get_index(dbfile):
+    """Return the shared PkgDataIndex for dbfile (None for an in-memory only index)"""
+    index = _indexes.get(dbfile)
+    if index is None:
+        index = _indexes[dbfile] = PkgDataIndex(dbfile)
+    return index
@@ -0,0 +1,154 @@
+#
+# Queries over a pkgdata directory, shared by oe-pkgdata-util and the
+# package manager classes so that rootfs and SDK construction can resolve
+# complementary packages in-process instead of running oe-pkgdata-util
+#
+
+import fnmatch
+import logging
+import os
+import re
+
+import oe.pkgdataindex
+
+logger = logging.getLogger('BitBake.OE.PkgData')
+
+# Packages which never have complementary packages worth installing
+COMPLEMENTARY_SKIP = "-locale-|^locale-base-|-dev$|-doc$|-dbg$|-staticdev$|^kernel-module-"
+
+class PkgData(object):
+    """
+    Read access to a pkgdata directory. Symlink targets and file contents are
+    cached, so an instance should only be kept for as long as the directory
+    is known not to change (e.g. for the duration of a task).
+    """
+
+    def __init__(self, pkgdata_dir, dbfile=None, logger=logger):
+        self.pkgdata_dir = pkgdata_dir
+        self.index = oe.pkgdataindex.get_index(dbfile)
+        self.logger = logger
+        self.revlinks = {}
+        self.exists = {}
+
+    def revpkgdata(self, pkg):
+        return os.path.join(self.pkgdata_dir, "runtime-reverse", pkg)
+
+    def fwdpkgdata(self, pkg):
+        return os.path.join(self.pkgdata_dir, "runtime", pkg)
+
+    def _exists(self, path):
+        if path not in self.exists:
+            self.exists[path] = os.path.exists(path)
+        return self.exists[path]
+
+    def reverse(self, pkg):
+        """Return the recipe-space name of runtime package pkg, or None"""
+        if pkg not in self.revlinks:
+            revlink = self.revpkgdata(pkg)
+            if self._exists(revlink):
+                self.revlinks[pkg] = os.path.basename(os.readlink(revlink))
+            else:
+                self.revlinks[pkg] = None
+        return self.revlinks[pkg]
+
+    def packaged(self, pkg):
+        return self._exists(self.fwdpkgdata(pkg) + ".packaged")
+
+    def renamed(self, pkg):
+        """Return the runtime name of recipe-space package pkg, or "" if unknown"""
+        return self.index.read(self.fwdpkgdata(pkg)).get("PKG_%s" % pkg, "")
+
+    def recipe(self, pkg):
+        """Return the PN of runtime package pkg, or "" if unknown"""
+        return self.index.read(self.revpkgdata(pkg)).get("PN", "")
+
+    def glob(self, pkgs, globs, exclude=None):
+        """
+        Expand globs such as *-dev over the runtime packages in pkgs, returning
+        the set of complementary packages which exist and were packaged.
+        Packages matching the exclude regex are not expanded.
+        """
+        skipval = COMPLEMENTARY_SKIP
+        if exclude:
+            skipval += "|" + exclude
+        skipregex = re.compile(skipval)
+
+        skippedpkgs = set()
+        mappedpkgs = set()
+        for pkg in pkgs:
+            # Skip packages for which there is no point applying globs
+            if skipregex.search(pkg):
+                self.logger.debug("%s -> !!" % pkg)
+                skippedpkgs.add(pkg)
+                continue
+
+            # Skip packages that already match the globs, so if e.g. a dev package
+            # is already installed and thus in the list, we don't process it any further
+            # Most of these will be caught by skipregex already, but just in case...
+            if any(fnmatch.fnmatchcase(pkg, g) for g in globs):
+                skippedpkgs.add(pkg)
+                self.logger.debug("%s -> !" % pkg)
+                continue
+
+            for g in globs:
+                mappedpkg = ""
+                # First just try substitution (i.e. packagename -> packagename-dev)
+                newpkg = g.replace("*", pkg)
+                origpkg = self.reverse(newpkg)
+                if origpkg is not None:
+                    mappedpkg = origpkg
+                    if self._exists(self.fwdpkgdata(origpkg)):
+                        mappedpkg = self.renamed(origpkg)
+                    if not self.packaged(origpkg):
+                        mappedpkg = ""
+                else:
+                    origpkg = self.reverse(pkg)
+                    if origpkg is not None:
+                        # Check if we can map after undoing the package renaming (by resolving the symlink)
+                        newpkg = g.replace("*", origpkg)
+                        if self._exists(self.fwdpkgdata(newpkg)):
+                            mappedpkg = self.renamed(newpkg)
+                        else:
+                            # That didn't work, so now get the PN, substitute that, then map in the other direction
+                            newpkg = g.replace("*", self.recipe(pkg))
+                            if self._exists(self.fwdpkgdata(newpkg)):
+                                mappedpkg = self.renamed(newpkg)
+                        if not self.packaged(newpkg):
+                            mappedpkg = ""
+                    else:
+                        # Package doesn't even exist...
+                        self.logger.debug("%s is not a valid package!" % (pkg))
+                        break
+
+                if mappedpkg:
+                    self.logger.debug("%s (%s) -> %s" % (pkg, g, mappedpkg))
+                    mappedpkgs.add(mappedpkg)
+                else:
+                    self.logger.debug("%s (%s) -> ?" % (pkg, g))
+
+        return mappedpkgs - skippedpkgs
+
+    def glob_batch(self, pkgs, globsets, exclude=None):
+        """
+        Expand several independent sets of globs over pkgs, returning a list
+        with the result of glob() for each set. Lookups are shared between
+        the sets.
+        """
+        pkgs = list(pkgs)
+        return [self.glob(pkgs, globs, exclude) for globs in globsets]
+
+    def list_pkgs(self, pkgspecs):
+        """Return the sorted list of packaged recipe-space packages matching any of pkgspecs"""
+        try:
+            names = os.listdir(os.path.join(self.pkgdata_dir, "runtime"))
+        except OSError:
+            return []
+        pkgs = []
+        for pkg in names:
+            if pkg.endswith(".packaged"):
+                continue
+            if not any(fnmatch.fnmatchcase(pkg, spec) for spec in pkgspecs):
+                continue
+            if self.packaged(pkg):
+                pkgs.append(pkg)
+        return sorted(pkgs)
@@ -27,8 +27,34 @@ class ELFFile:
     EI_DATA_LSB  = 1
     EI_DATA_MSB  = 2
 
+    # possible values for e_type
+    ET_NONE = 0
+    ET_REL  = 1
+    ET_EXEC = 2
+    ET_DYN  = 3
+    ET_CORE = 4
+
+    PT_LOAD    = 1
+    PT_DYNAMIC = 2
     PT_INTERP = 3
 
+    SHT_SYMTAB  = 2
+    SHT_DYNAMIC = 6
+
+    DT_NULL    = 0
+    DT_NEEDED  = 1
+    DT_STRTAB  = 5
+    DT_SYMTAB  = 6
+    DT_STRSZ   = 10
+    DT_SONAME  = 14
+    DT_RPATH   = 15
+    DT_TEXTREL = 22
+    DT_RUNPATH = 29
+    DT_GNU_HASH = 0x6ffffef5
+    DT_FLAGS_1 = 0x6ffffffb
+
+    DF_1_PIE = 0x08000000
+
     def my_assert(self, expectation, result):
         if not expectation == result:
             #print "'%x','%x' %s" % (ord(expectation), ord(result), self.name)
@@ -37,13 +63,17 @@ class ELFFile:
     def __init__(self, name):
         self.name = name
         self.objdump_output = {}
+        self.data = None
+        self._sections = None
+        self._dynamic = None
 
     # Context Manager functions to close the mmap explicitly
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
-        self.data.close()
+        if self.data is not None:
+            self.data.close()
 
     def open(self):
         with open(self.name, "rb") as f:
@@ -100,6 +130,220 @@ class ELFFile:
     def getWord(self, offset):
         return struct.unpack_from(self.getStructEndian() + "i", self.data, offset)[0]
 
+    def getUWord(self, offset):
+        return struct.unpack_from(self.getStructEndian() + "I", self.data, offset)[0]
+
+    def getAddr(self, offset):
+        """
+        Read an address/offset/size sized field (Elf32_Addr/Elf64_Addr and
+        friends) at the given offset
+        """
+        return struct.unpack_from(self.getStructEndian() + (self.bits == 32 and "I" or "Q"), self.data, offset)[0]
+
+    def flags(self):
+        """
+        Return the processor specific e_flags field
+        """
+        return self.getUWord(self.bits == 32 and 0x24 or 0x30)
+
+    def elfType(self):
+        """
+        Return the e_type field (ET_REL, ET_EXEC, ET_DYN...)
+        """
+        return self.getShort(0x10)
+
+    def sections(self):
+        """
+        Return a list of (name, sh_type, sh_offset, sh_size) tuples for the
+        section headers. The list is empty if there are no section headers.
+        """
+        if self._sections is not None:
+            return self._sections
+
+        self._sections = []
+        if self.bits == 32:
+            shoff = self.getUWord(0x20)
+            shentsize, shnum, shstrndx = self.getShort(0x2E), self.getShort(0x30), self.getShort(0x32)
+            offset_pos, size_pos = 0x10, 0x14
+        else:
+            shoff = self.getAddr(0x28)
+            shentsize, shnum, shstrndx = self.getShort(0x3A), self.getShort(0x3C), self.getShort(0x3E)
+            offset_pos, size_pos = 0x18, 0x20
+        if not shoff or shoff + shentsize > len(self.data):
+            return self._sections
+
+        # Extended section numbering, the real values live in section 0
+        if shnum == 0:
+            shnum = self.getAddr(shoff + size_pos)
+        if shstrndx == 0xffff:
+            shstrndx = self.getUWord(shoff + 0x18 if self.bits == 32 else shoff + 0x28)
+
+        headers = []
+        for i in range(shnum):
+            base = shoff + i * shentsize
+            if base + shentsize > len(self.data):
+                break
+            headers.append((self.getUWord(base), self.getUWord(base + 4),
+                            self.getAddr(base + offset_pos), self.getAddr(base + size_pos)))
+
+        strtab = None
+        if shstrndx < len(headers):
+            stroff, strsize = headers[shstrndx][2], headers[shstrndx][3]
+            strtab = self.data[stroff:stroff + strsize]
+
+        for (name, sh_type, sh_offset, sh_size) in headers:
+            if strtab is not None and name < len(strtab):
+                end = strtab.find(b'\0', name)
+                name = strtab[name:end if end >= 0 else len(strtab)].decode('utf-8', 'replace')
+            else:
+                name = ''
+            self._sections.append((name, sh_type, sh_offset, sh_size))
+        return self._sections
+
+    def isStripped(self):
+        """
+        Return True if there is no symbol table (the same test 'file' uses
+        to print "stripped"), otherwise False.
+        """
+        for (name, sh_type, sh_offset, sh_size) in self.sections():
+            if sh_type == ELFFile.SHT_SYMTAB:
+                return False
+        return True
+
+    def programHeaders(self):
+        """
+        Return a list of (p_type, p_offset, p_vaddr, p_filesz) tuples for the
+        program headers.
+        """
+        if self.bits == 32:
+            phoff = self.getUWord(0x1C)
+            phentsize, phnum = self.getShort(0x2A), self.getShort(0x2C)
+            offset_pos, vaddr_pos, filesz_pos = 0x4, 0x8, 0x10
+        else:
+            phoff = self.getAddr(0x20)
+            phentsize, phnum = self.getShort(0x36), self.getShort(0x38)
+            offset_pos, vaddr_pos, filesz_pos = 0x8, 0x10, 0x20
+
+        headers = []
+        if not phoff:
+            return headers
+        for i in range(phnum):
+            base = phoff + i * phentsize
+            if base + phentsize > len(self.data):
+                break
+            headers.append((self.getUWord(base), self.getAddr(base + offset_pos),
+                            self.getAddr(base + vaddr_pos), self.getAddr(base + filesz_pos)))
+        return headers
+
+    def dynamicEntries(self):
+        """
+        Return a list of (d_tag, d_val) tuples from the PT_DYNAMIC segment,
+        up to but not including DT_NULL.
+        """
+        if self._dynamic is not None:
+            return self._dynamic
+
+        entries = []
+        entsize = self.bits // 4
+        for (p_type, p_offset, p_vaddr, p_filesz) in self.programHeaders():
+            if p_type != ELFFile.PT_DYNAMIC:
+                continue
+            end = min(p_offset + p_filesz, len(self.data))
+            for pos in range(p_offset, end - entsize + 1, entsize):
+                tag = self.getAddr(pos)
+                if tag == ELFFile.DT_NULL:
+                    break
+                entries.append((tag, self.getAddr(pos + entsize // 2)))
+            break
+        self._dynamic = entries
+        return entries
+
+    def hasDynamicTag(self, tag):
+        """
+        Return True if the dynamic section contains an entry with the given
+        tag (e.g. DT_TEXTREL), otherwise False.
+        """
+        for (d_tag, d_val) in self.dynamicEntries():
+            if d_tag == tag:
+                return True
+        return False
+
+    def dynamicStrings(self, tag):
+        """
+        Return the list of strings referenced by the dynamic entries with the
+        given tag (e.g. DT_NEEDED), in the order they appear.
+        """
+        entries = self.dynamicEntries()
+        strtab = None
+        strsz = None
+        for (d_tag, d_val) in entries:
+            if d_tag == ELFFile.DT_STRTAB:
+                strtab = d_val
+            elif d_tag == ELFFile.DT_STRSZ:
+                strsz = d_val
+        if strtab is None:
+            return []
+
+        # DT_STRTAB is a virtual address, map it back to a file offset
+        for (p_type, p_offset, p_vaddr, p_filesz) in self.programHeaders():
+            if p_type == ELFFile.PT_LOAD and p_vaddr <= strtab < p_vaddr + p_filesz:
+                stroff = strtab - p_vaddr + p_offset
+                strend = p_offset + p_filesz
+                break
+        else:
+            return []
+        if strsz is not None:
+            strend = min(strend, stroff + strsz)
+        strend = min(strend, len(self.data))
+
+        strings = []
+        for (d_tag, d_val) in entries:
+            if d_tag != tag:
+                continue
+            start = stroff + d_val
+            if start >= strend:
+                continue
+            end = self.data.find(b'\0', start, strend)
+            strings.append(self.data[start:end if end >= 0 else strend].decode('utf-8', 'replace'))
+        return strings
+
+    def neededLibs(self):
+        """
+        Return the list of DT_NEEDED library names.
+        """
+        return self.dynamicStrings(ELFFile.DT_NEEDED)
+
+    def soname(self):
+        """
+        Return the DT_SONAME or None if there isn't one.
+        """
+        sonames = self.dynamicStrings(ELFFile.DT_SONAME)
+        return sonames[0] if sonames else None
+
+    def rpath(self):
+        """
+        Return the list of DT_RPATH strings.
+        """
+        return self.dynamicStrings(ELFFile.DT_RPATH)
+
+    def runpath(self):
+        """
+        Return the list of DT_RUNPATH strings.
+        """
+        return self.dynamicStrings(ELFFile.DT_RUNPATH)
+
+    def isPIE(self):
+        """
+        Return True if this is a position independent executable (an ET_DYN
+        object with DF_1_PIE set), otherwise False.
+        """
+        if self.elfType() != ELFFile.ET_DYN:
+            return False
+        for (tag, val) in self.dynamicEntries():
+            if tag == ELFFile.DT_FLAGS_1 and val & ELFFile.DF_1_PIE:
+                return True
+        return False
+
     def isDynamic(self):
         """
         Return True if there is a .interp segment (therefore dynamically
@@ -3,7 +3,10 @@ from oe.utils import execute_pre_post_process
 from oe.package_manager import *
 from oe.manifest import *
 import oe.path
-import filecmp
+import oe.utils
+import collections
+import hashlib
+import json
 import shutil
 import os
 import subprocess
@@ -22,6 +25,9 @@ class Rootfs(object, metaclass=ABCMeta):
         self.deploydir = self.d.getVar('IMGDEPLOYDIR')
         self.progress_reporter = progress_reporter
         self.logcatcher = logcatcher
+        self.inc_image_gen = False
+        self.inc_state = None
+        self.pkgs_unchanged = False
 
         self.install_order = Manifest.INSTALL_ORDER
 
@@ -168,6 +174,104 @@ class Rootfs(object, metaclass=ABCMeta):
 
         return None
 
+    def _incremental_signature(self):
+        return '%s:%s:%s' % \
+                ((self.d.getVar('BAD_RECOMMENDATIONS') or '').strip(),
+                 (self.d.getVar('NO_RECOMMENDATIONS') or '').strip(),
+                 (self.d.getVar('PACKAGE_EXCLUDE') or '').strip())
+
+    '''
+    Return the state saved by the previous creation of the rootfs when it
+    can be updated in place, or None when it has to be created from
+    scratch: incremental image generation is disabled, the previous
+    creation did not complete, or any of 'PACKAGE_EXCLUDE, NO_RECOMMENDATIONS
+    and BAD_RECOMMENDATIONS' has been changed since.
+    '''
+    def _load_incremental_state(self, enabled):
+        self.inc_image_gen = enabled
+        state_file = self.d.expand('${T}/incremental_rootfs.json')
+
+        state = None
+        if enabled and os.path.isdir(self.image_rootfs):
+            try:
+                with open(state_file) as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                pass
+        # Only written back once the rootfs has been created, so that one
+        # left over by a failed creation is never updated
+        bb.utils.remove(state_file)
+
+        if state is None or state.get('signature') != self._incremental_signature():
+            return None
+        return state
+
+    def _save_incremental_state(self, installed):
+        # Remember which packages each intercept was registered for, also
+        # in previous creations, to run it again when one of them is removed
+        intercepts = self.inc_state['intercepts'] if self.inc_state else {}
+        for script, intercept in self._registered_intercepts().items():
+            if script in intercepts:
+                intercept['pkgs'] = sorted(set(intercept['pkgs'] + intercepts[script]['pkgs']))
+            intercepts[script] = intercept
+        for script in list(intercepts):
+            intercepts[script]['pkgs'] = [pkg for pkg in intercepts[script]['pkgs'] if pkg in installed]
+            if not intercepts[script]['pkgs']:
+                del intercepts[script]
+
+        state = {'signature': self._incremental_signature(),
+                 'packages': installed,
+                 'intercepts': intercepts}
+        with open(self.d.expand('${T}/incremental_rootfs.json'), 'w') as f:
+            json.dump(state, f, indent=1, sort_keys=True)
+
+    def _installed_versions(self):
+        return {pkg: '%s %s' % (info['ver'], info['arch'])
+                for pkg, info in self.pm.list_installed().items()}
+
+    def _registered_intercepts(self):
+        intercepts = {}
+        for script in os.listdir(self.pm.intercepts_dir):
+            script_full = os.path.join(self.pm.intercepts_dir, script)
+            if script in ["postinst_intercept", "delay_to_first_boot"] or \
+               not os.access(script_full, os.X_OK):
+                continue
+
+            with open(script_full) as intercept:
+                content = intercept.read()
+            m = re.search("^##PKGS:(.*)$", content, re.MULTILINE)
+            if m is not None:
+                intercepts[script] = {'pkgs': m.group(1).split(),
+                                      'script': content}
+        return intercepts
+
+    '''
+    Only the postinsts of the packages installed or upgraded while updating
+    the rootfs in place register intercepts. The ones registered before for
+    packages which have now been removed have to run again too, e.g. to
+    drop the fonts of a removed package from the font cache.
+    '''
+    def _restore_intercepts(self, installed):
+        removed = set(self.inc_state['packages']) - set(installed)
+        if not removed:
+            return
+
+        registered = self._registered_intercepts()
+        for script, intercept in sorted(self.inc_state['intercepts'].items()):
+            if script in registered or not removed.intersection(intercept['pkgs']):
+                continue
+            pkgs = [pkg for pkg in intercept['pkgs'] if pkg in installed]
+            if not pkgs:
+                continue
+
+            bb.note("Running the %s intercept again for the removal of: %s" %
+                    (script, ' '.join(sorted(removed.intersection(intercept['pkgs'])))))
+            script_full = os.path.join(self.pm.intercepts_dir, script)
+            with open(script_full, 'w') as f:
+                f.write(re.sub("^##PKGS:.*$", "##PKGS: %s " % ' '.join(pkgs),
+                               intercept['script'], flags=re.MULTILINE))
+            os.chmod(script_full, 0o755)
+
     def create(self):
         bb.note("###### Generate rootfs #######")
         pre_process_cmds = self.d.getVar("ROOTFS_PREPROCESS_COMMAND")
@@ -186,6 +290,13 @@ class Rootfs(object, metaclass=ABCMeta):
         # call the package manager dependent create method
         self._create()
 
+        installed = None
+        if self.inc_image_gen:
+            installed = self._installed_versions()
+            if self.inc_state is not None:
+                self._restore_intercepts(installed)
+                self.pkgs_unchanged = self.inc_state['packages'] == installed
+
         sysconfdir = self.image_rootfs + self.d.getVar('sysconfdir')
         bb.utils.mkdirhier(sysconfdir)
         with open(sysconfdir + "/version", "w+") as ver:
@@ -226,6 +337,9 @@ class Rootfs(object, metaclass=ABCMeta):
         self._cleanup()
         self._log_check()
 
+        if self.inc_image_gen:
+            self._save_incremental_state(installed)
+
         if self.progress_reporter:
             self.progress_reporter.next_stage()
 
@@ -280,6 +394,11 @@ class Rootfs(object, metaclass=ABCMeta):
             self.pm.remove_packaging_data()
 
     def _run_ldconfig(self):
+        if self.pkgs_unchanged and \
+           os.path.exists(self.image_rootfs + self.d.getVar('sysconfdir') + "/ld.so.cache"):
+            bb.note("No package changed, not running ldconfig")
+            return
+
         if self.d.getVar('LDCONFIGDEPEND'):
             bb.note("Executing: ldconfig -r" + self.image_rootfs + "-c new -v")
             self._exec_shell_cmd(['ldconfig', '-r', self.image_rootfs, '-c',
@@ -308,6 +427,11 @@ class Rootfs(object, metaclass=ABCMeta):
         kernel_ver = open(kernel_abi_ver_file).read().strip(' \n')
         versioned_modules_dir = os.path.join(self.image_rootfs, modules_dir, kernel_ver)
 
+        if self.pkgs_unchanged and \
+           os.path.exists(os.path.join(versioned_modules_dir, "modules.dep")):
+            bb.note("No package changed, not running depmod")
+            return
+
         bb.utils.mkdirhier(versioned_modules_dir)
 
         self._exec_shell_cmd(['depmodwrapper', '-a', '-b', self.image_rootfs, kernel_ver])
@@ -351,7 +475,8 @@ class RpmRootfs(Rootfs):
                         )
 
         self.inc_rpm_image_gen = self.d.getVar('INC_RPM_IMAGE_GEN')
-        if self.inc_rpm_image_gen != "1":
+        self.inc_state = self._load_incremental_state(self.inc_rpm_image_gen == "1")
+        if self.inc_state is None:
             bb.utils.remove(self.image_rootfs, True)
         else:
             self.pm.recovery_packaging_data()
@@ -374,6 +499,10 @@ class RpmRootfs(Rootfs):
             installed_manifest = self.pm.load_old_install_solution()
             solution_manifest = self.pm.dump_install_solution(pkgs_to_install)
 
+            # Nothing to update in a new rootfs
+            if self.inc_state is None:
+                return
+
             pkg_to_remove = list()
             for pkg in installed_manifest:
                 if pkg not in solution_manifest:
@@ -559,6 +688,35 @@ class DpkgOpkgRootfs(Rootfs):
 
         return pkg_list
 
+    '''
+    While incremental image generation is enabled, it will remove the
+    unneeded pkgs by comparing the old full manifest in previous existing
+    image and the new full manifest in the current image.
+    '''
+    def _remove_extra_packages(self):
+        # Parse full manifest in previous existing image creation session
+        old_full_manifest = self.manifest.parse_full_manifest()
+
+        # Create full manifest for the current image session, the old one
+        # will be replaced by the new one.
+        self.manifest.create_full(self.pm)
+
+        # Nothing to remove from a new rootfs
+        if self.inc_state is None:
+            return
+
+        # Parse full manifest in current image creation session
+        new_full_manifest = self.manifest.parse_full_manifest()
+
+        pkg_to_remove = list()
+        for pkg in old_full_manifest:
+            if pkg and pkg not in new_full_manifest:
+                pkg_to_remove.append(pkg)
+
+        if pkg_to_remove != []:
+            bb.note('decremental removed: %s' % ' '.join(pkg_to_remove))
+            self.pm.remove(pkg_to_remove)
+
     def _save_postinsts_common(self, dst_postinst_dir, src_postinst_dir):
         num = 0
         for p in self._get_delayed_postinsts():
@@ -579,13 +737,17 @@ class DpkgRootfs(DpkgOpkgRootfs):
             "^E: Unmet dependencies."
         ]
 
-        bb.utils.remove(self.image_rootfs, True)
+        self.inc_deb_image_gen = self.d.getVar('INC_DEB_IMAGE_GEN') or ""
+        self.inc_state = self._load_incremental_state(self.inc_deb_image_gen == "1")
+        if self.inc_state is None:
+            bb.utils.remove(self.image_rootfs, True)
         bb.utils.remove(self.d.getVar('MULTILIB_TEMP_ROOTFS'), True)
         self.manifest = DpkgManifest(d, manifest_dir)
         self.pm = DpkgPM(d, d.getVar('IMAGE_ROOTFS'),
                          d.getVar('PACKAGE_ARCHS'),
                          d.getVar('DPKG_ARCH'))
-
+        if self.inc_state is not None:
+            self.pm.recover_packaging_data()
 
     def _create(self):
         pkgs_to_install = self.manifest.parse_initial_manifest()
@@ -602,11 +764,17 @@ class DpkgRootfs(DpkgOpkgRootfs):
 
         if self.progress_reporter:
             self.progress_reporter.next_stage()
-            # Don't support incremental, so skip that
-            self.progress_reporter.next_stage()
 
         self.pm.update()
 
+        if self.progress_reporter:
+            self.progress_reporter.next_stage()
+
+        installed_before = {}
+        if self.inc_deb_image_gen == "1":
+            self._remove_extra_packages()
+            installed_before = self.pm.list_installed()
+
         if self.progress_reporter:
             self.progress_reporter.next_stage()
 
@@ -629,18 +797,30 @@ class DpkgRootfs(DpkgOpkgRootfs):
 
         self.pm.fix_broken_dependencies()
 
+        # The scriptlets of the packages which were already in the rootfs
+        # have run when they were installed
+        changed_pkgs = None
+        if self.inc_deb_image_gen == "1":
+            changed_pkgs = [pkg for pkg, info in self.pm.list_installed().items()
+                            if pkg not in installed_before or
+                               installed_before[pkg]['ver'] != info['ver'] or
+                               installed_before[pkg]['arch'] != info['arch']]
+
         self.pm.mark_packages("installed")
 
-        self.pm.run_pre_post_installs()
+        self.pm.run_pre_post_installs(packages=changed_pkgs)
 
         execute_pre_post_process(self.d, deb_post_process_cmds)
 
+        if self.inc_deb_image_gen == "1":
+            self.pm.backup_packaging_data()
+
         if self.progress_reporter:
             self.progress_reporter.next_stage()
 
     @staticmethod
     def _depends_list():
-        return ['DEPLOY_DIR_DEB', 'DEB_SDK_ARCH', 'APTCONF_TARGET', 'APT_ARGS', 'DPKG_ARCH', 'DEB_PREPROCESS_COMMANDS', 'DEB_POSTPROCESS_COMMANDS']
+        return ['DEPLOY_DIR_DEB', 'DEB_SDK_ARCH', 'APTCONF_TARGET', 'APT_ARGS', 'DPKG_ARCH', 'INC_DEB_IMAGE_GEN', 'DEB_PREPROCESS_COMMANDS', 'DEB_POSTPROCESS_COMMANDS']
 
     def _get_delayed_postinsts(self):
         status_file = self.image_rootfs + "/var/lib/dpkg/status"
@@ -669,7 +849,8 @@ class OpkgRootfs(DpkgOpkgRootfs):
         self.pkg_archs = self.d.getVar("ALL_MULTILIB_PACKAGE_ARCHS")
 
         self.inc_opkg_image_gen = self.d.getVar('INC_IPK_IMAGE_GEN') or ""
-        if self._remove_old_rootfs():
+        self.inc_state = self._load_incremental_state(self.inc_opkg_image_gen == "1")
+        if self.inc_state is None:
             bb.utils.remove(self.image_rootfs, True)
             self.pm = OpkgPM(d,
                              self.image_rootfs,
@@ -684,8 +865,8 @@ class OpkgRootfs(DpkgOpkgRootfs):
 
         bb.utils.remove(self.d.getVar('MULTILIB_TEMP_ROOTFS'), True)
 
-    def _prelink_file(self, root_dir, filename):
-        bb.note('prelink %s in %s' % (filename, root_dir))
+    def _prelink_root(self, root_dir):
+        bb.note('prelink %s' % root_dir)
         prelink_cfg = oe.path.join(root_dir,
                                    self.d.expand('${sysconfdir}/prelink.conf'))
         if not os.path.exists(prelink_cfg):
@@ -701,34 +882,18 @@ class OpkgRootfs(DpkgOpkgRootfs):
                               '-c',
                               self.d.expand('${sysconfdir}/prelink.conf')])
 
-    '''
-    Compare two files with the same key twice to see if they are equal.
-    If they are not equal, it means they are duplicated and come from
-    different packages.
-    1st: Comapre them directly;
-    2nd: While incremental image creation is enabled, one of the
-         files could be probaly prelinked in the previous image
-         creation and the file has been changed, so we need to
-         prelink the other one and compare them.
-    '''
-    def _file_equal(self, key, f1, f2):
-
-        # Both of them are not prelinked
-        if filecmp.cmp(f1, f2):
-            return True
-
-        if self.image_rootfs not in f1:
-            self._prelink_file(f1.replace(key, ''), f1)
-
-        if self.image_rootfs not in f2:
-            self._prelink_file(f2.replace(key, ''), f2)
-
-        # Both of them are prelinked
-        if filecmp.cmp(f1, f2):
-            return True
-
-        # Not equal
-        return False
+    def _file_digests(self, files):
+        '''
+        Return {path: sha256} for the (root, path) pairs in files, hashing
+        the files of each root in a separate process.
+        '''
+        roots = collections.OrderedDict()
+        for root, item in sorted(files):
+            roots.setdefault(root, []).append(item)
+        digests = {}
+        for result in oe.utils.multiprocess_launch(_sha256_files, list(roots.values()), self.d):
+            digests.update(result)
+        return digests
 
     """
     This function was reused from the old implementation.
@@ -744,29 +909,55 @@ class OpkgRootfs(DpkgOpkgRootfs):
         allow_rep = re.compile(re.sub("\|$", "", allow_replace))
         error_prompt = "Multilib check error:"
 
-        files = {}
+        # The files each path is provided by, in the order of dirs
+        files = collections.OrderedDict()
         for dir in dirs:
             for root, subfolders, subfiles in os.walk(dir):
                 for file in subfiles:
                     item = os.path.join(root, file)
                     key = str(os.path.join("/", os.path.relpath(item, dir)))
+                    files.setdefault(key, []).append((dir, item))
 
-                    valid = True
-                    if key in files:
-                        #check whether the file is allow to replace
-                        if allow_rep.match(key):
-                            valid = True
-                        else:
-                            if os.path.exists(files[key]) and \
-                               os.path.exists(item) and \
-                               not self._file_equal(key, files[key], item):
-                                valid = False
-                                bb.fatal("%s duplicate files %s %s is not the same\n" %
-                                         (error_prompt, item, files[key]))
-
-                    #pass the check, add to list
-                    if valid:
-                        files[key] = item
+        # Each duplicate file has to be the same as the one it replaces,
+        # unless it is allowed to replace it
+        pairs = []
+        for key, items in files.items():
+            if len(items) < 2 or allow_rep.match(key):
+                continue
+            for prev, cur in zip(items, items[1:]):
+                if os.path.exists(prev[1]) and os.path.exists(cur[1]):
+                    pairs.append((prev, cur))
+        if not pairs:
+            return
+
+        sizes = {}
+        digests = {}
+        def differ(pairs, files):
+            # Only files of the same size as the one they replace are hashed
+            for f in files:
+                sizes[f[1]] = os.stat(f[1]).st_size
+            tohash = set()
+            for prev, cur in pairs:
+                if sizes[prev[1]] == sizes[cur[1]]:
+                    tohash.update(f for f in (prev, cur) if f in files or f[1] not in digests)
+            digests.update(self._file_digests(tohash))
+            return [(prev, cur) for prev, cur in pairs
+                    if sizes[prev[1]] != sizes[cur[1]] or digests[prev[1]] != digests[cur[1]]]
+
+        pairs = differ(pairs, set(f for pair in pairs for f in pair))
+        if not pairs:
+            return
+
+        # While incremental image creation is enabled, a file could have
+        # been prelinked in the previous image creation. Prelink the other
+        # roots holding files which differ, once each, and compare again.
+        roots = set(f[0] for pair in pairs for f in pair) - set([self.image_rootfs])
+        for root in sorted(roots):
+            self._prelink_root(root)
+        pairs = differ(pairs, set(f for pair in pairs for f in pair if f[0] in roots))
+        if pairs:
+            bb.fatal("".join("%s duplicate files %s %s is not the same\n" %
+                             (error_prompt, cur[1], prev[1]) for prev, cur in pairs))
 
     def _multilib_test_install(self, pkgs):
         ml_temp = self.d.getVar("MULTILIB_TEMP_ROOTFS")
@@ -791,59 +982,6 @@ class OpkgRootfs(DpkgOpkgRootfs):
 
         self._multilib_sanity_test(dirs)
 
-    '''
-    While ipk incremental image generation is enabled, it will remove the
-    unneeded pkgs by comparing the old full manifest in previous existing
-    image and the new full manifest in the current image.
-    '''
-    def _remove_extra_packages(self, pkgs_initial_install):
-        if self.inc_opkg_image_gen == "1":
-            # Parse full manifest in previous existing image creation session
-            old_full_manifest = self.manifest.parse_full_manifest()
-
-            # Create full manifest for the current image session, the old one
-            # will be replaced by the new one.
-            self.manifest.create_full(self.pm)
-
-            # Parse full manifest in current image creation session
-            new_full_manifest = self.manifest.parse_full_manifest()
-
-            pkg_to_remove = list()
-            for pkg in old_full_manifest:
-                if pkg not in new_full_manifest:
-                    pkg_to_remove.append(pkg)
-
-            if pkg_to_remove != []:
-                bb.note('decremental removed: %s' % ' '.join(pkg_to_remove))
-                self.pm.remove(pkg_to_remove)
-
-    '''
-    Compare with previous existing image creation, if some conditions
-    triggered, the previous old image should be removed.
-    The conditions include any of 'PACKAGE_EXCLUDE, NO_RECOMMENDATIONS
-    and BAD_RECOMMENDATIONS' has been changed.
-    '''
-    def _remove_old_rootfs(self):
-        if self.inc_opkg_image_gen != "1":
-            return True
-
-        vars_list_file = self.d.expand('${T}/vars_list')
-
-        old_vars_list = ""
-        if os.path.exists(vars_list_file):
-            old_vars_list = open(vars_list_file, 'r+').read()
-
-        new_vars_list = '%s:%s:%s\n' % \
-                ((self.d.getVar('BAD_RECOMMENDATIONS') or '').strip(),
-                 (self.d.getVar('NO_RECOMMENDATIONS') or '').strip(),
-                 (self.d.getVar('PACKAGE_EXCLUDE') or '').strip())
-        open(vars_list_file, 'w+').write(new_vars_list)
-
-        if old_vars_list != new_vars_list:
-            return True
-
-        return False
-
     def _create(self):
         pkgs_to_install = self.manifest.parse_initial_manifest()
         opkg_pre_process_cmds = self.d.getVar('OPKG_PREPROCESS_COMMANDS')
@@ -867,7 +1005,7 @@ class OpkgRootfs(DpkgOpkgRootfs):
             self.progress_reporter.next_stage()
 
         if self.inc_opkg_image_gen == "1":
-            self._remove_extra_packages(pkgs_to_install)
+            self._remove_extra_packages()
 
         if self.progress_reporter:
             self.progress_reporter.next_stage()
@@ -925,6 +1063,17 @@ class OpkgRootfs(DpkgOpkgRootfs):
     def _cleanup(self):
         self.pm.remove_lists()
 
+def _sha256_files(paths):
+    """Return {path: sha256 hex digest} for the given files"""
+    digests = {}
+    for path in paths:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(chunk)
+        digests[path] = h.hexdigest()
+    return digests
+
 def get_class_for_type(imgtype):
     return {"rpm": RpmRootfs,
             "ipk": OpkgRootfs,
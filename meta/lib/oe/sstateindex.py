@@ -0,0 +1,80 @@
+#
+# Index of the objects present in a local sstate cache directory
+#
+# Looking up thousands of setscene objects with one os.path.exists() call
+# each is slow on large graphs and on network filesystems. Instead we list
+# each hash subdirectory once and keep the listings, together with the
+# directory mtime, in a persistent index file so that later bitbake
+# invocations only rescan the subdirectories which changed.
+#
+
+import os
+import pickle
+import time
+
+class SStateIndex(object):
+    VERSION = 1
+
+    # Directories modified within this many nanoseconds of being listed may
+    # change again without their mtime changing, so aren't trusted later
+    MTIME_SLOP = 2 * 1000 * 1000 * 1000
+
+    def __init__(self, sstatedir, indexfile=None):
+        self.sstatedir = sstatedir
+        self.indexfile = indexfile
+        self.dirs = {}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        if not self.indexfile or not os.path.exists(self.indexfile):
+            return
+        try:
+            with open(self.indexfile, 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            return
+        if not isinstance(data, dict):
+            return
+        if data.get('version') == self.VERSION and data.get('sstatedir') == self.sstatedir:
+            self.dirs = data['dirs']
+
+    def save(self):
+        if not self.dirty or not self.indexfile:
+            return
+        os.makedirs(os.path.dirname(self.indexfile), exist_ok=True)
+        data = {'version': self.VERSION, 'sstatedir': self.sstatedir, 'dirs': self.dirs}
+        tmpfile = '%s.%s' % (self.indexfile, os.getpid())
+        with open(tmpfile, 'wb') as f:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpfile, self.indexfile)
+        self.dirty = False
+
+    def listdir(self, reldir):
+        """Return the set of names in reldir (relative to the sstate directory)"""
+        path = os.path.join(self.sstatedir, reldir)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            if reldir in self.dirs:
+                del self.dirs[reldir]
+                self.dirty = True
+            return frozenset()
+
+        cached = self.dirs.get(reldir)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        try:
+            names = frozenset(os.listdir(path))
+        except OSError:
+            names = frozenset()
+        if int(time.time() * 1000 * 1000 * 1000) - mtime < self.MTIME_SLOP:
+            mtime = None
+        self.dirs[reldir] = (mtime, names)
+        self.dirty = True
+        return names
+
+    def exists(self, relpath):
+        reldir, name = os.path.split(relpath)
+        return name in self.listdir(reldir)
@@ -280,6 +280,83 @@ def multiprocess_exec(commands, function):
 
     return results
 
+def multiprocess_launch(target, items, d, extraargs=None):
+    """
+    Call target(item, *extraargs) for each item in forked worker processes,
+    running at most BB_NUMBER_THREADS at a time, and return the results in
+    the order of items.
+
+    Unlike multiprocess_exec() the target and its arguments aren't pickled,
+    so target can be a metadata function and be passed the datastore. Only
+    the return values are sent back and so need to be picklable.
+    """
+    import multiprocessing
+    import multiprocessing.connection
+    import traceback
+
+    class ProcessLaunch(multiprocessing.Process):
+        def __init__(self, *args, **kwargs):
+            multiprocessing.Process.__init__(self, *args, **kwargs)
+            self._pconn, self._cconn = multiprocessing.Pipe()
+            self.result = None
+            self.error = None
+            self.received = False
+
+        def run(self):
+            try:
+                ret = self._target(*self._args, **self._kwargs)
+                self._cconn.send((None, ret))
+            except Exception:
+                self._cconn.send((traceback.format_exc(), None))
+
+        def update(self):
+            if not self.received and self._pconn.poll():
+                try:
+                    (self.error, self.result) = self._pconn.recv()
+                    self.received = True
+                except EOFError:
+                    pass
+
+    items = list(items)
+    max_process = int(d.getVar("BB_NUMBER_THREADS") or os.cpu_count() or 1)
+    extraargs = tuple(extraargs or ())
+
+    results = [None] * len(items)
+    errors = []
+    pending = list(enumerate(items))
+    launched = []
+    while pending or launched:
+        while pending and len(launched) < max_process:
+            (index, item) = pending.pop(0)
+            p = ProcessLaunch(target=target, args=(item,) + extraargs)
+            p.index = index
+            p.start()
+            launched.append(p)
+
+        # Sleep until a worker sends its result or exits. Results are read
+        # as they arrive so large ones can't block the child.
+        waitfor = [p._pconn for p in launched if not p.received] + \
+                  [p.sentinel for p in launched]
+        multiprocessing.connection.wait(waitfor)
+        for p in launched[:]:
+            p.update()
+            if p.is_alive():
+                continue
+            p.update()
+            p.join()
+            launched.remove(p)
+            if not p.received:
+                errors.append("Worker for %s exited with code %s" % (items[p.index], p.exitcode))
+            elif p.error:
+                errors.append(p.error)
+            else:
+                results[p.index] = p.result
+
+    if errors:
+        bb.fatal("Fatal errors occurred in subprocesses:\n%s" % "\n".join(errors))
+
+    return results
+
 def squashspaces(string):
     import re
     return re.sub("\s+", " ", string).strip()
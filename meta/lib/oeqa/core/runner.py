@@ -81,8 +81,9 @@ class OETestResult(_TestResult):
         for (scase, msg) in self.tc._results[type]:
             # XXX: When XML reporting is enabled scase is
             # xmlrunner.result._TestInfo instance instead of
-            # string.
-            if xmlEnabled:
+            # string, unless the results were merged from several
+            # processes.
+            if xmlEnabled and hasattr(scase, 'test_id'):
                 if case.id() == scase.test_id:
                     found = True
                     break
@@ -0,0 +1,83 @@
+# Released under the MIT license (see COPYING.MIT)
+
+import threading
+
+from . import OETarget
+
+class OETargetPool(OETarget):
+    """
+        Several targets used as a single one by the threads of
+        OETestRunnerThreaded.
+
+        Every thread is bound to one of the targets the first time it
+        uses the pool, in turn, so the threads are spread evenly over the
+        targets and a test case always talks to the same target, from
+        setUpClass to tearDownClass. The main thread uses the first
+        target. Attributes other than the target methods, like ip or
+        server_ip, are the ones of the target of the calling thread.
+    """
+
+    def __init__(self, logger, targets):
+        super(OETargetPool, self).__init__(logger)
+        self.targets = targets
+
+        self._lock = threading.Lock()
+        self._bound = {}
+        self._next = 0
+
+    def _target(self):
+        if threading.current_thread() is threading.main_thread():
+            return self.targets[0]
+
+        tid = threading.get_ident()
+        with self._lock:
+            if not tid in self._bound:
+                self._bound[tid] = self.targets[self._next % len(self.targets)]
+                self._next += 1
+            return self._bound[tid]
+
+    def __getattr__(self, name):
+        # Only called for the attributes not found on the pool
+        if name.startswith('_') or name == 'targets':
+            raise AttributeError(name)
+        return getattr(self._target(), name)
+
+    def start(self, *args, **kwargs):
+        """
+            Starts all the targets at the same time, the targets already
+            started are stopped if any of them fails to start.
+        """
+        errors = []
+
+        def _start(target):
+            try:
+                target.start(*args, **kwargs)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=_start, args=(target,))
+                for target in self.targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            self.stop()
+            raise errors[0]
+
+    def stop(self):
+        for target in self.targets:
+            target.stop()
+
+    def run(self, cmd, timeout=None):
+        return self._target().run(cmd, timeout)
+
+    def copyTo(self, localSrc, remoteDst):
+        return self._target().copyTo(localSrc, remoteDst)
+
+    def copyFrom(self, remoteSrc, localDst):
+        return self._target().copyFrom(remoteSrc, localDst)
+
+    def copyDirTo(self, localSrc, remoteDst):
+        return self._target().copyDirTo(localSrc, remoteDst)
@@ -15,7 +15,7 @@ class OEQemuTarget(OESSHTarget):
     def __init__(self, logger, ip, server_ip, timeout=300, user='root',
             port=None, machine='', rootfs='', kernel='', kvm=False,
             dump_dir='', dump_host_cmds='', display='', bootlog='',
-            tmpdir='', dir_image='', boottime=60, **kwargs):
+            tmpdir='', dir_image='', boottime=60, snapshot=False, **kwargs):
 
         super(OEQemuTarget, self).__init__(logger, ip, server_ip, timeout,
                 user, port)
@@ -26,20 +26,46 @@ class OEQemuTarget(OESSHTarget):
         self.rootfs = rootfs
         self.kernel = kernel
         self.kvm = kvm
+        # Restore the state after boot before each test module
+        self.snapshot = snapshot
+        self.module = None
 
         self.runner = QemuRunner(machine=machine, rootfs=rootfs, tmpdir=tmpdir,
                                  deploy_dir_image=dir_image, display=display,
                                  logfile=bootlog, boottime=boottime,
                                  use_kvm=kvm, dump_dir=dump_dir,
-                                 dump_host_cmds=dump_host_cmds, logger=logger)
+                                 dump_host_cmds=dump_host_cmds, logger=logger,
+                                 use_monitor=snapshot)
 
     def start(self, params=None, extra_bootparams=None):
         if self.runner.start(params, extra_bootparams=extra_bootparams):
             self.ip = self.runner.ip
             self.server_ip = self.runner.server_ip
+            self.module = None
+            if self.snapshot and not self.runner.savevm('oeqa-boot'):
+                self.logger.warning('Running the test modules without restoring the target state')
+                self.snapshot = False
         else:
             self.stop()
             raise RuntimeError("FAILED to start qemu - check the task log and the boot log")
 
     def stop(self):
+        super(OEQemuTarget, self).stop()
         self.runner.stop()
+
+    def startModule(self, module):
+        """
+            Brings the target back to its state after boot when a test
+            module other than the last one starts.
+        """
+        if self.snapshot and self.module and module != self.module:
+            # The ssh connections opened since are gone with the restore
+            self.master.stop()
+            if not self.runner.restart():
+                raise RuntimeError("FAILED to restore qemu - check the task log and the boot log")
+            self.ip = self.runner.ip
+            self.server_ip = self.runner.server_ip
+            if not self.runner.snapshot:
+                # qemu was booted again, save its new state
+                self.snapshot = self.runner.savevm('oeqa-boot')
+        self.module = module
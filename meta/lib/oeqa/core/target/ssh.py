@@ -7,8 +7,10 @@ import select
 import logging
 import subprocess
 import codecs
+import weakref
 
 from . import OETarget
+from oeqa.utils.sshcontrol import SSHMaster
 
 class OESSHTarget(OETarget):
     def __init__(self, logger, ip, server_ip, timeout=300, user='root',
@@ -40,22 +42,32 @@ class OESSHTarget(OETarget):
             self.ssh = self.ssh + [ '-p', port ]
             self.scp = self.scp + [ '-P', port ]
 
+        # Connection shared by the commands run on the target
+        self.master = SSHMaster(self.ssh)
+        weakref.finalize(self, self.master.close)
+        self.commands = 0
+        self.commands_time = 0
+
     def start(self, **kwargs):
         pass
 
     def stop(self, **kwargs):
-        pass
+        self.master.stop()
 
-    def _run(self, command, timeout=None, ignore_status=True):
+    def _run(self, command, timeout=None, ignore_status=True, **opts):
         """
             Runs command in target using SSHProcess.
         """
         self.logger.debug("[Running]$ %s" % " ".join(command))
 
         starttime = time.time()
-        status, output = SSHCall(command, self.logger, timeout)
-        self.logger.debug("[Command returned '%d' after %.2f seconds]"
-                 "" % (status, time.time() - starttime))
+        status, output = SSHCall(command, self.logger, timeout, **opts)
+        elapsed = time.time() - starttime
+        self.commands += 1
+        self.commands_time += elapsed
+        self.logger.debug("[Command returned '%d' after %.2f seconds, %.2f on "
+                 "average over %d commands]" % (status, elapsed,
+                 self.commands_time / self.commands, self.commands))
 
         if status and not ignore_status:
             raise AssertionError("Command '%s' returned non-zero exit "
@@ -73,7 +85,7 @@ class OESSHTarget(OETarget):
                         0:          No timeout, runs until return.
         """
         targetCmd = 'export PATH=/usr/sbin:/sbin:/usr/bin:/bin; %s' % command
-        sshCmd = self.ssh + [self.ip, targetCmd]
+        sshCmd = self.ssh + self.master.options(self.ip) + [self.ip, targetCmd]
 
         if timeout:
             processTimeout = timeout
@@ -100,7 +112,7 @@ class OESSHTarget(OETarget):
 
         else:
             remotePath = '%s@%s:%s' % (self.user, self.ip, remoteDst)
-            scpCmd = self.scp + [localSrc, remotePath]
+            scpCmd = self.scp + self.master.options(self.ip) + [localSrc, remotePath]
             return self._run(scpCmd, ignore_status=False)
 
     def copyFrom(self, remoteSrc, localDst):
@@ -108,28 +120,38 @@ class OESSHTarget(OETarget):
             Copy file from target.
         """
         remotePath = '%s@%s:%s' % (self.user, self.ip, remoteSrc)
-        scpCmd = self.scp + [remotePath, localDst]
+        scpCmd = self.scp + self.master.options(self.ip) + [remotePath, localDst]
         return self._run(scpCmd, ignore_status=False)
 
     def copyDirTo(self, localSrc, remoteDst):
         """
             Copy recursively localSrc directory to remoteDst in target.
+
+            The directory is streamed as a tar archive to a single ssh
+            command extracting it, symlinks are recreated in target.
         """
 
-        for root, dirs, files in os.walk(localSrc):
-            # Create directories in the target as needed
-            for d in dirs:
-                tmpDir = os.path.join(root, d).replace(localSrc, "")
-                newDir = os.path.join(remoteDst, tmpDir.lstrip("/"))
-                cmd = "mkdir -p %s" % newDir
-                self.run(cmd)
-
-            # Copy files into the target
-            for f in files:
-                tmpFile = os.path.join(root, f).replace(localSrc, "")
-                dstFile = os.path.join(remoteDst, tmpFile.lstrip("/"))
-                srcFile = os.path.join(root, f)
-                self.copyTo(srcFile, dstFile)
+        # Archive the content of localSrc only, not to change the
+        # permissions of remoteDst if it exists
+        entries = sorted(os.listdir(localSrc))
+        if not entries:
+            return self.run("mkdir -p %s" % remoteDst)
+
+        tar = subprocess.Popen(['tar', '-C', localSrc, '-cf', '-', '--'] + entries,
+                               stdout=subprocess.PIPE)
+        targetCmd = ('export PATH=/usr/sbin:/sbin:/usr/bin:/bin; '
+                     'mkdir -p %s && tar -C %s -xof -' % (remoteDst, remoteDst))
+        sshCmd = self.ssh + self.master.options(self.ip) + [self.ip, targetCmd]
+        try:
+            result = self._run(sshCmd, ignore_status=False, stdin=tar.stdout)
+        finally:
+            # tar gets SIGPIPE if ssh didn't read all of its output
+            tar.stdout.close()
+            tar.wait()
+        if tar.returncode:
+            raise AssertionError("Archiving %s failed with exit status %d"
+                                 "" % (localSrc, tar.returncode))
+        return result
 
     def deleteFiles(self, remotePath, files):
         """
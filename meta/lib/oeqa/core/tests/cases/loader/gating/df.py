@@ -0,0 +1,9 @@
+# Released under the MIT license (see COPYING.MIT)
+
+from oeqa.core.case import OETestCase
+from oeqa.core.decorator.depends import OETestDepends
+
+class DfTest(OETestCase):
+    @OETestDepends(['ssh.SSHTest.test_ssh'])
+    def test_df(self):
+        self.assertTrue(True, msg='How is this possible?')
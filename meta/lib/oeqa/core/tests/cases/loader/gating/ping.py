@@ -0,0 +1,7 @@
+# Released under the MIT license (see COPYING.MIT)
+
+from oeqa.core.case import OETestCase
+
+class PingTest(OETestCase):
+    def test_ping(self):
+        self.assertTrue(True, msg='How is this possible?')
@@ -0,0 +1,9 @@
+# Released under the MIT license (see COPYING.MIT)
+
+from oeqa.core.case import OETestCase
+from oeqa.core.decorator.depends import OETestDepends
+
+class PsTest(OETestCase):
+    @OETestDepends(['ssh.SSHTest.test_ssh'])
+    def test_ps(self):
+        self.assertTrue(True, msg='How is this possible?')
@@ -0,0 +1,13 @@
+# Released under the MIT license (see COPYING.MIT)
+
+from oeqa.core.case import OETestCase
+from oeqa.core.decorator.depends import OETestDepends
+
+class RpmBasicTest(OETestCase):
+    @OETestDepends(['ssh.SSHTest.test_ssh'])
+    def test_rpm_help(self):
+        self.assertTrue(True, msg='How is this possible?')
+
+    @OETestDepends(['rpm.RpmBasicTest.test_rpm_help'])
+    def test_rpm_query(self):
+        self.assertTrue(True, msg='How is this possible?')
@@ -0,0 +1,9 @@
+# Released under the MIT license (see COPYING.MIT)
+
+from oeqa.core.case import OETestCase
+from oeqa.core.decorator.depends import OETestDepends
+
+class SSHTest(OETestCase):
+    @OETestDepends(['ping.PingTest.test_ping'])
+    def test_ssh(self):
+        self.assertTrue(True, msg='How is this possible?')
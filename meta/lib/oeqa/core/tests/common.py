@@ -35,11 +35,11 @@ class TestBase(unittest.TestCase):
         return tc
 
     def _testLoaderThreaded(self, d={}, modules=[],
-            tests=[], filters={}):
+            tests=[], filters={}, process_num=0):
         from oeqa.core.threaded import OETestContextThreaded
 
         tc = OETestContextThreaded(d, self.logger)
         tc.loadTests(self.cases_path, modules=modules, tests=tests,
-                     filters=filters)
+                     filters=filters, process_num=process_num)
 
         return tc
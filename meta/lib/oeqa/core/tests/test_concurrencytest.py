@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+# Released under the MIT license (see COPYING.MIT)
+
+import os
+import unittest
+
+from common import setup_sys_path, TestBase
+setup_sys_path()
+
+from oeqa.core.utils.concurrencytest import group_tests, run_forked
+
+class TestConcurrencyTest(TestBase):
+    def setUp(self):
+        super(TestConcurrencyTest, self).setUp()
+        self.cases_path = [os.path.join(self.cases_path, 'loader', 'threaded')]
+
+    def test_group_tests(self):
+        tc = self._testLoader()
+        suites = group_tests(tc, tc.suites)
+
+        groups = [[case.id() for case in suite] for suite in suites]
+        # Dependent cases stay together, in order, and come first
+        self.assertEqual(groups[0],
+                ['threaded.ThreadedTest.test_threaded_no_depends',
+                 'threaded_depends.ThreadedTest3.test_threaded_depends'])
+        self.assertEqual(sorted(groups[1:]),
+                [['threaded.ThreadedTest2.test_threaded_same_module'],
+                 ['threaded_alone.ThreadedTestAlone.test_threaded_alone'],
+                 ['threaded_module.ThreadedTestModule.test_threaded_module'],
+                 ['threaded_module.ThreadedTestModule2.test_threaded_module2']])
+
+    def test_run_forked(self):
+        tc = self._testLoader()
+        result = run_forked(tc, group_tests(tc, tc.suites), 2)
+        self.assertTrue(result.wasSuccessful())
+        self.assertEqual(result.testsRun, 6)
+
+    def test_run_forked_setup_failure(self):
+        def setup(num):
+            if num == 0:
+                raise Exception('setup failed')
+
+        # The remaining process runs all the cases
+        tc = self._testLoader()
+        result = run_forked(tc, group_tests(tc, tc.suites), 2, setup)
+        self.assertTrue(result.wasSuccessful())
+        self.assertEqual(result.testsRun, 6)
+
+        # None is left to run them
+        tc = self._testLoader()
+        result = run_forked(tc, group_tests(tc, tc.suites), 1, setup)
+        self.assertFalse(result.wasSuccessful())
+        self.assertEqual(len(result.errors), 6)
+
+if __name__ == '__main__':
+    unittest.main()
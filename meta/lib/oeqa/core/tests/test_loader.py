@@ -110,5 +110,34 @@ class TestLoader(TestBase):
 
         self.cases_path = cases_path
 
+    def test_loader_threaded_gating(self):
+        cases_path = self.cases_path
+
+        self.cases_path = [os.path.join(self.cases_path, 'loader', 'gating')]
+
+        tc = self._testLoaderThreaded(process_num=3)
+        self.assertEqual(len(tc.suites), 3, "Expected to be 3 suites")
+
+        gating_ids = ['ping.PingTest.test_ping', 'ssh.SSHTest.test_ssh']
+        modules = set()
+        for suite in tc.suites:
+            case_ids = [case.id() for case in suite._tests]
+            self.assertEqual(case_ids[:2], gating_ids)
+            self.assertTrue(len(case_ids) > 2,
+                    "Expected cases besides ping and ssh in every suite")
+            suite_modules = set(case_id.split('.')[0]
+                    for case_id in case_ids[2:])
+            self.assertFalse(modules & suite_modules,
+                    "Expected a module to be in one suite")
+            modules |= suite_modules
+        self.assertEqual(modules, set(['date', 'df', 'ps', 'rpm']))
+
+        rpm_ids = [case.id() for suite in tc.suites for case in suite._tests
+                if case.id().startswith('rpm.')]
+        self.assertEqual(rpm_ids, ['rpm.RpmBasicTest.test_rpm_help',
+                'rpm.RpmBasicTest.test_rpm_query'])
+
+        self.cases_path = cases_path
+
 if __name__ == '__main__':
     unittest.main()
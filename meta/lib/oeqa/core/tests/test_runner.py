@@ -3,6 +3,7 @@
 # Copyright (C) 2016 Intel Corporation
 # Released under the MIT license (see COPYING.MIT)
 
+import os
 import unittest
 import logging
 import tempfile
@@ -34,5 +35,18 @@ class TestRunner(TestBase):
 
         fp.close()
 
+    def test_threaded_results(self):
+        self.cases_path = [os.path.join(self.cases_path, 'loader', 'threaded')]
+
+        # Every run gets its own results, with the ones of all its suites
+        for _ in range(2):
+            tc = self._testLoaderThreaded()
+            result = tc.runTests()
+            self.assertTrue(result.wasSuccessful())
+
+            results = result._get_results()
+            self.assertEqual(len(results), len(tc.suites))
+            self.assertEqual(sum(r['result'].testsRun for r in results), 6)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+# Released under the MIT license (see COPYING.MIT)
+
+import threading
+import unittest
+
+from common import setup_sys_path, TestBase
+setup_sys_path()
+
+from oeqa.core.target import OETarget
+from oeqa.core.target.pool import OETargetPool
+
+class DummyTarget(OETarget):
+    def __init__(self, logger, ip, fail=False):
+        super(DummyTarget, self).__init__(logger)
+        self.ip = ip
+        self.fail = fail
+        self.started = False
+
+    def start(self):
+        if self.fail:
+            raise RuntimeError('%s failed to start' % self.ip)
+        self.started = True
+
+    def stop(self):
+        self.started = False
+
+    def run(self, cmd, timeout=None):
+        return (0, '%s: %s' % (self.ip, cmd))
+
+class TestTargetPool(TestBase):
+    def test_pool_threads(self):
+        targets = [DummyTarget(self.logger, ip) for ip in ['a', 'b']]
+        pool = OETargetPool(self.logger, targets)
+
+        self.assertEqual(pool.ip, 'a')
+        self.assertEqual(pool.run('true'), (0, 'a: true'))
+
+        # The threads are spread over the targets, and keep their target
+        outputs = {}
+        barrier = threading.Barrier(4)
+        def _run(num):
+            outputs[num] = [pool.ip, pool.run('true')[1], pool.ip]
+            # Alive together, so that the threads get different idents
+            barrier.wait()
+
+        threads = [threading.Thread(target=_run, args=(num,)) for num in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for ip, output, ip2 in outputs.values():
+            self.assertEqual(ip, ip2)
+            self.assertEqual(output, '%s: true' % ip)
+        ips = [output[0] for output in outputs.values()]
+        self.assertEqual(sorted(ips), ['a', 'a', 'b', 'b'])
+
+    def test_pool_start(self):
+        targets = [DummyTarget(self.logger, ip) for ip in ['a', 'b']]
+        pool = OETargetPool(self.logger, targets)
+        pool.start()
+        self.assertTrue(all(t.started for t in targets))
+        pool.stop()
+        self.assertFalse(any(t.started for t in targets))
+
+        targets.append(DummyTarget(self.logger, 'c', fail=True))
+        pool = OETargetPool(self.logger, targets)
+        self.assertRaises(RuntimeError, pool.start)
+        self.assertFalse(any(t.started for t in targets))
+
+if __name__ == '__main__':
+    unittest.main()
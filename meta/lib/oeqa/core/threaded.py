@@ -1,6 +1,7 @@
 # Copyright (C) 2017 Intel Corporation
 # Released under the MIT license (see COPYING.MIT)
 
+import copy
 import threading
 import multiprocessing
 import queue
@@ -20,6 +21,20 @@ class OETestLoaderThreaded(OETestLoader):
 
         self.process_num = process_num
 
+    def _copyTestCase(self, case):
+        """
+            Returns a new instance of case with its own copy of
+            the decorators, so it can be run from another suite.
+        """
+
+        case_copy = self._getTestCase(case.__class__, case._testMethodName)
+        for d in getattr(case, 'decorators', []):
+            d_copy = copy.copy(d)
+            d_copy.case = case_copy
+            case_copy.decorators.append(d_copy)
+
+        return case_copy
+
     def discover(self):
         suite = super(OETestLoaderThreaded, self).discover()
 
@@ -31,6 +46,42 @@ class OETestLoaderThreaded(OETestLoader):
         for _ in range(self.process_num):
             suites.append(self.suiteClass())
 
+        depends = {}
+        if 'depends' in self.tc._registry:
+            depends = self.tc._registry['depends']
+
+        def _get_gating_ids(depends):
+            """
+                Cases that cases of several other modules depend on,
+                like ping and ssh in the runtime tests, would pull
+                almost every case into the same thread. They are run
+                at the start of every suite instead, so each thread
+                (and target) checks them before its own cases.
+            """
+
+            cases = self.tc._registry['cases']
+            modules = {}
+            for case_id in depends:
+                if not case_id in cases:
+                    continue
+                for depend in depends[case_id]:
+                    modules.setdefault(depend, set()).add(
+                            cases[case_id].__module__)
+
+            gating_ids = set()
+            pending = [depend for depend in modules if depend in cases and
+                    len(modules[depend] - {cases[depend].__module__}) > 1]
+            while pending:
+                case_id = pending.pop()
+                if not case_id in gating_ids:
+                    gating_ids.add(case_id)
+                    pending.extend(depends.get(case_id, []))
+
+            return gating_ids
+
+        gating_ids = _get_gating_ids(depends)
+        gating_cases = []
+
         def _search_for_module_idx(suites, case):
             """
                 Cases in the same module needs to be run
@@ -70,15 +121,14 @@ class OETestLoaderThreaded(OETestLoader):
             for case in suite:
                 if isinstance(case, TestSuite):
                     _fill_suites(case)
+                elif case.id() in gating_ids:
+                    gating_cases.append(case)
                 else:
                     idx = _search_for_module_idx(suites, case)
 
-                    depends = {}
-                    if 'depends' in self.tc._registry:
-                        depends = self.tc._registry['depends']
-
                     if idx == -1 and case.id() in depends:
-                        case_depends = depends[case.id()] 
+                        case_depends = [d for d in depends[case.id()]
+                                if not d in gating_ids]
                         idx = _search_for_depend_idx(suites, case_depends)
 
                     if idx == -1:
@@ -93,11 +143,24 @@ class OETestLoaderThreaded(OETestLoader):
             if len(suite._tests) > 0:
                 suites.append(suite)
 
+        # The cases are discovered ordered by depends, so the gating
+        # cases keep the order they need to run in.
+        if gating_cases:
+            if not suites:
+                suites.append(self.suiteClass())
+            for idx, suite in enumerate(suites):
+                cases = gating_cases if idx == 0 else \
+                        [self._copyTestCase(c) for c in gating_cases]
+                suites[idx] = self.suiteClass(cases + suite._tests)
+
         return suites
 
 class OEStreamLoggerThreaded(OEStreamLogger):
     _lock = threading.Lock()
-    buffers = {}
+
+    def __init__(self, logger):
+        super(OEStreamLoggerThreaded, self).__init__(logger)
+        self.buffers = {}
 
     def write(self, msg):
         tid = threading.get_ident()
@@ -110,67 +173,66 @@ class OEStreamLoggerThreaded(OEStreamLogger):
 
     def finish(self):
         tid = threading.get_ident()
-        
+        # A thread can run several suites, only log the output once
+        buffer = self.buffers.pop(tid, "")
+
         self._lock.acquire()
         self.logger.info('THREAD: %d' % tid)
         self.logger.info('-' * 70)
-        for line in self.buffers[tid].split('\n'):
+        for line in buffer.split('\n'):
             self.logger.info(line)
         self._lock.release()
 
 class OETestResultThreadedInternal(OETestResult):
     def _tc_map_results(self):
         tid = threading.get_ident()
-        
-        # PyUnit generates a result for every test module run, test
-        # if the thread already has an entry to avoid lose the previous
-        # test module results.
-        if not tid in self.tc._results:
-            self.tc._results[tid] = {}
-            self.tc._results[tid]['failures'] = self.failures
-            self.tc._results[tid]['errors'] = self.errors
-            self.tc._results[tid]['skipped'] = self.skipped
-            self.tc._results[tid]['expectedFailures'] = self.expectedFailures
+
+        # The depends decorator looks at the results of the thread, a
+        # suite is run with its own result and holds the cases it
+        # depends on.
+        self.tc._results[tid] = {}
+        self.tc._results[tid]['failures'] = self.failures
+        self.tc._results[tid]['errors'] = self.errors
+        self.tc._results[tid]['skipped'] = self.skipped
+        self.tc._results[tid]['expectedFailures'] = self.expectedFailures
 
 class OETestResultThreaded(object):
-    _results = {}
     _lock = threading.Lock()
 
     def __init__(self, tc):
         self.tc = tc
+        # Results of the suites run by each thread
+        self._results = {}
+
+    def _get_results(self):
+        return [r for tid in self._results for r in self._results[tid]]
 
     def _fill_tc_results(self):
-        tids = list(self.tc._results.keys())
         fields = ['failures', 'errors', 'skipped', 'expectedFailures']
 
-        for tid in tids:
-            result = self.tc._results[tid]
+        for field in fields:
+            self.tc._results[field] = []
+        for r in self._get_results():
             for field in fields:
-                if not field in self.tc._results:
-                    self.tc._results[field] = []
-                self.tc._results[field].extend(result[field])
+                self.tc._results[field].extend(getattr(r['result'], field))
 
     def addResult(self, result, run_start_time, run_end_time):
         tid = threading.get_ident()
 
         self._lock.acquire()
-        self._results[tid] = {}
-        self._results[tid]['result'] = result
-        self._results[tid]['run_start_time'] = run_start_time 
-        self._results[tid]['run_end_time'] = run_end_time 
-        self._results[tid]['result'] = result
+        self._results.setdefault(tid, []).append({'result': result,
+            'run_start_time': run_start_time, 'run_end_time': run_end_time})
         self._lock.release()
 
     def wasSuccessful(self):
         wasSuccessful = True
-        for tid in self._results.keys():
-            wasSuccessful = wasSuccessful and \
-                    self._results[tid]['result'].wasSuccessful()
+        for r in self._get_results():
+            wasSuccessful = wasSuccessful and r['result'].wasSuccessful()
         return wasSuccessful
 
     def stop(self):
-        for tid in self._results.keys():
-            self._results[tid]['result'].stop()
+        for r in self._get_results():
+            r['result'].stop()
 
     def logSummary(self, component, context_msg=''):
         elapsed_time = (self.tc._run_end_time - self.tc._run_start_time)
@@ -178,6 +240,16 @@ class OETestResultThreaded(object):
         self.tc.logger.info("SUMMARY:")
         self.tc.logger.info("%s (%s) - Ran %d tests in %.3fs" % (component,
             context_msg, len(self.tc._registry['cases']), elapsed_time))
+
+        # Time the suites would have taken one after the other
+        results = self._get_results()
+        serial_time = sum(r['run_end_time'] - r['run_start_time'] for r in results)
+        if elapsed_time > 0:
+            self.tc.logger.info("%s - Ran %d suites in %d threads: %.3fs "
+                "serial, %.3fs threaded (%.2fx)" % (component, len(results),
+                len(self._results), serial_time, elapsed_time,
+                serial_time / elapsed_time))
+
         if self.wasSuccessful():
             msg = "%s - OK - All required tests passed" % component
         else:
@@ -185,10 +257,9 @@ class OETestResultThreaded(object):
         self.tc.logger.info(msg)
 
     def logDetails(self):
-        if list(self._results):
-            tid = list(self._results)[0]
-            result = self._results[tid]['result']
-            result.logDetails()
+        results = self._get_results()
+        if results:
+            results[0]['result'].logDetails()
 
 class _Worker(threading.Thread):
     """Thread executing tasks from a given tasks queue"""
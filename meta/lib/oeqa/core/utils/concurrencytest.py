@@ -0,0 +1,172 @@
+# Released under the MIT license (see COPYING.MIT)
+#
+# Run groups of test cases of a context in several forked processes and
+# merge their results into a single OETestResult.
+#
+# Cases which have to be run together stay in the same group: the ones
+# of a class (setUpClass/tearDownClass), of a module defining
+# setUpModule/tearDownModule, and the ones linked by OETestDepends, which
+# looks at the result of the cases depended on. Groups are handed out to
+# the processes one at a time, biggest first, so that a process which
+# finished its group picks the next one.
+
+import multiprocessing
+import queue
+import sys
+import traceback
+import unittest
+import collections
+
+from oeqa.core.utils.test import getSuiteCases
+
+def _group_key(case):
+    module = sys.modules.get(case.__class__.__module__)
+    if hasattr(module, 'setUpModule') or hasattr(module, 'tearDownModule'):
+        return case.__class__.__module__
+    return '%s.%s' % (case.__class__.__module__, case.__class__.__name__)
+
+def group_tests(tc, suite):
+    """
+        Returns the cases of suite split in a list of suites which can
+        run in separate processes, biggest first. The order of the cases
+        within a suite is kept.
+    """
+    cases = getSuiteCases(suite)
+    keys = {case.id(): _group_key(case) for case in cases}
+
+    parents = {}
+    def _find(key):
+        while parents.get(key, key) != key:
+            key = parents[key]
+        return key
+
+    depends = tc._registry.get('depends', {})
+    for case in cases:
+        for depend in depends.get(case.id(), []):
+            if depend in keys:
+                a = _find(keys[case.id()])
+                b = _find(keys[depend])
+                if a != b:
+                    parents[b] = a
+
+    groups = collections.OrderedDict()
+    for case in cases:
+        groups.setdefault(_find(keys[case.id()]), []).append(case)
+
+    groups = sorted(groups.values(), key=len, reverse=True)
+    return [unittest.TestSuite(group) for group in groups]
+
+def _test_id(test):
+    # unittest-xml-reporting stores _TestInfo objects in the results
+    if hasattr(test, 'test_id'):
+        return test.test_id
+    return test.id()
+
+def _dump_result(result):
+    data = {'testsRun': result.testsRun,
+            'unexpectedSuccesses': [_test_id(t) for t in result.unexpectedSuccesses]}
+    for field in ['failures', 'errors', 'skipped', 'expectedFailures']:
+        data[field] = [(_test_id(t), msg) for (t, msg) in getattr(result, field)]
+    return data
+
+def _get_case(tc, test_id):
+    if test_id in tc._registry['cases']:
+        return tc._registry['cases'][test_id]
+    # Failures of setUpClass and setUpModule are reported with their name
+    return unittest.case._ErrorHolder(test_id)
+
+def _merge_result(tc, result, data):
+    result.testsRun += data['testsRun']
+    result.unexpectedSuccesses.extend(_get_case(tc, t) for t in data['unexpectedSuccesses'])
+    for field in ['failures', 'errors', 'skipped', 'expectedFailures']:
+        getattr(result, field).extend((_get_case(tc, t), msg) for (t, msg) in data[field])
+
+def _make_result(runner):
+    # unittest-xml-reporting names the method differently
+    if hasattr(runner, '_make_result'):
+        return runner._make_result()
+    return runner._makeResult()
+
+def _run_worker(tc, suites, num, setup, tasks, results):
+    try:
+        if setup:
+            setup(num)
+
+        while True:
+            idx = tasks.get()
+            if idx is None:
+                break
+
+            results.put((num, idx, None))
+            tc.runner = tc.runnerClass(tc, descriptions=False, verbosity=2)
+            result = tc.runner.run(suites[idx])
+            results.put((num, idx, _dump_result(result)))
+    except Exception:
+        tc.logger.error('Test process %d failed:\n%s' % (num, traceback.format_exc()))
+    finally:
+        results.put((num, None, None))
+
+def run_forked(tc, suites, num_processes, setup=None):
+    """
+        Runs suites in num_processes forked processes and returns the
+        merged result. setup(num) is called first in process num.
+    """
+    ctx = multiprocessing.get_context('fork')
+    tasks = ctx.Queue()
+    results = ctx.Queue()
+    for idx in range(len(suites)):
+        tasks.put(idx)
+    for _ in range(num_processes):
+        tasks.put(None)
+
+    processes = []
+    for num in range(num_processes):
+        p = ctx.Process(target=_run_worker,
+                args=(tc, suites, num, setup, tasks, results))
+        p.start()
+        processes.append(p)
+
+    tc.runner = tc.runnerClass(tc, descriptions=False, verbosity=2)
+    result = _make_result(tc.runner)
+
+    done = set()
+    running = {}
+    finished = set()
+    try:
+        while len(finished) < num_processes:
+            try:
+                num, idx, data = results.get(timeout=1)
+            except queue.Empty:
+                for num, p in enumerate(processes):
+                    if num not in finished and not p.is_alive():
+                        tc.logger.error('Test process %d exited with code %d' %
+                                (num, p.exitcode))
+                        finished.add(num)
+                continue
+
+            if idx is None:
+                finished.add(num)
+            elif data is None:
+                running[num] = idx
+            else:
+                del running[num]
+                done.add(idx)
+                _merge_result(tc, result, data)
+    finally:
+        for p in processes:
+            if p.is_alive():
+                p.terminate()
+            p.join()
+
+    # Groups of a process which died, or left when no process could run them
+    for idx in range(len(suites)):
+        if idx not in done:
+            if idx in running.values():
+                msg = 'The test process running it died'
+            else:
+                msg = 'Not run, no test process was left'
+            for case in getSuiteCases(suites[idx]):
+                result.testsRun += 1
+                result.errors.append((case, msg))
+
+    return result
@@ -7,13 +7,14 @@ import unittest
 
 def getSuiteCases(suite):
     """
-        Returns individual test from a test suite.
+        Returns individual test from a test suite, or from the list
+        of suites of a threaded context.
     """
     tests = []
 
     if isinstance(suite, unittest.TestCase):
         tests.append(suite)
-    elif isinstance(suite, unittest.suite.TestSuite):
+    elif isinstance(suite, (unittest.suite.TestSuite, list)):
         for item in suite:
             tests.extend(getSuiteCases(item))
 
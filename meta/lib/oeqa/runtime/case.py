@@ -8,6 +8,13 @@ class OERuntimeTestCase(OETestCase):
     # target instance set by OERuntimeTestLoader.
     target = None
 
+    @classmethod
+    def _oeSetUpClass(clss):
+        # Targets able to do it restore their state between test modules
+        if hasattr(clss.tc.target, 'startModule'):
+            clss.tc.target.startModule(clss.__module__)
+        super(OERuntimeTestCase, clss)._oeSetUpClass()
+
     def setUp(self):
         super(OERuntimeTestCase, self).setUp()
         install_package(self)
@@ -1,6 +1,8 @@
 import os
+import re
+import tarfile
+import collections
 
-from subprocess import check_output
 from shutil import rmtree
 from oeqa.runtime.case import OERuntimeTestCase
 from oeqa.core.decorator.depends import OETestDepends
@@ -240,23 +242,18 @@ class ParseLogsTest(OERuntimeTestCase):
     # create a list with all the .log files in it, if it's a file
     # just add it to that list.
     def getLogList(self, log_locations):
-        logs = []
-        for location in log_locations:
-            status, _ = self.target.run('test -f ' + str(location))
-            if status == 0:
-                logs.append(str(location))
-            else:
-                status, _ = self.target.run('test -d ' + str(location))
-                if status == 0:
-                    cmd = 'find ' + str(location) + '/*.log -maxdepth 1 -type f'
-                    status, output = self.target.run(cmd)
-                    if status == 0:
-                        output = output.splitlines()
-                        for logfile in output:
-                            logs.append(os.path.join(location, str(logfile)))
-        return logs
-
-    # Copy the log files to be parsed locally
+        cmd = ('for location in %s; do '
+               'if [ -f $location ]; then echo $location; '
+               'elif [ -d $location ]; then '
+               'find $location/*.log -maxdepth 1 -type f; fi; done'
+               % ' '.join(str(location) for location in log_locations))
+        status, output = self.target.run(cmd)
+        logs = [os.path.normpath(log) for log in output.splitlines()
+                if log.startswith('/')]
+        return sorted(set(logs))
+
+    # Copy the log files to be parsed locally, in a single archive.
+    # They keep their path on target under target_logs.
     def transfer_logs(self, log_list):
         workdir = self.getWorkdir()
         self.target_logs = workdir + '/' + 'target_logs'
@@ -264,76 +261,86 @@ class ParseLogsTest(OERuntimeTestCase):
         if os.path.exists(target_logs):
             rmtree(self.target_logs)
         os.makedirs(target_logs)
-        for f in log_list:
-            self.target.copyFrom(str(f), target_logs)
+        if not log_list:
+            return
+
+        archive = '/tmp/target_logs.tar'
+        cmd = 'tar -cf %s -C / %s' % (archive,
+                ' '.join(log.lstrip('/') for log in log_list))
+        status, output = self.target.run(cmd)
+        # GNU tar exits with 1 when a log changed while it was read, which
+        # is expected of a live /var/log. The target may run busybox tar,
+        # which doesn't know --warning=no-file-changed.
+        self.assertIn(status, (0, 1), msg='Failed to archive the logs: %s' % output)
+        local_archive = os.path.join(target_logs, 'target_logs.tar')
+        self.target.copyFrom(archive, local_archive)
+        self.target.run('rm %s' % archive)
+        with tarfile.open(local_archive) as tar:
+            tar.extractall(target_logs)
+        os.remove(local_archive)
 
     # Get the local list of logs
     def get_local_log_list(self, log_locations):
         self.transfer_logs(self.getLogList(log_locations))
-        list_dir = os.listdir(self.target_logs)
-        dir_files = [os.path.join(self.target_logs, f) for f in list_dir]
-        logs = [f for f in dir_files if os.path.isfile(f)]
-        return logs
-
-    # Build the grep command to be used with filters and exclusions
-    def build_grepcmd(self, errors, ignore_errors, log):
-        grepcmd = 'grep '
-        grepcmd += '-Ei "'
-        for error in errors:
-            grepcmd += error + '|'
-        grepcmd = grepcmd[:-1]
-        grepcmd += '" ' + str(log) + " | grep -Eiv \'"
-
+        logs = []
+        for root, _, files in os.walk(self.target_logs):
+            logs.extend(os.path.join(root, f) for f in files)
+        return sorted(logs)
+
+    # Build the regular expression matching the errors to ignore.
+    # Those are strings where '.' matches any character and '0-9'
+    # any digit.
+    def build_ignore_regex(self, ignore_errors):
         try:
             errorlist = ignore_errors[self.getMachine()]
         except KeyError:
             self.msg += 'No ignore list found for this machine, using default\n'
             errorlist = ignore_errors['default']
 
+        patterns = []
         for ignore_error in errorlist:
-            ignore_error = ignore_error.replace('(', '\(')
-            ignore_error = ignore_error.replace(')', '\)')
-            ignore_error = ignore_error.replace("'", '.')
-            ignore_error = ignore_error.replace('?', '\?')
-            ignore_error = ignore_error.replace('[', '\[')
-            ignore_error = ignore_error.replace(']', '\]')
-            ignore_error = ignore_error.replace('*', '\*')
-            ignore_error = ignore_error.replace('0-9', '[0-9]')
-            grepcmd += ignore_error + '|'
-        grepcmd = grepcmd[:-1]
-        grepcmd += "\'"
-
-        return grepcmd
-
-    # Grep only the errors so that their context could be collected.
-    # Default context is 10 lines before and after the error itself
+            pattern = re.escape(ignore_error).replace('\\.', '.')
+            patterns.append(pattern.replace('0\\-9', '[0-9]'))
+        return re.compile('|'.join(patterns), re.IGNORECASE)
+
+    # Find the errors, and collect their context, in a single pass over
+    # each log. Default context is 10 lines before and after the error
+    # itself, the contexts of an error found several times are separated
+    # by '--'.
     def parse_logs(self, errors, ignore_errors, logs,
                    lines_before = 10, lines_after = 10):
         results = {}
-        rez = []
-        grep_output = ''
+        error_regex = re.compile('|'.join(errors), re.IGNORECASE)
+        ignore_regex = self.build_ignore_regex(ignore_errors)
 
         for log in logs:
-            result = None
-            thegrep = self.build_grepcmd(errors, ignore_errors, log)
-
-            try:
-                result = check_output(thegrep, shell=True).decode('utf-8')
-            except:
-                pass
-
-            if result is not None:
-                results[log.replace('target_logs/','')] = {}
-                rez = result.splitlines()
-
-                for xrez in rez:
-                    try:
-                        cmd = ['grep', '-F', xrez, '-B', str(lines_before)]
-                        cmd += ['-A', str(lines_after), log]
-                        grep_output = check_output(cmd).decode('utf-8')
-                    except:
-                        pass
-                    results[log.replace('target_logs/','')][xrez]=grep_output
+            log_results = collections.OrderedDict()
+            before = collections.deque(maxlen=lines_before)
+            # Contexts still waiting for lines after their error
+            pending = []
+
+            with open(log, errors='replace') as f:
+                for line in f:
+                    line = line.rstrip('\n')
+                    for context in pending:
+                        context['lines'].append(line)
+                        context['after'] -= 1
+                    pending = [c for c in pending if c['after'] > 0]
+
+                    if error_regex.search(line) and not ignore_regex.search(line):
+                        context = {'lines': list(before) + [line],
+                                   'after': lines_after}
+                        log_results.setdefault(line, []).append(context)
+                        if lines_after:
+                            pending.append(context)
+                    before.append(line)
+
+            if log_results:
+                name = '/' + os.path.relpath(log, self.target_logs)
+                results[name] = {}
+                for error, contexts in log_results.items():
+                    results[name][error] = '\n--\n'.join(
+                            '\n'.join(c['lines']) for c in contexts) + '\n'
 
         return results
 
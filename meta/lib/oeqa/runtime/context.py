@@ -4,11 +4,12 @@
 import os
 
 from oeqa.core.context import OETestContext, OETestContextExecutor
+from oeqa.core.threaded import OETestContextThreaded
 from oeqa.core.target.ssh import OESSHTarget
 from oeqa.core.target.qemu import OEQemuTarget
 from oeqa.utils.dump import HostDumper
 
-from oeqa.runtime.loader import OERuntimeTestLoader
+from oeqa.runtime.loader import OERuntimeTestLoader, OERuntimeTestLoaderThreaded
 
 class OERuntimeTestContext(OETestContext):
     loaderClass = OERuntimeTestLoader
@@ -32,6 +33,15 @@ class OERuntimeTestContext(OETestContext):
         if 'procps' in self.image_packages:
             self.target_cmds['ps'] = self.target_cmds['ps'] + ' -ef'
 
+class OERuntimeTestContextThreaded(OETestContextThreaded, OERuntimeTestContext):
+    """
+        Runs the suites of independent cases at the same time, against
+        a single target or an OETargetPool of them. Each suite starts
+        with the cases most modules depend on (ping and ssh), so every
+        target is checked before the rest of its cases run.
+    """
+    loaderClass = OERuntimeTestLoaderThreaded
+
 class OERuntimeTestContextExecutor(OETestContextExecutor):
     _context_class = OERuntimeTestContext
 
@@ -2,6 +2,7 @@
 # Released under the MIT license (see COPYING.MIT)
 
 from oeqa.core.loader import OETestLoader
+from oeqa.core.threaded import OETestLoaderThreaded
 from oeqa.runtime.case import OERuntimeTestCase
 
 class OERuntimeTestLoader(OETestLoader):
@@ -14,3 +15,6 @@ class OERuntimeTestLoader(OETestLoader):
         setattr(case, 'target', self.tc.target)
 
         return case
+
+class OERuntimeTestLoaderThreaded(OETestLoaderThreaded, OERuntimeTestLoader):
+    pass
@@ -9,7 +9,7 @@ import errno
 from unittest.util import safe_repr
 
 import oeqa.utils.ftools as ftools
-from oeqa.utils.commands import runCmd, bitbake, get_bb_var
+from oeqa.utils.commands import runCmd, bitbake, get_bb_var, invalidate_bb_vars
 from oeqa.core.case import OETestCase
 
 class OESelftestTestCase(OETestCase):
@@ -47,6 +47,7 @@ class OESelftestTestCase(OETestCase):
     def tearDownClass(cls):
         cls.remove_include()
         cls.remove_inc_files()
+        invalidate_bb_vars()
         super(OESelftestTestCase, cls).tearDownClass()
 
     @classmethod
@@ -193,6 +194,7 @@ to ensure accurate results.")
 
         self.logger.debug("Writing to: %s\n%s\n" % (self.testinc_path, data))
         ftools.write_file(self.testinc_path, data)
+        invalidate_bb_vars()
 
         if self.tc.custommachine and 'MACHINE' in data:
             machine = get_bb_var('MACHINE')
@@ -202,6 +204,7 @@ to ensure accurate results.")
         """Append to <builddir>/conf/selftest.inc"""
         self.logger.debug("Appending to: %s\n%s\n" % (self.testinc_path, data))
         ftools.append_file(self.testinc_path, data)
+        invalidate_bb_vars()
 
         if self.tc.custommachine and 'MACHINE' in data:
             machine = get_bb_var('MACHINE')
@@ -211,6 +214,7 @@ to ensure accurate results.")
         """Remove data from <builddir>/conf/selftest.inc"""
         self.logger.debug("Removing from: %s\n%s\n" % (self.testinc_path, data))
         ftools.remove_from_file(self.testinc_path, data)
+        invalidate_bb_vars()
 
     def recipeinc(self, recipe):
         """Return absolute path of meta-sefltest/recipes-test/<recipe>/test_recipe.inc"""
@@ -221,6 +225,7 @@ to ensure accurate results.")
         inc_file = self.recipeinc(recipe)
         self.logger.debug("Writing to: %s\n%s\n" % (inc_file, data))
         ftools.write_file(inc_file, data)
+        invalidate_bb_vars()
         return inc_file
 
     def append_recipeinc(self, recipe, data):
@@ -228,6 +233,7 @@ to ensure accurate results.")
         inc_file = self.recipeinc(recipe)
         self.logger.debug("Appending to: %s\n%s\n" % (inc_file, data))
         ftools.append_file(inc_file, data)
+        invalidate_bb_vars()
         return inc_file
 
     def remove_recipeinc(self, recipe, data):
@@ -235,6 +241,7 @@ to ensure accurate results.")
         inc_file = self.recipeinc(recipe)
         self.logger.debug("Removing from: %s\n%s\n" % (inc_file, data))
         ftools.remove_from_file(inc_file, data)
+        invalidate_bb_vars()
 
     def delete_recipeinc(self, recipe):
         """Delete meta-sefltest/recipes-test/<recipe>/test_recipe.inc file"""
@@ -245,25 +252,30 @@ to ensure accurate results.")
         except OSError as e:
             if e.errno != errno.ENOENT:
                 raise
+        invalidate_bb_vars()
     def write_bblayers_config(self, data):
         """Write to <builddir>/conf/bblayers.inc"""
         self.logger.debug("Writing to: %s\n%s\n" % (self.testinc_bblayers_path, data))
         ftools.write_file(self.testinc_bblayers_path, data)
+        invalidate_bb_vars()
 
     def append_bblayers_config(self, data):
         """Append to <builddir>/conf/bblayers.inc"""
         self.logger.debug("Appending to: %s\n%s\n" % (self.testinc_bblayers_path, data))
         ftools.append_file(self.testinc_bblayers_path, data)
+        invalidate_bb_vars()
 
     def remove_bblayers_config(self, data):
         """Remove data from <builddir>/conf/bblayers.inc"""
         self.logger.debug("Removing from: %s\n%s\n" % (self.testinc_bblayers_path, data))
         ftools.remove_from_file(self.testinc_bblayers_path, data)
+        invalidate_bb_vars()
 
     def set_machine_config(self, data):
         """Write to <builddir>/conf/machine.inc"""
         self.logger.debug("Writing to: %s\n%s\n" % (self.machineinc_path, data))
         ftools.write_file(self.machineinc_path, data)
+        invalidate_bb_vars()
 
     # check does path exist
     def assertExists(self, expr, msg=None):
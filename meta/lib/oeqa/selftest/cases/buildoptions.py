@@ -30,6 +30,23 @@ class ImageOptionsTests(OESelftestTestCase):
         incremental_removed = re.search(r"Erasing\s*:\s*packagegroup-core-ssh-openssh", log_data_removed)
         self.assertTrue(incremental_removed, msg = "Match failed in:\n%s" % log_data_removed)
 
+    def test_incremental_image_generation_deb(self):
+        bitbake("-c clean core-image-minimal")
+        self.write_config('PACKAGE_CLASSES = "package_deb"\nINC_DEB_IMAGE_GEN = "1"')
+        self.append_config('IMAGE_FEATURES += "ssh-server-openssh"')
+        bitbake("core-image-minimal")
+        log_data_file = os.path.join(get_bb_var("WORKDIR", "core-image-minimal"), "temp/log.do_rootfs")
+        log_data_created = ftools.read_file(log_data_file)
+        incremental_created = re.search(r"Installing the following packages:.* packagegroup-core-ssh-openssh", log_data_created)
+        self.remove_config('IMAGE_FEATURES += "ssh-server-openssh"')
+        self.assertTrue(incremental_created, msg = "Match failed in:\n%s" % log_data_created)
+        bitbake("core-image-minimal")
+        log_data_removed = ftools.read_file(log_data_file)
+        incremental_removed = re.search(r"decremental removed:.* packagegroup-core-ssh-openssh", log_data_removed)
+        self.assertTrue(incremental_removed, msg = "Match failed in:\n%s" % log_data_removed)
+        # The packages which were kept are not configured again, and none was added
+        self.assertNotIn("Executing postinstall for package", log_data_removed)
+
     @OETestID(286)
     def test_ccache_tool(self):
         bitbake("ccache-native")
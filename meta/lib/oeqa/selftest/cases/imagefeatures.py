@@ -1,5 +1,5 @@
 from oeqa.selftest.case import OESelftestTestCase
-from oeqa.utils.commands import runCmd, bitbake, get_bb_var, runqemu
+from oeqa.utils.commands import runCmd, bitbake, get_bb_var, get_bb_vars, runqemu
 from oeqa.core.decorator.oeid import OETestID
 from oeqa.utils.sshcontrol import SSHControl
 import os
@@ -200,6 +200,49 @@ class ImageFeatures(OESelftestTestCase):
         self.assertTrue(runCmd('cd %s;sha256sum -c %s.%s.sha256sum' %
                                (deploy_dir_image, link_name, conv)))
 
+    def test_image_checksums(self):
+        """
+        Summary:     Check the checksum conversions computed together
+        Expected:    All the requested checksums of the image and of its
+                     compressed variant are written and are valid
+        """
+        sums = ['md5sum', 'sha1sum', 'sha224sum', 'sha256sum', 'sha384sum', 'sha512sum']
+        convs = ['ext4', 'ext4.gz']
+        features = 'IMAGE_FSTYPES += "%s"' % ' '.join('%s.%s' % (conv, s) for conv in convs for s in sums)
+        self.write_config(features)
+
+        image_name = 'core-image-minimal'
+        bitbake(image_name)
+
+        deploy_dir_image = get_bb_var('DEPLOY_DIR_IMAGE')
+        link_name = get_bb_var('IMAGE_LINK_NAME', image_name)
+        for conv in convs:
+            for s in sums:
+                sumfile = '%s.%s.%s' % (link_name, conv, s)
+                self.assertTrue(os.path.exists(os.path.join(deploy_dir_image, sumfile)))
+                runCmd('cd %s; %s -c %s' % (deploy_dir_image, s, sumfile))
+
+    def test_image_conversion_buildstats(self):
+        """
+        Summary:     Check the timing of image conversions in buildstats
+        Expected:    Each conversion of the image, including the ones run
+                     on the output of another conversion, is reported
+        """
+        features = 'IMAGE_FSTYPES += "ext4.gz ext4.xz ext4.gz.sha256sum"\n'\
+                   'USER_CLASSES += "buildstats"'
+        self.write_config(features)
+
+        image_name = 'core-image-minimal'
+        bitbake('%s -C image_ext4' % image_name)
+
+        bb_vars = get_bb_vars(['BUILDSTATS_BASE', 'PF'], image_name)
+        bsdir = bb_vars['BUILDSTATS_BASE']
+        latest = max(os.listdir(bsdir), key=lambda b: os.stat(os.path.join(bsdir, b)).st_mtime)
+        with open(os.path.join(bsdir, latest, bb_vars['PF'], 'do_image_ext4')) as f:
+            stats = f.read()
+        for conv in ['ext4.gz', 'ext4.xz', 'ext4.gz.checksums']:
+            self.assertIn('Conversion %s: ' % conv, stats)
+
     @OETestID(1904)
     def test_image_fstypes(self):
         """
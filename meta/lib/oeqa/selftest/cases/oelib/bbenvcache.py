@@ -0,0 +1,123 @@
+from unittest.case import TestCase
+import unittest.mock
+import oe.bbenvcache
+import tempfile
+import os
+import shutil
+
+BBENV = """\
+# INCLUDE HISTORY:
+#
+# %(conf)s includes:
+#   %(inc)s
+#
+# $FOO [2 operations]
+#   set %(conf)s:1
+#     "foo"
+#   set %(inc)s:3
+#     "bar"
+# pre-expansion value:
+#   "bar"
+FOO="bar"
+#
+# $PATH
+#   set %(inc)s:4
+#     "/usr/bin"
+export PATH="/usr/bin"
+#
+# $BAR [unexport]
+#   set %(conf)s:2
+#     "baz"
+# pre-expansion value:
+#   "baz"
+unset BAR
+#
+# $EMPTY
+EMPTY=""
+#
+# $LATE
+LATE=""
+#
+# $BBFILES
+BBFILES="%(layer)s/recipes-*/*/*.bb %(layer)s/recipes-*/*/*.bbappend"
+#
+# $do_foo
+do_foo() {
+FOO="shadowed"
+LATE="late"
+}
+"""
+
+class TestBBEnvCache(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='oe-test_bbenvcache')
+        self.cachedir = os.path.join(self.tmpdir, 'cache')
+        self.conf = os.path.join(self.tmpdir, 'conf', 'bitbake.conf')
+        self.inc = os.path.join(self.tmpdir, 'classes', 'foo.inc')
+        for path in [self.conf, self.inc]:
+            os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as f:
+                f.write('FOO = "foo"\n')
+        self.layer = os.path.join(self.tmpdir, 'layer')
+        os.makedirs(os.path.join(self.layer, 'recipes-core', 'foo'))
+        self.bbenv = BBENV % {'conf': self.conf, 'inc': self.inc, 'layer': self.layer}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_parse(self):
+        values, files = oe.bbenvcache.parse(self.bbenv)
+        # The first non-empty value wins, empty ones only if there is no other
+        self.assertEqual(values, {'FOO': 'bar', 'PATH': '/usr/bin', 'BAR': 'baz', 'EMPTY': '',
+                                  'LATE': 'late', 'BBFILES': '%s/recipes-*/*/*.bb %s/recipes-*/*/*.bbappend' % (self.layer, self.layer)})
+        self.assertEqual(files, {self.conf, self.inc})
+
+    def test_store_load(self):
+        self.assertIsNone(oe.bbenvcache.load('foo', None, self.cachedir))
+        values = oe.bbenvcache.store('foo', None, self.bbenv, self.cachedir)
+        self.assertEqual(oe.bbenvcache.load('foo', None, self.cachedir), values)
+        # Different target or postconfig
+        self.assertIsNone(oe.bbenvcache.load('bar', None, self.cachedir))
+        self.assertIsNone(oe.bbenvcache.load('foo', 'FOO = "1"', self.cachedir))
+        oe.bbenvcache.invalidate(self.cachedir)
+        self.assertIsNone(oe.bbenvcache.load('foo', None, self.cachedir))
+
+    def test_dependencies(self):
+        oe.bbenvcache.store(None, None, self.bbenv, self.cachedir)
+        self.assertIsNotNone(oe.bbenvcache.load(None, None, self.cachedir))
+        with open(self.inc, 'a') as f:
+            f.write('FOO = "bar"\n')
+        self.assertIsNone(oe.bbenvcache.load(None, None, self.cachedir))
+
+        oe.bbenvcache.store(None, None, self.bbenv, self.cachedir)
+        self.assertIsNotNone(oe.bbenvcache.load(None, None, self.cachedir))
+        # A new file next to a parsed one may now be included
+        open(os.path.join(os.path.dirname(self.conf), 'auto.conf'), 'w').close()
+        self.assertIsNone(oe.bbenvcache.load(None, None, self.cachedir))
+
+    def test_bbfiles(self):
+        oe.bbenvcache.store('foo', None, self.bbenv, self.cachedir)
+        self.assertIsNotNone(oe.bbenvcache.load('foo', None, self.cachedir))
+        # A bbappend in a new directory matched by BBFILES
+        appenddir = os.path.join(self.layer, 'recipes-core', 'bar')
+        os.makedirs(appenddir)
+        self.assertIsNone(oe.bbenvcache.load('foo', None, self.cachedir))
+
+        oe.bbenvcache.store('foo', None, self.bbenv, self.cachedir)
+        open(os.path.join(appenddir, 'bar.bbappend'), 'w').close()
+        self.assertIsNone(oe.bbenvcache.load('foo', None, self.cachedir))
+
+        oe.bbenvcache.store('foo', None, self.bbenv, self.cachedir)
+        os.makedirs(os.path.join(self.layer, 'recipes-test'))
+        self.assertIsNone(oe.bbenvcache.load('foo', None, self.cachedir))
+
+    def test_disabled(self):
+        env = {'BUILDDIR': self.tmpdir}
+        with unittest.mock.patch.dict(os.environ, env):
+            self.assertEqual(oe.bbenvcache.cache_dir(), os.path.join(self.tmpdir, 'cache', 'bbenv'))
+            oe.bbenvcache.store('foo', None, self.bbenv)
+            self.assertIsNotNone(oe.bbenvcache.load('foo', None))
+        env['OE_BBENV_NOCACHE'] = '1'
+        with unittest.mock.patch.dict(os.environ, env):
+            self.assertIsNone(oe.bbenvcache.cache_dir())
+            self.assertIsNone(oe.bbenvcache.load('foo', None))
@@ -0,0 +1,50 @@
+from unittest.case import TestCase
+import oe.buildhistory
+import tempfile
+import os
+import shutil
+import subprocess
+
+class TestBuildhistoryWriter(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='oe-test_buildhistory')
+        self.pkgdest = os.path.join(self.tmpdir, 'packages-split')
+        self.histdir = os.path.join(self.tmpdir, 'buildhistory')
+        pkgdir = os.path.join(self.pkgdest, 'foo')
+        for d in ['usr/bin', 'usr/lib/Foo', 'etc']:
+            os.makedirs(os.path.join(pkgdir, d))
+        for f in ['usr/bin/foo', 'usr/bin/Bar', 'usr/lib/Foo/with space', 'usr/lib/_x', 'usr/lib/.hidden', 'etc/foo.conf']:
+            with open(os.path.join(pkgdir, f), 'w') as fh:
+                fh.write(f)
+        os.chmod(os.path.join(pkgdir, 'usr/bin/foo'), 0o4755)
+        os.symlink('foo', os.path.join(pkgdir, 'usr/bin/foo-link'))
+        os.symlink('../lib', os.path.join(pkgdir, 'usr/bin/lib'))
+        os.makedirs(os.path.join(self.pkgdest, 'foo-dev'))
+        os.makedirs(os.path.join(self.histdir, 'foo'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_list_files(self):
+        # Must match what buildhistory_list_files produces
+        pkgdir = os.path.join(self.pkgdest, 'foo')
+        expected = subprocess.check_output('find . ! -path . -printf "%M %-10u %-10g %10s %p -> %l\\n" | sort -k5 | sed \'s/ * -> $//\'',
+                                           shell=True, cwd=pkgdir).decode('utf-8')
+        self.assertEqual(oe.buildhistory.list_files(pkgdir), expected)
+
+    def test_write_if_changed(self):
+        path = os.path.join(self.tmpdir, 'latest')
+        self.assertTrue(oe.buildhistory.write_if_changed(path, 'PV = 1.0\n'))
+        mtime = os.stat(path).st_mtime_ns
+        self.assertFalse(oe.buildhistory.write_if_changed(path, 'PV = 1.0\n'))
+        self.assertEqual(os.stat(path).st_mtime_ns, mtime)
+        self.assertTrue(oe.buildhistory.write_if_changed(path, 'PV = 1.1\n'))
+        with open(path) as f:
+            self.assertEqual(f.read(), 'PV = 1.1\n')
+
+    def test_pkg_file_lists(self):
+        # Only packages with a history directory get a listing
+        self.assertEqual(oe.buildhistory.write_pkg_file_lists(self.pkgdest, self.histdir, ['foo', 'foo-dev']), 1)
+        self.assertTrue(os.path.exists(os.path.join(self.histdir, 'foo', 'files-in-package.txt')))
+        self.assertFalse(os.path.exists(os.path.join(self.histdir, 'foo-dev')))
+        self.assertEqual(oe.buildhistory.write_pkg_file_lists(self.pkgdest, self.histdir, ['foo', 'foo-dev']), 0)
@@ -1,5 +1,8 @@
 from unittest.case import TestCase
 import oe.qa
+import os
+import subprocess
+import tempfile
 
 class TestElf(TestCase):
     def test_machine_name(self):
@@ -19,3 +22,247 @@ class TestElf(TestCase):
         self.assertEqual(oe.qa.elf_machine_to_string(0x00), "Unknown (0)")
         self.assertEqual(oe.qa.elf_machine_to_string(0xDEADBEEF), "Unknown (3735928559)")
         self.assertEqual(oe.qa.elf_machine_to_string("foobar"), "Unknown ('foobar')")
+
+class TestElfClassifier(TestCase):
+    """
+    Check oe.package.is_elf() against the previous 'file -b' based
+    classification over a corpus of host binaries and freshly built objects
+    """
+    CORPUS_DIRS = ["/bin", "/usr/bin", "/lib", "/usr/lib", "/lib64", "/usr/lib64"]
+    CORPUS_MAX = 300
+
+    def setUp(self):
+        import shutil
+        if not shutil.which("file"):
+            self.skipTest("'file' is not available")
+        self.tmpdir = tempfile.mkdtemp(prefix="oe-test_elf")
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.tmpdir)
+
+    @staticmethod
+    def file_type(path):
+        # The classification split_and_strip_files used to derive from 'file'
+        output = subprocess.check_output(["file", "-b", path], universal_newlines=True)
+        exec_type = 0
+        if "ELF" in output:
+            exec_type |= 1
+            if "not stripped" not in output:
+                exec_type |= 2
+            if "executable" in output:
+                exec_type |= 4
+            if "shared" in output:
+                exec_type |= 8
+        return exec_type, output
+
+    def build_corpus(self):
+        import shutil
+        files = []
+        cc = shutil.which("cc") or shutil.which("gcc")
+        if cc:
+            src = os.path.join(self.tmpdir, "test.c")
+            with open(src, "w") as f:
+                f.write("int foo(void) { return 42; }\nint main(void) { return foo(); }\n")
+            variants = {
+                "test.o": ["-c"],
+                "test-pie": ["-fPIE", "-pie"],
+                "test-nopie": ["-no-pie"],
+                "test-static": ["-static"],
+                "test-debug": ["-g"],
+                "libtest.so": ["-shared", "-fPIC"],
+            }
+            for name, flags in sorted(variants.items()):
+                out = os.path.join(self.tmpdir, name)
+                if subprocess.call([cc] + flags + ["-o", out, src], stderr=subprocess.DEVNULL) == 0:
+                    files.append(out)
+                    stripped = out + "-stripped"
+                    shutil.copy(out, stripped)
+                    if subprocess.call(["strip", stripped], stderr=subprocess.DEVNULL) == 0:
+                        files.append(stripped)
+
+        for d in self.CORPUS_DIRS:
+            if not os.path.isdir(d):
+                continue
+            for root, dirs, names in os.walk(d):
+                for name in sorted(names):
+                    path = os.path.join(root, name)
+                    if os.path.isfile(path) and not os.path.islink(path):
+                        files.append(path)
+                if len(files) >= self.CORPUS_MAX:
+                    return files
+        return files
+
+    def test_compare_with_file(self):
+        import oe.package
+
+        files = self.build_corpus()
+        if not files:
+            self.skipTest("No binaries found to compare against")
+
+        checked = 0
+        for path in files:
+            try:
+                expected, output = self.file_type(path)
+            except (subprocess.CalledProcessError, UnicodeDecodeError):
+                continue
+            actual = oe.package.is_elf(path) & ~16
+            if actual != expected and "shared object" in output:
+                # file < 5.36 reports PIE executables as shared objects
+                with oe.qa.ELFFile(path) as elf:
+                    elf.open()
+                    if elf.isPIE():
+                        expected = (expected & ~8) | 4
+            self.assertEqual(actual, expected, "%s: is_elf() returned %d, 'file' says %s" % (path, actual, output.strip()))
+            checked += 1
+        self.assertTrue(checked)
+
+    def test_kernel_module(self):
+        import oe.package
+        import shutil
+
+        cc = shutil.which("cc") or shutil.which("gcc")
+        if not cc:
+            self.skipTest("No compiler available")
+        src = os.path.join(self.tmpdir, "mod.c")
+        with open(src, "w") as f:
+            f.write('const char __modinfo[] = "vermagic=4.14.0 SMP mod_unload";\n')
+        out = os.path.join(self.tmpdir, "mod.ko")
+        subprocess.check_call([cc, "-c", "-o", out, src])
+        self.assertEqual(oe.package.is_elf(out) & 16, 16)
+
+    def test_not_elf(self):
+        import oe.package
+
+        path = os.path.join(self.tmpdir, "script")
+        with open(path, "w") as f:
+            f.write("#!/bin/sh\necho ELF\n")
+        self.assertEqual(oe.package.is_elf(path), 0)
+        empty = os.path.join(self.tmpdir, "empty")
+        open(empty, "w").close()
+        self.assertEqual(oe.package.is_elf(empty), 0)
+        self.assertEqual(oe.package.is_elf(self.tmpdir), 0)
+
+class TestElfDynamic(TestCase):
+    """
+    Check the ELFFile dynamic section reader against 'objdump -p'
+    """
+    CORPUS_DIRS = ["/bin", "/usr/bin", "/lib", "/usr/lib", "/lib64", "/usr/lib64"]
+    CORPUS_MAX = 300
+
+    def setUp(self):
+        import shutil
+        if not shutil.which("objdump"):
+            self.skipTest("'objdump' is not available")
+        self.tmpdir = tempfile.mkdtemp(prefix="oe-test_elf")
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.tmpdir)
+
+    @staticmethod
+    def objdump_info(path):
+        # The way package_do_shlibs used to parse 'objdump -p'
+        import re
+        output = subprocess.run(["objdump", "-p", path], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, universal_newlines=True).stdout
+        needed = []
+        sonames = []
+        rpath = None
+        for l in output.splitlines():
+            m = re.match(r"\s+RPATH\s+([^\s]*)", l)
+            if m:
+                rpath = m.group(1)
+            m = re.match(r"\s+NEEDED\s+([^\s]*)", l)
+            if m:
+                needed.append(m.group(1))
+            m = re.match(r"\s+SONAME\s+([^\s]*)", l)
+            if m:
+                sonames.append(m.group(1))
+        return (needed, sonames, rpath)
+
+    def build_corpus(self):
+        import shutil
+        files = []
+        cc = shutil.which("cc") or shutil.which("gcc")
+        if cc:
+            src = os.path.join(self.tmpdir, "test.c")
+            with open(src, "w") as f:
+                f.write("#include <math.h>\nint foo(double x) { return (int)sqrt(x); }\nint main(void) { return foo(4.0); }\n")
+            variants = {
+                "libtest.so.1": ["-shared", "-fPIC", "-Wl,-soname,libtest.so.1", "-lm"],
+                "test-rpath": ["-Wl,--disable-new-dtags,-rpath,$ORIGIN/../lib:/opt/lib", "-lm"],
+                "test-runpath": ["-Wl,--enable-new-dtags,-rpath,/opt/lib", "-lm"],
+                "test-static": ["-static", "-lm"],
+                "test.o": ["-c"],
+            }
+            for name, flags in sorted(variants.items()):
+                out = os.path.join(self.tmpdir, name)
+                if subprocess.call([cc, "-o", out, src] + flags, stderr=subprocess.DEVNULL) == 0:
+                    files.append(out)
+
+        for d in self.CORPUS_DIRS:
+            if not os.path.isdir(d):
+                continue
+            for root, dirs, names in os.walk(d):
+                for name in sorted(names):
+                    path = os.path.join(root, name)
+                    if os.path.isfile(path) and not os.path.islink(path):
+                        files.append(path)
+                if len(files) >= self.CORPUS_MAX:
+                    return files
+        return files
+
+    def test_compare_with_objdump(self):
+        import oe.package
+
+        files = self.build_corpus()
+        if not files:
+            self.skipTest("No binaries found to compare against")
+
+        for path in files:
+            with self.subTest(path=path):
+                self.assertEqual(oe.package.elf_dynamic_info(path), self.objdump_info(path))
+
+    def test_rpath(self):
+        import oe.package
+        import shutil
+
+        cc = shutil.which("cc") or shutil.which("gcc")
+        if not cc:
+            self.skipTest("No compiler available")
+        src = os.path.join(self.tmpdir, "test.c")
+        with open(src, "w") as f:
+            f.write("int main(void) { return 0; }\n")
+        out = os.path.join(self.tmpdir, "test")
+        subprocess.check_call([cc, "-o", out, src, "-Wl,--disable-new-dtags,-rpath,$ORIGIN/../lib"])
+        needed, sonames, rpath = oe.package.elf_dynamic_info(out)
+        self.assertIn("libc.so.6", needed)
+        self.assertEqual(sonames, [])
+        self.assertEqual(rpath, "$ORIGIN/../lib")
+        with oe.qa.ELFFile(out) as elf:
+            elf.open()
+            self.assertEqual(elf.rpath(), ["$ORIGIN/../lib"])
+            self.assertEqual(elf.runpath(), [])
+            self.assertIsNone(elf.soname())
+
+    def test_dynamic_tags(self):
+        # The tags do_package_qa's textrel and ldflags checks look for
+        import re
+        files = self.build_corpus()
+        for path in files:
+            output = subprocess.run(["objdump", "-p", path], stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL, universal_newlines=True).stdout
+            try:
+                with oe.qa.ELFFile(path) as elf:
+                    elf.open()
+                    tags = (elf.hasDynamicTag(oe.qa.ELFFile.DT_SYMTAB),
+                            elf.hasDynamicTag(oe.qa.ELFFile.DT_GNU_HASH),
+                            elf.hasDynamicTag(oe.qa.ELFFile.DT_TEXTREL))
+            except oe.qa.NotELFFileError:
+                tags = (False, False, False)
+            expected = (re.search(r"^\s+SYMTAB\s", output, re.MULTILINE) is not None,
+                        re.search(r"^\s+GNU_HASH\s", output, re.MULTILINE) is not None,
+                        re.search(r"^\s+TEXTREL\s", output, re.MULTILINE) is not None)
+            with self.subTest(path=path):
+                self.assertEqual(tags, expected)
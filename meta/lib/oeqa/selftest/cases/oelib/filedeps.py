@@ -0,0 +1,82 @@
+from unittest.case import TestCase
+import oe.package
+import tempfile
+import os
+import shutil
+import stat
+import sys
+
+# Stands in for rpmdeps --alldeps: every file provides itself, and requires
+# whatever its first line names. Each invocation is logged.
+FAKE_RPMDEPS = """#!%s
+import sys
+with open(sys.argv[1], 'a') as log:
+    log.write(' '.join(sys.argv[2:]) + '\\n')
+for i, f in enumerate(sys.argv[2:]):
+    print('%%3d %%s' %% (i, f))
+    print('\\tP file(%%s)' %% f.split('/')[-1])
+    with open(f) as fh:
+        req = fh.readline().strip()
+    if req:
+        print('\\tR %%s' %% req)
+"""
+
+class TestFileDeps(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='oe-test_filedeps')
+        self.pkgdest = os.path.join(self.tmpdir, 'packages-split')
+        self.cachedir = os.path.join(self.tmpdir, 'cache')
+        self.log = os.path.join(self.tmpdir, 'rpmdeps.log')
+        tooldir = os.path.join(self.tmpdir, 'rpm')
+        os.makedirs(tooldir)
+        self.rpmdeps = os.path.join(tooldir, 'rpmdeps')
+        with open(self.rpmdeps, 'w') as f:
+            f.write(FAKE_RPMDEPS % sys.executable)
+        os.chmod(self.rpmdeps, stat.S_IRWXU)
+        self.files = [self.write('usr/bin/foo', 'libc.so.6\n'),
+                      self.write('usr/share/foo/data', '')]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, relpath, content):
+        path = os.path.join(self.pkgdest, 'foo', relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def run_filedeps(self, cache=True):
+        rpmdeps = '%s %s' % (self.rpmdeps, self.log)
+        arg = ('foo', self.files, rpmdeps, self.pkgdest)
+        if cache:
+            arg += (self.cachedir, oe.package.filedeps_tool_id(rpmdeps))
+        return oe.package.filedeprunner(arg)
+
+    def scanned(self):
+        if not os.path.exists(self.log):
+            return []
+        with open(self.log) as f:
+            return [line.split() for line in f]
+
+    def test_uncached(self):
+        pkg, provides, requires = self.run_filedeps(cache=False)
+        self.assertEqual(pkg, 'foo')
+        self.assertEqual(provides, {'/usr/bin/foo': ['file(foo)'], '/usr/share/foo/data': ['file(data)']})
+        self.assertEqual(requires, {'/usr/bin/foo': ['libc.so.6']})
+        self.assertFalse(os.path.exists(self.cachedir))
+
+    def test_cached(self):
+        first = self.run_filedeps()
+        self.assertEqual(len(self.scanned()), 1)
+
+        # Nothing changed, so rpmdeps isn't run again
+        self.assertEqual(self.run_filedeps(), first)
+        self.assertEqual(len(self.scanned()), 1)
+
+        # Only the modified file is rescanned
+        self.write('usr/bin/foo', 'libm.so.6\n')
+        pkg, provides, requires = self.run_filedeps()
+        self.assertEqual(self.scanned()[-1], [self.files[0]])
+        self.assertEqual(list(provides), ['/usr/bin/foo', '/usr/share/foo/data'])
+        self.assertEqual(requires, {'/usr/bin/foo': ['libm.so.6']})
@@ -0,0 +1,67 @@
+from unittest.case import TestCase
+import oe.pkgdataindex
+import tempfile
+import os
+import shutil
+
+class TestPkgDataIndex(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='oe-test_pkgdataindex')
+        self.pkgdatadir = os.path.join(self.tmpdir, 'pkgdata')
+        self.dbfile = os.path.join(self.tmpdir, 'index', 'pkgdata.sqlite')
+        os.makedirs(os.path.join(self.pkgdatadir, 'runtime'))
+        self.write('foo', 'PACKAGES: foo foo-dev\n')
+        self.write('bar', 'PACKAGES: bar\n')
+        self.write('runtime/foo', 'PN: foo\nFILES_INFO: {"/usr/bin/foo": 10}\nDESCRIPTION: caf\\u00e9\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, relpath, content):
+        with open(os.path.join(self.pkgdatadir, relpath), 'w') as f:
+            f.write(content)
+
+    def test_parse(self):
+        data = oe.pkgdataindex.parse_pkgdatafile(os.path.join(self.pkgdatadir, 'runtime/foo'))
+        self.assertEqual(data, {'PN': 'foo', 'FILES_INFO': '{"/usr/bin/foo": 10}', 'DESCRIPTION': 'café'})
+
+    def test_read(self):
+        fn = os.path.join(self.pkgdatadir, 'runtime/foo')
+        index = oe.pkgdataindex.PkgDataIndex(self.dbfile)
+        self.assertEqual(index.read(fn)['PN'], 'foo')
+        self.assertEqual(index.read(os.path.join(self.pkgdatadir, 'runtime/missing')), {})
+
+        # A fresh index is served from the database
+        index = oe.pkgdataindex.PkgDataIndex(self.dbfile)
+        self.assertEqual(index.read(fn)['DESCRIPTION'], 'café')
+        self.assertIn(fn, index.cache)
+
+        # Returned dictionaries can be modified without affecting the cache
+        index.read(fn)['PN'] = 'modified'
+        self.assertEqual(index.read(fn)['PN'], 'foo')
+
+    def test_rewritten(self):
+        fn = os.path.join(self.pkgdatadir, 'runtime/foo')
+        index = oe.pkgdataindex.PkgDataIndex(self.dbfile)
+        self.assertEqual(index.read(fn)['PN'], 'foo')
+        self.write('runtime/foo', 'PN: foo-renamed\n')
+        self.assertEqual(index.read(fn), {'PN': 'foo-renamed'})
+        index = oe.pkgdataindex.PkgDataIndex(self.dbfile)
+        self.assertEqual(index.read(fn), {'PN': 'foo-renamed'})
+
+    def test_read_dir(self):
+        index = oe.pkgdataindex.PkgDataIndex(self.dbfile)
+        self.assertEqual(index.read_dir(self.pkgdatadir),
+                         {'foo': {'PACKAGES': 'foo foo-dev'}, 'bar': {'PACKAGES': 'bar'}})
+        os.unlink(os.path.join(self.pkgdatadir, 'bar'))
+        self.write('baz', 'PACKAGES: baz\n')
+        index = oe.pkgdataindex.PkgDataIndex(self.dbfile)
+        self.assertEqual(index.read_dir(self.pkgdatadir),
+                         {'foo': {'PACKAGES': 'foo foo-dev'}, 'baz': {'PACKAGES': 'baz'}})
+        with self.assertRaises(OSError):
+            index.read_dir(os.path.join(self.tmpdir, 'missing'))
+
+    def test_no_database(self):
+        index = oe.pkgdataindex.PkgDataIndex()
+        self.assertEqual(index.read(os.path.join(self.pkgdatadir, 'bar')), {'PACKAGES': 'bar'})
+        self.assertFalse(os.path.exists(self.dbfile))
@@ -0,0 +1,49 @@
+from unittest.case import TestCase
+import oe.pkgdatautil
+import tempfile
+import os
+import shutil
+
+class TestPkgDataGlob(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='oe-test_pkgdatautil')
+        os.makedirs(os.path.join(self.tmpdir, 'runtime'))
+        os.makedirs(os.path.join(self.tmpdir, 'runtime-reverse'))
+        # zlib is renamed to libz1 by debian.bbclass, zlib-doc wasn't packaged
+        self.add_package('zlib', 'zlib', 'libz1')
+        self.add_package('zlib', 'zlib-dev', 'libz-dev')
+        self.add_package('zlib', 'zlib-dbg', 'zlib-dbg')
+        self.add_package('zlib', 'zlib-doc', 'zlib-doc', packaged=False)
+        self.add_package('busybox', 'busybox', 'busybox')
+        self.add_package('busybox', 'busybox-dev', 'busybox-dev')
+        self.add_package('busybox', 'busybox-syslog', 'busybox-syslog')
+        self.add_package('glibc', 'glibc-locale-de', 'glibc-locale-de')
+        self.pkgdata = oe.pkgdatautil.PkgData(self.tmpdir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def add_package(self, pn, pkg, rpkg, packaged=True):
+        fwd = os.path.join(self.tmpdir, 'runtime', pkg)
+        with open(fwd, 'w') as f:
+            f.write('PN: %s\nPKG_%s: %s\n' % (pn, pkg, rpkg))
+        if packaged:
+            open(fwd + '.packaged', 'w').close()
+        os.symlink(os.path.join('..', 'runtime', pkg), os.path.join(self.tmpdir, 'runtime-reverse', rpkg))
+
+    def test_glob(self):
+        pkgs = ['libz1', 'busybox', 'busybox-syslog', 'libz-dev', 'glibc-locale-de', 'notapackage']
+        self.assertEqual(self.pkgdata.glob(pkgs, ['*-dev']), {'busybox-dev'})
+        self.assertEqual(self.pkgdata.glob(pkgs, ['*-dbg', '*-doc']), {'zlib-dbg'})
+        self.assertEqual(self.pkgdata.glob(['libz1', 'busybox'], ['*-dev']), {'libz-dev', 'busybox-dev'})
+        self.assertEqual(self.pkgdata.glob(['libz1', 'busybox'], ['*-dev'], exclude='^busybox'), {'libz-dev'})
+
+    def test_glob_batch(self):
+        pkgs = ['libz1', 'busybox']
+        self.assertEqual(self.pkgdata.glob_batch(pkgs, [['*-dev'], ['*-dbg'], ['*-locale-de']]),
+                         [{'libz-dev', 'busybox-dev'}, {'zlib-dbg'}, set()])
+
+    def test_list_pkgs(self):
+        self.assertEqual(self.pkgdata.list_pkgs(['zlib*']), ['zlib', 'zlib-dbg', 'zlib-dev'])
+        self.assertEqual(self.pkgdata.list_pkgs(['*-dev', 'glibc-*']), ['busybox-dev', 'glibc-locale-de', 'zlib-dev'])
+        self.assertEqual(self.pkgdata.list_pkgs(['nomatch']), [])
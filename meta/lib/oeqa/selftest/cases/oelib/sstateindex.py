@@ -0,0 +1,69 @@
+from unittest.case import TestCase
+import oe.sstateindex
+import tempfile
+import os
+import shutil
+
+class TestSStateIndex(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='oe-test_sstateindex')
+        self.sstatedir = os.path.join(self.tmpdir, 'sstate-cache')
+        self.indexfile = os.path.join(self.tmpdir, 'cache', 'sstate-index.dat')
+        for f in ['ab/sstate:foo::1.0:r0::3:abcd_populate_lic.tgz',
+                  'ab/sstate:foo::1.0:r0::3:abcd_populate_lic.tgz.siginfo',
+                  'universal/cd/sstate:bar-native:x86_64-linux:1.0:r0:x86_64:3:cdef_populate_sysroot.tgz']:
+            self.touch(f)
+        self.age('ab', 'universal/cd')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def touch(self, relpath):
+        path = os.path.join(self.sstatedir, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'w').close()
+
+    def age(self, *reldirs):
+        # Move directory mtimes into the past so the index trusts them
+        for reldir in reldirs:
+            os.utime(os.path.join(self.sstatedir, reldir), (1000000000, 1000000000))
+
+    def test_exists(self):
+        index = oe.sstateindex.SStateIndex(self.sstatedir)
+        self.assertTrue(index.exists('ab/sstate:foo::1.0:r0::3:abcd_populate_lic.tgz'))
+        self.assertTrue(index.exists('universal/cd/sstate:bar-native:x86_64-linux:1.0:r0:x86_64:3:cdef_populate_sysroot.tgz'))
+        self.assertFalse(index.exists('ab/sstate:foo::1.0:r0::3:abcd_populate_lic.tar.zst'))
+        self.assertFalse(index.exists('ef/sstate:foo::1.0:r0::3:ef01_populate_lic.tgz'))
+
+    def test_persistent(self):
+        index = oe.sstateindex.SStateIndex(self.sstatedir, self.indexfile)
+        self.assertTrue(index.exists('ab/sstate:foo::1.0:r0::3:abcd_populate_lic.tgz'))
+        index.save()
+        self.assertTrue(os.path.exists(self.indexfile))
+
+        # An unchanged directory is served from the index without rescanning
+        index = oe.sstateindex.SStateIndex(self.sstatedir, self.indexfile)
+        self.assertIn('ab', index.dirs)
+        self.assertTrue(index.exists('ab/sstate:foo::1.0:r0::3:abcd_populate_lic.tgz'))
+        self.assertFalse(index.dirty)
+
+        # Adding a file changes the directory mtime and invalidates the entry
+        self.touch('ab/sstate:foo::1.0:r0::3:abef_populate_lic.tgz')
+        index = oe.sstateindex.SStateIndex(self.sstatedir, self.indexfile)
+        self.assertTrue(index.exists('ab/sstate:foo::1.0:r0::3:abef_populate_lic.tgz'))
+        self.assertTrue(index.dirty)
+
+    def test_recently_modified(self):
+        # Directories modified just before the scan must be rescanned next time
+        self.touch('ef/sstate:foo::1.0:r0::3:ef01_populate_lic.tgz')
+        index = oe.sstateindex.SStateIndex(self.sstatedir, self.indexfile)
+        self.assertTrue(index.exists('ef/sstate:foo::1.0:r0::3:ef01_populate_lic.tgz'))
+        self.assertIsNone(index.dirs['ef'][0])
+
+    def test_corrupt_index(self):
+        os.makedirs(os.path.dirname(self.indexfile))
+        with open(self.indexfile, 'w') as f:
+            f.write('garbage')
+        index = oe.sstateindex.SStateIndex(self.sstatedir, self.indexfile)
+        self.assertEqual(index.dirs, {})
+        self.assertTrue(index.exists('ab/sstate:foo::1.0:r0::3:abcd_populate_lic.tgz'))
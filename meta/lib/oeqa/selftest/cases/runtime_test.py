@@ -165,6 +165,37 @@ class TestImage(OESelftestTestCase):
         # remove the oeqa-feed-sign temporal directory
         shutil.rmtree(self.gpg_home, ignore_errors=True)
 
+    def test_testimage_qemu_snapshot(self):
+        """
+        Summary: Check restoring a snapshot of qemu between test modules
+        Expected: 1. The test modules pass when run from the snapshot
+                     saved after boot
+                  2. The snapshot is saved once and loaded when each test
+                     module after the first one starts
+        """
+        if get_bb_var('DISTRO') == 'poky-tiny':
+            self.skipTest('core-image-full-cmdline not buildable for poky-tiny')
+
+        features = 'INHERIT += "testimage"\n'
+        features += 'TEST_SUITES = "ping ssh date df"\n'
+        features += 'TESTIMAGE_QEMU_SNAPSHOT = "1"\n'
+        features += 'IMAGE_FSTYPES += "ext4"\n'
+        self.write_config(features)
+
+        bitbake('core-image-full-cmdline')
+        bitbake('-c testimage core-image-full-cmdline')
+
+        # testimage falls back to running without restores if qemu can't
+        # save the snapshot, check it didn't
+        logfile = os.path.join(get_bb_var('T', 'core-image-full-cmdline'), 'log.do_testimage')
+        with open(logfile) as f:
+            log = f.read()
+        self.assertNotIn("Couldn't save snapshot", log)
+        self.assertNotIn("Couldn't load snapshot", log)
+        self.assertEqual(log.count('Saved snapshot oeqa-boot'), 1, msg=log)
+        # One restore for each of ssh, date and df
+        self.assertEqual(log.count('Loaded snapshot oeqa-boot'), 3, msg=log)
+
 class Postinst(OESelftestTestCase):
     @OETestID(1540)
     @OETestID(1545)
@@ -826,6 +826,89 @@ part /etc --source rootfs --ondisk mmcblk0 --fstype=ext4 --exclude-path bin/ --r
                 self.assertEqual(dest_stat.st_blocks, 8)
             os.unlink(dest)
 
+    def test_partition_table(self):
+        """Test that the partition table writer matches parted and sgdisk"""
+        libpath = os.path.join(get_bb_var('COREBASE'), 'scripts', 'lib')
+        sys.path.insert(0, libpath)
+        from wic.partitiontable import PartitionTable
+
+        sectors = 400000
+        identifier = 0x2e5a1f07
+        # num, start, size, fstype, active, name, type guid, uuid
+        layouts = {
+            'msdos': [(1, 2048, 16384, 'vfat', True, None, None, None),
+                      (2, 20480, 65536, 'ext4', False, None, None, None),
+                      (3, 86016, 8192, 'swap', False, None, None, None),
+                      (5, 96257, 40960, 'ext4', True, None, None, None),
+                      (6, 137218, 40960, 'msdos', False, None, None, None)],
+            'gpt': [(1, 2048, 16384, 'vfat', True, 'boot', None,
+                     '7a6e4f1c-2b61-4d47-9f5e-5d1f5c0a3b11'),
+                    (2, 20480, 65536, 'ext4', False, None,
+                     '933ac7e1-2eb4-4f13-b844-0e14e2aef915',
+                     'c1b3e8a0-6f1b-4a4e-8d26-3e0cf1e1a2b2'),
+                    (3, 86016, 8192, 'swap', False, None, None,
+                     '0f8e2f3e-3c44-4f0d-9c77-55c2d4e4c5d3')]}
+        parted_fs = {'vfat': 'fat32', 'msdos': 'fat16', 'swap': 'linux-swap'}
+
+        def run(cmd):
+            return runCmd(cmd, native_sysroot=self.native_sysroot).output
+
+        for ptable_format, parts in layouts.items():
+            with NamedTemporaryFile(suffix='.wic-ptable') as ref, \
+                 NamedTemporaryFile(suffix='.wic-ptable') as new:
+                for img in (ref, new):
+                    img.truncate(sectors * 512)
+                    img.flush()
+
+                # What wic used to run for each partition
+                run('parted -s %s mklabel %s' % (ref.name, ptable_format))
+                with open(ref.name, 'r+b') as img:
+                    img.seek(0x1B8)
+                    img.write(identifier.to_bytes(4, 'little'))
+                table = PartitionTable(ptable_format, sectors, identifier)
+                for num, start, size, fstype, active, name, ptype, puuid in parts:
+                    kind = 'primary'
+                    if num == 5:
+                        end = parts[-1][1] + parts[-1][2]
+                        run('parted -s %s unit s mkpart extended %d %d' %
+                            (ref.name, start - 1, end - 1))
+                        table.add_extended(start - 1, end - start + 1)
+                    if num > 4:
+                        kind = 'logical'
+                    run('parted -s %s unit s mkpart %s %s %d %d' %
+                        (ref.name, kind, parted_fs.get(fstype, 'ext2'),
+                         start, start + size - 1))
+                    system_id = None
+                    if fstype == 'msdos':
+                        system_id = '0x6'
+                        run('sfdisk --part-type %s %d %s' % (ref.name, num, system_id))
+                    if ptype:
+                        run('sgdisk --typecode=%d:%s %s' % (num, ptype, ref.name))
+                    if puuid:
+                        run('sgdisk --partition-guid=%d:%s %s' % (num, puuid, ref.name))
+                    if name:
+                        run('parted -s %s name %d %s' % (ref.name, num, name))
+                    if active:
+                        flag = 'legacy_boot' if ptable_format == 'gpt' else 'boot'
+                        run('parted -s %s set %d %s on' % (ref.name, num, flag))
+                    table.add_partition(num, start, size, fstype=fstype,
+                                        system_id=system_id, type_guid=ptype,
+                                        part_uuid=puuid, name=name,
+                                        bootable=active)
+                table.write(new.name)
+
+                def dump(path):
+                    # The disk GUID is random
+                    return [line.replace(path, 'img') for line in
+                            run('sfdisk -d %s' % path).splitlines()
+                            if not (ptable_format == 'gpt' and
+                                    line.startswith('label-id:'))]
+                self.assertEqual(dump(ref.name), dump(new.name))
+                self.assertEqual(run('parted -m -s %s unit s print' % ref.name).replace(ref.name, 'img'),
+                                 run('parted -m -s %s unit s print' % new.name).replace(new.name, 'img'))
+                if ptable_format == 'gpt':
+                    self.assertIn('No problems found', run('sgdisk -v %s' % new.name))
+
     @OETestID(1857)
     def test_wic_ls(self):
         """Test listing image content using 'wic ls'"""
@@ -1064,3 +1147,86 @@ part /etc --source rootfs --ondisk mmcblk0 --fstype=ext4 --exclude-path bin/ --r
         result = runCmd("wic ls %s:2/etc/ -n %s" % (images[0], sysroot))
         self.assertEqual(0, result.status)
         self.assertTrue('fstab' not in [line.split()[-1] for line in result.output.split('\n') if line])
+
+    def test_direct_write(self):
+        """Test creating rootfs partitions directly in the image."""
+        sysroot = get_bb_var('RECIPE_SYSROOT_NATIVE', 'wic-tools')
+        results = []
+        for opts in ('', '--direct-write'):
+            rmtree(self.resultdir, ignore_errors=True)
+            self.assertEqual(0, runCmd("wic create wictestdisk "
+                                       "--image-name=core-image-minimal %s "
+                                       "-o %s" % (opts, self.resultdir)).status)
+            images = glob(self.resultdir + "wictestdisk-*.direct")
+            self.assertEqual(1, len(images))
+
+            # same partition layout and rootfs content either way
+            result = runCmd("wic ls %s -n %s" % (images[0], sysroot))
+            self.assertEqual(0, result.status)
+            layout = result.output
+            result = runCmd("wic ls %s:2/usr/bin/ -n %s" % (images[0], sysroot))
+            self.assertEqual(0, result.status)
+            files = set(line.split()[-1] for line in result.output.split('\n') if line)
+            results.append((layout, files))
+        self.assertEqual(results[0], results[1])
+
+    def test_direct_write_extraopts(self):
+        """Test that --direct-write keeps the -E options of --mkfs-extraopts"""
+        libpath = os.path.join(get_bb_var('COREBASE'), 'scripts', 'lib')
+        sys.path.insert(0, libpath)
+        from wic.partition import add_extended_option
+        self.assertEqual(add_extended_option("-F -i 8192", "offset=512"),
+                         "-F -i 8192 -E offset=512")
+        self.assertEqual(add_extended_option("-E lazy_itable_init=1 -F", "offset=512"),
+                         "-E lazy_itable_init=1,offset=512 -F")
+        self.assertEqual(add_extended_option("-F -Elazy_itable_init=1", "offset=512"),
+                         "-F -Elazy_itable_init=1,offset=512")
+        self.assertEqual(add_extended_option("-E root_owner=0:0 -Enodiscard", "offset=512"),
+                         "-E root_owner=0:0 -Enodiscard,offset=512")
+
+        sysroot = get_bb_var('RECIPE_SYSROOT_NATIVE', 'wic-tools')
+        with NamedTemporaryFile("w", suffix=".wks") as wks:
+            wks.write('part / --fstype ext4 --source rootfs '
+                      '--mkfs-extraopts "-F -i 8192 -Elazy_itable_init=1"\n')
+            wks.flush()
+            cmd = "wic create %s -e core-image-minimal --direct-write -o %s" % \
+                  (wks.name, self.resultdir)
+            self.assertEqual(0, runCmd(cmd).status)
+            wksname = os.path.splitext(os.path.basename(wks.name))[0]
+            images = glob(self.resultdir + "%s-*direct" % wksname)
+            self.assertEqual(1, len(images))
+        result = runCmd("wic ls %s:1/ -n %s" % (images[0], sysroot))
+        self.assertEqual(0, result.status)
+        self.assertIn('usr', result.output)
+
+    def test_wic_cp_rm_ext_multiple(self):
+        """Test copying and removing several files of the ext partition at once."""
+        self.assertEqual(0, runCmd("wic create wictestdisk "
+                                   "--image-name=core-image-minimal "
+                                   "-D -o %s" % self.resultdir).status)
+        images = glob(self.resultdir + "wictestdisk-*.direct")
+        self.assertEqual(1, len(images))
+
+        sysroot = get_bb_var('RECIPE_SYSROOT_NATIVE', 'wic-tools')
+
+        def ls(path):
+            result = runCmd("wic ls %s:2%s -n %s" % (images[0], path, sysroot))
+            self.assertEqual(0, result.status)
+            return set(line.split()[-1] for line in result.output.split('\n') if line)
+
+        with NamedTemporaryFile("w", suffix=".wic-cp") as file1, \
+             NamedTemporaryFile("w", suffix=".wic-cp") as file2:
+            names = set([os.path.basename(file1.name), os.path.basename(file2.name)])
+
+            # copy both files to a subdirectory with one command
+            result = runCmd("wic cp %s %s %s:2/etc/ -n %s" % (file1.name, file2.name,
+                                                             images[0], sysroot))
+            self.assertEqual(0, result.status)
+            self.assertTrue(names.issubset(ls('/etc/')))
+
+            # and remove them and fstab with another
+            result = runCmd("wic rm %s -n %s" % (' '.join("%s:2/etc/%s" % (images[0], name)
+                                                          for name in names | set(['fstab'])),
+                                                 sysroot))
+            self.assertEqual(0, result.status)
+            self.assertFalse((names | set(['fstab'])) & ls('/etc/'))
@@ -7,6 +7,7 @@ import glob
 import sys
 import imp
 import signal
+import shutil
 from shutil import copyfile
 from random import choice
 
@@ -14,6 +15,7 @@ import oeqa
 
 from oeqa.core.context import OETestContext, OETestContextExecutor
 from oeqa.core.exception import OEQAPreRun, OEQATestNotFound
+from oeqa.core.utils.concurrencytest import group_tests, run_forked
 
 from oeqa.utils.commands import runCmd, get_bb_vars, get_test_layer
 
@@ -25,15 +27,105 @@ class OESelftestTestContext(OETestContext):
         self.custommachine = None
         self.config_paths = config_paths
 
-    def runTests(self, machine=None, skips=[]):
+    def runTests(self, machine=None, skips=[], processes=1):
         if machine:
             self.custommachine = machine
             if machine == 'random':
                 self.custommachine = choice(self.machines)
             self.logger.info('Run tests with custom MACHINE set to: %s' % \
                     self.custommachine)
+        if processes > 1:
+            return self._runTestsParallel(skips, processes)
         return super(OESelftestTestContext, self).runTests(skips)
 
+    def _runTestsParallel(self, skips, processes):
+        self.skipTests(skips)
+
+        suites = group_tests(self, self.suites)
+        processes = min(processes, len(suites))
+        builddirs = [self._setup_builddir(num) for num in range(processes)]
+        self.logger.info('Running %d test groups in %d processes' % \
+                (len(suites), processes))
+
+        def _use_builddir(num):
+            builddir = builddirs[num]
+            os.environ['BUILDDIR'] = builddir
+            os.chdir(builddir)
+            self.config_paths = self._get_config_paths(builddir)
+            self.config_paths['testlayer_path'] = os.path.join(builddir,
+                    'meta-selftest')
+            self.td = get_bb_vars()
+
+        self._run_start_time = time.time()
+        result = run_forked(self, suites, processes, _use_builddir)
+        self._run_end_time = time.time()
+
+        return result
+
+    @staticmethod
+    def _get_config_paths(builddir):
+        config_paths = {}
+        config_paths['builddir'] = builddir
+        config_paths['localconf'] = os.path.join(builddir, "conf/local.conf")
+        config_paths['localconf_backup'] = \
+                os.path.join(builddir, "conf/local.conf.orig")
+        config_paths['localconf_class_backup'] = \
+                os.path.join(builddir, "conf/local.conf.bk")
+        config_paths['bblayers'] = os.path.join(builddir, "conf/bblayers.conf")
+        config_paths['bblayers_backup'] = \
+                os.path.join(builddir, "conf/bblayers.conf.orig")
+        config_paths['bblayers_class_backup'] = \
+                os.path.join(builddir, "conf/bblayers.conf.bk")
+        return config_paths
+
+    def _setup_builddir(self, num):
+        """
+        Sets up the build directory of test process num, next to the main
+        one, with its configuration and its own copy of the meta-selftest
+        layer, which the tests modify. TMPDIR is always the tmp directory
+        in it, even if local.conf sets another one, so that processes never
+        share it; the TMPDIR of a previous run is kept. DL_DIR and
+        SSTATE_DIR are the ones of the main build directory.
+        """
+        builddir = '%s-selftest-%d' % (self.config_paths['builddir'], num)
+        self.logger.info('Setting up build directory %s' % builddir)
+
+        confdir = os.path.join(builddir, 'conf')
+        if os.path.exists(confdir):
+            shutil.rmtree(confdir)
+        os.makedirs(confdir)
+        shutil.copyfile(self.config_paths['localconf_backup'],
+                os.path.join(confdir, 'local.conf'))
+        shutil.copyfile(self.config_paths['bblayers_backup'],
+                os.path.join(confdir, 'bblayers.conf'))
+        for name in os.listdir(os.path.join(self.config_paths['builddir'], 'conf')):
+            if name not in ['local.conf', 'bblayers.conf', 'selftest.inc',
+                    'bblayers.inc', 'machine.inc'] and \
+                    not name.endswith(('.orig', '.bk')):
+                src = os.path.join(self.config_paths['builddir'], 'conf', name)
+                if os.path.isfile(src):
+                    shutil.copy(src, confdir)
+
+        testlayer = os.path.join(builddir, 'meta-selftest')
+        if os.path.exists(testlayer):
+            shutil.rmtree(testlayer)
+        shutil.copytree(self.config_paths['testlayer_path'], testlayer,
+                symlinks=True)
+
+        testlayer_path = os.path.realpath(self.config_paths['testlayer_path'])
+        layers = [l for l in self.td['BBLAYERS'].split()
+                if os.path.realpath(l) != testlayer_path]
+        layers.append(testlayer)
+        with open(os.path.join(confdir, 'bblayers.conf'), 'a') as f:
+            f.write('\n# Added by oe-selftest -j\nBBLAYERS = "%s"\n' % ' '.join(layers))
+        with open(os.path.join(confdir, 'local.conf'), 'a') as f:
+            f.write('\n# Added by oe-selftest -j\n')
+            for var in ['DL_DIR', 'SSTATE_DIR']:
+                f.write('%s = "%s"\n' % (var, self.td[var]))
+            f.write('TMPDIR = "${TOPDIR}/tmp"\n')
+
+        return builddir
+
     def listTests(self, display_type, machine=None):
         return super(OESelftestTestContext, self).listTests(display_type)
 
@@ -70,6 +162,10 @@ class OESelftestTestContextExecutor(OETestContextExecutor):
 
         parser.add_argument('--machine', required=False, choices=['random', 'all'],
                             help='Run tests on different machines (random/all).')
+        parser.add_argument('-j', '--num-processes', required=False, type=int,
+                            default=1, dest='processes',
+                            help='Run the test classes in this many processes, each one with its own '
+                                 'build directory next to the current one sharing DL_DIR and SSTATE_DIR.')
         
         parser.set_defaults(func=self.run)
 
@@ -114,22 +210,10 @@ class OESelftestTestContextExecutor(OETestContextExecutor):
         self.tc_kwargs['init']['machines'] = self._get_available_machines()
 
         builddir = os.environ.get("BUILDDIR")
-        self.tc_kwargs['init']['config_paths'] = {}
+        self.tc_kwargs['init']['config_paths'] = \
+                self._context_class._get_config_paths(builddir)
         self.tc_kwargs['init']['config_paths']['testlayer_path'] = \
                 get_test_layer()
-        self.tc_kwargs['init']['config_paths']['builddir'] = builddir
-        self.tc_kwargs['init']['config_paths']['localconf'] = \
-                os.path.join(builddir, "conf/local.conf")
-        self.tc_kwargs['init']['config_paths']['localconf_backup'] = \
-                os.path.join(builddir, "conf/local.conf.orig")
-        self.tc_kwargs['init']['config_paths']['localconf_class_backup'] = \
-                os.path.join(builddir, "conf/local.conf.bk")
-        self.tc_kwargs['init']['config_paths']['bblayers'] = \
-                os.path.join(builddir, "conf/bblayers.conf")
-        self.tc_kwargs['init']['config_paths']['bblayers_backup'] = \
-                os.path.join(builddir, "conf/bblayers.conf.orig")
-        self.tc_kwargs['init']['config_paths']['bblayers_class_backup'] = \
-                os.path.join(builddir, "conf/bblayers.conf.bk")
 
         copyfile(self.tc_kwargs['init']['config_paths']['localconf'],
                 self.tc_kwargs['init']['config_paths']['localconf_backup'])
@@ -137,6 +221,7 @@ class OESelftestTestContextExecutor(OETestContextExecutor):
                 self.tc_kwargs['init']['config_paths']['bblayers_backup'])
 
         self.tc_kwargs['run']['skips'] = args.skips
+        self.tc_kwargs['run']['processes'] = args.processes
 
     def _pre_run(self):
         def _check_required_env_variables(vars):
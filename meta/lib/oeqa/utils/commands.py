@@ -223,47 +223,33 @@ def get_bb_env(target=None, postconfig=None):
         return bitbake("-e", postconfig=postconfig).output
 
 def get_bb_vars(variables=None, target=None, postconfig=None):
-    """Get values of multiple bitbake variables"""
-    bbenv = get_bb_env(target, postconfig=postconfig)
-
-    if variables is not None:
-        variables = list(variables)
-    var_re = re.compile(r'^(export )?(?P<var>\w+(_.*)?)="(?P<value>.*)"$')
-    unset_re = re.compile(r'^unset (?P<var>\w+)$')
-    lastline = None
-    values = {}
-    for line in bbenv.splitlines():
-        match = var_re.match(line)
-        val = None
-        if match:
-            val = match.group('value')
-        else:
-            match = unset_re.match(line)
-            if match:
-                # Handle [unexport] variables
-                if lastline.startswith('#   "'):
-                    val = lastline.split('"')[1]
-        if val:
-            var = match.group('var')
-            if variables is None:
-                values[var] = val
-            else:
-                if var in variables:
-                    values[var] = val
-                    variables.remove(var)
-                # Stop after all required variables have been found
-                if not variables:
-                    break
-        lastline = line
-    if variables:
-        # Fill in missing values
-        for var in variables:
-            values[var] = None
-    return values
+    """
+    Get values of multiple bitbake variables. The first non-empty value
+    bitbake -e prints for a variable is used; unset and empty variables
+    are None, or left out if no variables are given.
+    """
+    import oe.bbenvcache
+
+    # The oe-selftest helpers changing the configuration or the layers
+    # call invalidate_bb_vars()
+    values = oe.bbenvcache.load(target, postconfig)
+    if values is None:
+        bbenv = get_bb_env(target, postconfig=postconfig)
+        values = oe.bbenvcache.store(target, postconfig, bbenv)
+
+    # Variables with empty values are reported as not set
+    if variables is None:
+        return {var: val for var, val in values.items() if val}
+    return {var: values.get(var) or None for var in variables}
 
 def get_bb_var(var, target=None, postconfig=None):
     return get_bb_vars([var], target, postconfig)[var]
 
+def invalidate_bb_vars():
+    """Forget the bitbake -e output cached by get_bb_vars()"""
+    import oe.bbenvcache
+    oe.bbenvcache.invalidate()
+
 def get_test_layer():
     layers = get_bb_var("BBLAYERS").split()
     testlayer = None
@@ -18,6 +18,9 @@ import string
 import threading
 import codecs
 import logging
+import json
+import shutil
+import tempfile
 from oeqa.utils.dump import HostDumper
 
 # Get Unicode non printable control chars
@@ -28,7 +31,7 @@ re_control_char = re.compile('[%s]' % re.escape("".join(control_chars)))
 
 class QemuRunner:
 
-    def __init__(self, machine, rootfs, display, tmpdir, deploy_dir_image, logfile, boottime, dump_dir, dump_host_cmds, use_kvm, logger):
+    def __init__(self, machine, rootfs, display, tmpdir, deploy_dir_image, logfile, boottime, dump_dir, dump_host_cmds, use_kvm, logger, use_monitor=False):
 
         # Popen object for runqemu
         self.runqemu = None
@@ -54,6 +57,13 @@ class QemuRunner:
         self.msg = ''
 
         self.runqemutime = 120
+        self.monitortime = 300
+        # QMP monitor, needed to save and load snapshots
+        self.use_monitor = use_monitor
+        self.qmp_dir = None
+        self.qmp = None
+        # Snapshot restart() goes back to
+        self.snapshot = None
         self.qemu_pidfile = 'pidfile_'+str(os.getpid())
         self.host_dumper = HostDumper(dump_host_cmds, dump_dir)
 
@@ -149,7 +159,11 @@ class QemuRunner:
         # and analyze descendents in order to determine it.
         if os.path.exists(self.qemu_pidfile):
             os.remove(self.qemu_pidfile)
-        self.qemuparams = 'bootparams="{0}" qemuparams="-serial tcp:127.0.0.1:{1} -pidfile {2}"'.format(bootparams, threadport, self.qemu_pidfile)
+        monitorparams = ''
+        if self.use_monitor:
+            self.qmp_dir = tempfile.mkdtemp(prefix='oeqa-qmp-')
+            monitorparams = ' -qmp unix:%s,server,nowait' % os.path.join(self.qmp_dir, 'qmp.sock')
+        self.qemuparams = 'bootparams="{0}" qemuparams="-serial tcp:127.0.0.1:{1} -pidfile {2}{3}"'.format(bootparams, threadport, self.qemu_pidfile, monitorparams)
         if qemuparams:
             self.qemuparams = self.qemuparams[:-1] + " " + qemuparams + " " + '\"'
 
@@ -196,8 +210,13 @@ class QemuRunner:
         self.logger.debug("runqemu started, pid is %s" % self.runqemu.pid)
         self.logger.debug("waiting at most %s seconds for qemu pid (%s)" %
                           (self.runqemutime, time.strftime("%D %H:%M:%S")))
+
+        # qemu connects to the serial console socket once it started, after
+        # writing its pidfile: wait for that rather than for the pidfile.
+        self.thread = LoggingThread(self.log, threadsock, self.logger)
+        self.thread.start()
         endtime = time.time() + self.runqemutime
-        while not self.is_alive() and time.time() < endtime:
+        while not self.thread.connection_established.wait(0.5) and time.time() < endtime:
             if self.runqemu.poll():
                 if self.runqemu.returncode:
                     # No point waiting any longer
@@ -206,7 +225,8 @@ class QemuRunner:
                     self.stop()
                     self.logger.debug("Output from runqemu:\n%s" % self.getOutput(output))
                     return False
-            time.sleep(0.5)
+        while not self.is_alive() and time.time() < endtime:
+            time.sleep(0.1)
 
         if not self.is_alive():
             self.logger.error("Qemu pid didn't appear in %s seconds (%s)" %
@@ -263,13 +283,11 @@ class QemuRunner:
         self.logger.debug("Target IP: %s" % self.ip)
         self.logger.debug("Server IP: %s" % self.server_ip)
 
-        self.thread = LoggingThread(self.log, threadsock, self.logger)
-        self.thread.start()
-        if not self.thread.connection_established.wait(self.boottime):
+        if not self.thread.connection_established.is_set():
             self.logger.error("Didn't receive a console connection from qemu. "
                          "Here is the qemu command line used:\n%s\nand "
                          "output from runqemu:\n%s" % (cmdline, out))
-            self.stop_thread()
+            self.stop()
             return False
 
         self.logger.debug("Output from runqemu:\n%s", out)
@@ -352,6 +370,13 @@ class QemuRunner:
     def stop(self):
         self.stop_thread()
         self.stop_qemu_system()
+        if self.qmp:
+            self.qmp.close()
+            self.qmp = None
+        if self.qmp_dir:
+            shutil.rmtree(self.qmp_dir, ignore_errors=True)
+            self.qmp_dir = None
+        self.snapshot = None
         if hasattr(self, "origchldhandler"):
             signal.signal(signal.SIGCHLD, self.origchldhandler)
         if self.runqemu:
@@ -393,6 +418,11 @@ class QemuRunner:
 
     def restart(self, qemuparams = None):
         self.logger.debug("Restarting qemu process")
+        # Going back to a snapshot saved after boot is much faster than
+        # booting again
+        if not qemuparams and self.snapshot and self.is_alive():
+            if self.loadvm(self.snapshot):
+                return True
         if self.runqemu.poll() is None:
             self.stop()
         if self.start(qemuparams):
@@ -412,6 +442,90 @@ class QemuRunner:
                 return True
         return False
 
+    def _qmp_read(self):
+        while True:
+            line = self.qmp.readline()
+            if not line:
+                raise Exception("QMP monitor connection closed")
+            msg = json.loads(line)
+            # Skip the asynchronous events
+            if not 'event' in msg:
+                return msg
+
+    def _qmp_command(self, command, **arguments):
+        self.qmp.write(json.dumps({'execute': command, 'arguments': arguments}) + '\n')
+        self.qmp.flush()
+        msg = self._qmp_read()
+        if 'error' in msg:
+            raise Exception("QMP command %s failed: %s" % (command, msg['error'].get('desc')))
+        return msg['return']
+
+    def run_monitor(self, command):
+        """
+        Runs a human monitor command, like savevm, and returns its output.
+        """
+        if not self.qmp_dir:
+            raise Exception("QEMU was started without monitor")
+        self.logger.debug("Monitor command: %s" % command)
+        try:
+            if not self.qmp:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(self.monitortime)
+                sock.connect(os.path.join(self.qmp_dir, 'qmp.sock'))
+                self.qmp = sock.makefile('rw')
+                sock.close()
+                # Greeting, then leave the capabilities negotiation mode
+                self._qmp_read()
+                self._qmp_command('qmp_capabilities')
+            return self._qmp_command('human-monitor-command', **{'command-line': command})
+        except (OSError, ValueError):
+            # Start from a new connection next time, not to read the
+            # answer of this command
+            if self.qmp:
+                self.qmp.close()
+                self.qmp = None
+            raise
+
+    def savevm(self, name):
+        """
+        Saves a snapshot of the running target, which restart() then
+        goes back to. The disk image has to support snapshots, as the
+        one of runqemu snapshot mode does.
+        """
+        start = time.time()
+        try:
+            output = self.run_monitor('savevm %s' % name).strip()
+        except Exception as e:
+            output = str(e)
+        if output:
+            self.logger.warn("Couldn't save snapshot %s: %s" % (name, output))
+            return False
+        self.snapshot = name
+        self.logger.info("Saved snapshot %s in %.2f seconds" % (name, time.time() - start))
+        return True
+
+    def loadvm(self, name):
+        """
+        Brings the running target back to a snapshot saved with savevm.
+        """
+        start = time.time()
+        try:
+            output = self.run_monitor('loadvm %s' % name).strip()
+        except Exception as e:
+            output = str(e)
+        if output:
+            self.logger.warn("Couldn't load snapshot %s: %s" % (name, output))
+            return False
+        self.logger.info("Loaded snapshot %s in %.2f seconds" % (name, time.time() - start))
+
+        if self.logged:
+            # The clock of the target went back to the time of the snapshot
+            try:
+                self.run_serial("date -s @%d" % time.time())
+            except Exception:
+                self.logger.debug("Couldn't set the date of the target")
+        return True
+
     def run_serial(self, command, raw=False, timeout=5):
         # We assume target system have echo to get command status
         if not raw:
@@ -11,6 +11,10 @@ import subprocess
 import time
 import os
 import select
+import shutil
+import tempfile
+import threading
+import weakref
 
 
 class SSHProcess(object):
@@ -96,6 +100,68 @@ class SSHProcess(object):
             raise
         return (self.status, self.output)
 
+class SSHMaster(object):
+    """
+    Connection to a target shared by the ssh and scp commands run on it,
+    so that they don't each go through a full key exchange.
+
+    The master is started in the background on first use, and again
+    when it went away (e.g. the target was rebooted): the commands run
+    until it is up connect on their own, as ssh falls back to a direct
+    connection when the control socket can't be used.
+    """
+    def __init__(self, ssh):
+        self.ssh = ssh
+        self.tmpdir = tempfile.mkdtemp(prefix='oeqa-ssh-')
+        self.path = os.path.join(self.tmpdir, '%r@%h:%p')
+        self.process = None
+        self.ip = None
+        self.lock = threading.Lock()
+
+    def options(self, ip):
+        """
+        Returns the options making an ssh or scp command to ip go
+        through the master, starting it if needed.
+        """
+        with self.lock:
+            if self.process and (self.process.poll() is not None or self.ip != ip):
+                self.stop()
+            if not self.process:
+                self.start(ip)
+        return ['-o', 'ControlMaster=no', '-o', 'ControlPath=%s' % self.path]
+
+    def start(self, ip):
+        # Unset DISPLAY which means we won't trigger SSH_ASKPASS
+        env = os.environ.copy()
+        if "DISPLAY" in env:
+            del env['DISPLAY']
+
+        command = self.ssh + ['-o', 'ControlMaster=yes',
+                              '-o', 'ControlPath=%s' % self.path,
+                              '-o', 'ServerAliveInterval=5',
+                              '-o', 'ServerAliveCountMax=3',
+                              '-N', ip]
+        self.ip = ip
+        self.process = subprocess.Popen(command, stdin=subprocess.DEVNULL,
+                                        stdout=subprocess.DEVNULL,
+                                        stderr=subprocess.DEVNULL,
+                                        preexec_fn=os.setsid, env=env)
+
+    def stop(self):
+        if self.process:
+            if self.process.poll() is None:
+                self.process.terminate()
+                try:
+                    self.process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self.process.kill()
+                    self.process.wait()
+            self.process = None
+
+    def close(self):
+        self.stop()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
 class SSHControl(object):
     def __init__(self, ip, logfile=None, timeout=300, user='root', port=None):
         self.ip = ip
@@ -113,19 +179,28 @@ class SSHControl(object):
         if port:
             self.ssh = self.ssh + [ '-p', port ]
             self.scp = self.scp + [ '-P', port ]
+        self.master = SSHMaster(self.ssh)
+        # Stop the master when the connection is dropped
+        weakref.finalize(self, self.master.close)
+        self.commands = 0
+        self.commands_time = 0
 
     def log(self, msg):
         if self.logfile:
             with open(self.logfile, "a") as f:
                 f.write("%s\n" % msg)
 
-    def _internal_run(self, command, timeout=None, ignore_status = True):
+    def _internal_run(self, command, timeout=None, ignore_status = True, **options):
         self.log("[Running]$ %s" % " ".join(command))
 
-        proc = SSHProcess()
+        proc = SSHProcess(**options)
         status, output = proc.run(command, timeout, logfile=self.logfile)
 
-        self.log("[Command returned '%d' after %.2f seconds]" % (status, time.time() - proc.starttime))
+        elapsed = time.time() - proc.starttime
+        self.commands += 1
+        self.commands_time += elapsed
+        self.log("[Command returned '%d' after %.2f seconds, %.2f on average over %d commands]" %
+                 (status, elapsed, self.commands_time / self.commands, self.commands))
 
         if status and not ignore_status:
             raise AssertionError("Command '%s' returned non-zero exit status %d:\n%s" % (command, status, output))
@@ -140,7 +215,7 @@ class SSHControl(object):
         timeout=0 - no timeout, let command run until it returns
         """
 
-        command = self.ssh + [self.ip, 'export PATH=/usr/sbin:/sbin:/usr/bin:/bin; ' + command]
+        command = self.ssh + self.master.options(self.ip) + [self.ip, 'export PATH=/usr/sbin:/sbin:/usr/bin:/bin; ' + command]
 
         if timeout is None:
             return self._internal_run(command, self.defaulttimeout, self.ignore_status)
@@ -151,32 +226,40 @@ class SSHControl(object):
     def copy_to(self, localpath, remotepath):
         if os.path.islink(localpath):
             localpath = os.path.dirname(localpath) + "/" + os.readlink(localpath)
-        command = self.scp + [localpath, '%s@%s:%s' % (self.user, self.ip, remotepath)]
+        command = self.scp + self.master.options(self.ip) + [localpath, '%s@%s:%s' % (self.user, self.ip, remotepath)]
         return self._internal_run(command, ignore_status=False)
 
     def copy_from(self, remotepath, localpath):
-        command = self.scp + ['%s@%s:%s' % (self.user, self.ip, remotepath), localpath]
+        command = self.scp + self.master.options(self.ip) + ['%s@%s:%s' % (self.user, self.ip, remotepath), localpath]
         return self._internal_run(command, ignore_status=False)
 
     def copy_dir_to(self, localpath, remotepath):
         """
         Copy recursively localpath directory to remotepath in target.
+
+        The directory is streamed as a tar archive to a single ssh
+        command extracting it, instead of copying the files one by one.
         """
 
-        for root, dirs, files in os.walk(localpath):
-            # Create directories in the target as needed
-            for d in dirs:
-                tmp_dir = os.path.join(root, d).replace(localpath, "")
-                new_dir = os.path.join(remotepath, tmp_dir.lstrip("/"))
-                cmd = "mkdir -p %s" % new_dir
-                self.run(cmd)
-
-            # Copy files into the target
-            for f in files:
-                tmp_file = os.path.join(root, f).replace(localpath, "")
-                dst_file = os.path.join(remotepath, tmp_file.lstrip("/"))
-                src_file = os.path.join(root, f)
-                self.copy_to(src_file, dst_file)
+        # Archive the content of localpath only, not to change the
+        # permissions of remotepath if it exists
+        entries = sorted(os.listdir(localpath))
+        if not entries:
+            return self.run("mkdir -p %s" % remotepath)
+
+        tar = subprocess.Popen(['tar', '-C', localpath, '-cf', '-', '--'] + entries,
+                               stdout=subprocess.PIPE)
+        cmd = 'export PATH=/usr/sbin:/sbin:/usr/bin:/bin; mkdir -p %s && tar -C %s -xof -' % (remotepath, remotepath)
+        command = self.ssh + self.master.options(self.ip) + [self.ip, cmd]
+        try:
+            result = self._internal_run(command, ignore_status=False, stdin=tar.stdout)
+        finally:
+            # tar gets SIGPIPE if ssh didn't read all of its output
+            tar.stdout.close()
+            tar.wait()
+        if tar.returncode:
+            raise AssertionError("Archiving %s failed with exit status %d" % (localpath, tar.returncode))
+        return result
 
 
     def delete_files(self, remotepath, files):
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+# Compare computing all the image checksum conversions with one
+# coreutils command each, as image_types.bbclass used to, with computing
+# them from a single read of the image with oe-image-checksum
+#
+# By default a test image is generated in the given directory:
+#   image-checksum-bench.py --size 4096 /path/on/the/build/filesystem
+# or an existing image can be used with --image. The page cache is
+# dropped before each run when possible (i.e. when run as root), else
+# the image is read from the cache.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+scripts_path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+SUMS = ['md5sum', 'sha1sum', 'sha224sum', 'sha256sum', 'sha384sum', 'sha512sum']
+
+MiB = 1024 * 1024
+
+def make_image(path, size_mib):
+    block = os.urandom(MiB)
+    with open(path, 'wb') as f:
+        for _ in range(size_mib):
+            f.write(block)
+
+def drop_caches():
+    try:
+        with open('/proc/sys/vm/drop_caches', 'w') as f:
+            f.write('3\n')
+        return True
+    except OSError:
+        return False
+
+def separate(image):
+    # What the individual CONVERSION_CMDs do
+    for s in SUMS:
+        subprocess.check_call('%s %s > %s.%s' % (s, image, image, s), shell=True)
+
+def single_pass(image):
+    subprocess.check_call([os.path.join(scripts_path, 'oe-image-checksum'), image] + SUMS)
+
+def read_sums(image):
+    result = {}
+    for s in SUMS:
+        with open('%s.%s' % (image, s)) as f:
+            result[s] = f.read()
+        os.unlink('%s.%s' % (image, s))
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark single pass image checksumming')
+    parser.add_argument('directory', help='Directory to write the image to, ideally on the build filesystem')
+    parser.add_argument('--image', help='Existing image to checksum instead of generating one')
+    parser.add_argument('--size', type=int, default=4096, help='Size of the generated image in MiB (default: %(default)s)')
+    args = parser.parse_args()
+
+    image = args.image
+    if not image:
+        image = os.path.join(args.directory, 'checksum-bench.img')
+        print('Generating %d MiB image %s' % (args.size, image))
+        make_image(image, args.size)
+    size = os.stat(image).st_size / MiB
+
+    results = []
+    try:
+        for name, func in (('one command per sum (old)', separate),
+                           ('oe-image-checksum (new)', single_pass)):
+            cold = drop_caches()
+            start = time.perf_counter()
+            func(image)
+            elapsed = time.perf_counter() - start
+            results.append(read_sums(image))
+            print('%-28s %8.2fs %8.1f MiB/s (%s cache)' % (name, elapsed, size / elapsed, 'cold' if cold else 'warm'))
+    finally:
+        if not args.image:
+            os.unlink(image)
+
+    if results[0] != results[1]:
+        print('Checksums differ')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+# Compare the time package_do_shlibs spends reading the dynamic sections of
+# a recipe's files using 'objdump -p' and using the in-process ELF reader
+#
+# Point it at the packages-split directory of a large recipe, e.g.
+#   shlibs-bench.py tmp/work/<arch>/qtbase/<ver>/packages-split
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import argparse
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+import time
+
+scripts_path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(scripts_path, 'lib'))
+import scriptpath
+scriptpath.add_oe_lib_path()
+
+import oe.package
+
+def objdump_info(args):
+    # What package_do_shlibs used to do for each file
+    objdump, path = args
+    output = subprocess.run([objdump, '-p', path], stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, universal_newlines=True).stdout
+    needed = []
+    sonames = []
+    rpath = None
+    for l in output.splitlines():
+        m = re.match(r"\s+RPATH\s+([^\s]*)", l)
+        if m:
+            rpath = m.group(1)
+        m = re.match(r"\s+NEEDED\s+([^\s]*)", l)
+        if m:
+            needed.append(m.group(1))
+        m = re.match(r"\s+SONAME\s+([^\s]*)", l)
+        if m:
+            sonames.append(m.group(1))
+    return (needed, sonames, rpath)
+
+def candidates(topdir):
+    lib_re = re.compile(r"^.*\.so")
+    files = []
+    for root, dirs, names in os.walk(topdir):
+        for name in names:
+            path = os.path.join(root, name)
+            if os.path.islink(path):
+                continue
+            if os.access(path, os.X_OK) or lib_re.match(path):
+                files.append(path)
+    return sorted(files)
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark objdump -p against the in-process ELF dynamic section reader')
+    parser.add_argument('directory', help='Directory to scan, e.g. a recipe\'s packages-split')
+    parser.add_argument('--objdump', default='objdump', help='objdump to compare against (default: %(default)s)')
+    args = parser.parse_args()
+
+    files = candidates(args.directory)
+    if not files:
+        print('No candidate files found in %s' % args.directory)
+        return 1
+
+    t_objdump, expected = timed(lambda: [objdump_info((args.objdump, f)) for f in files])
+    t_serial, actual = timed(lambda: [oe.package.elf_dynamic_info(f) for f in files])
+    with multiprocessing.Pool() as pool:
+        t_parallel, actual_parallel = timed(pool.map, oe.package.elf_dynamic_info, files)
+
+    mismatches = [f for f, e, a in zip(files, expected, actual) if e != a]
+    print('%d files' % len(files))
+    print('%-28s %8.2fs' % ('objdump -p (serial)', t_objdump))
+    print('%-28s %8.2fs' % ('in-process (serial)', t_serial))
+    print('%-28s %8.2fs' % ('in-process (%d workers)' % os.cpu_count(), t_parallel))
+    if actual_parallel != actual:
+        print('Parallel results differ from serial results')
+        return 1
+    if mismatches:
+        print('%d files differ from objdump, e.g. %s' % (len(mismatches), mismatches[0]))
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
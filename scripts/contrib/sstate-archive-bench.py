@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+# Compare sstate archive creation and restore times for the compressors
+# supported by SSTATE_ARCHIVE_FORMAT
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Keep in sync with SSTATE_ARCHIVE_EXT/SSTATE_ARCHIVE_CMD in sstate.bbclass
+FORMATS = {
+    'tgz': ('.tgz', 'gzip'),
+    'pigz': ('.tgz', 'pigz -p %d' % os.cpu_count()),
+    'zst': ('.tar.zst', 'zstd -T0'),
+}
+
+def timed(cmd, cwd):
+    start = time.perf_counter()
+    subprocess.check_call(cmd, cwd=cwd, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def prepare_source(path, tmpdir):
+    """Return a directory to archive, unpacking path first if it's an sstate object"""
+    if os.path.isdir(path):
+        return path
+    srcdir = os.path.join(tmpdir, 'source')
+    os.makedirs(srcdir)
+    subprocess.check_call(['tar', '-xf', os.path.abspath(path)], cwd=srcdir)
+    return srcdir
+
+def bench(srcdir, fmt, tmpdir, iterations):
+    ext, cmd = FORMATS[fmt]
+    archive = os.path.join(tmpdir, 'bench' + ext)
+    destdir = os.path.join(tmpdir, 'restore')
+    create = []
+    restore = []
+    for _ in range(iterations):
+        if os.path.exists(archive):
+            os.unlink(archive)
+        create.append(timed(['tar', '-I', cmd, '-cf', archive] + sorted(os.listdir(srcdir)), srcdir))
+        shutil.rmtree(destdir, ignore_errors=True)
+        os.makedirs(destdir)
+        restore.append(timed(['tar', '-I', cmd, '-xf', archive], destdir))
+    size = os.path.getsize(archive)
+    shutil.rmtree(destdir, ignore_errors=True)
+    os.unlink(archive)
+    return min(create), min(restore), size
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare sstate archive create and restore times per SSTATE_ARCHIVE_FORMAT')
+    parser.add_argument('source', help='Directory to archive, or an existing sstate object to repack')
+    parser.add_argument('-f', '--formats', default=','.join(sorted(FORMATS)),
+                        help='Comma-separated list of formats to compare (default: %(default)s)')
+    parser.add_argument('-n', '--iterations', type=int, default=3,
+                        help='Number of runs per format, the fastest is reported (default: %(default)s)')
+    args = parser.parse_args()
+
+    formats = args.formats.split(',')
+    for fmt in formats:
+        if fmt not in FORMATS:
+            parser.error('Unknown format %s, valid formats are: %s' % (fmt, ', '.join(sorted(FORMATS))))
+
+    tmpdir = tempfile.mkdtemp(prefix='sstate-bench-')
+    try:
+        srcdir = prepare_source(args.source, tmpdir)
+        print('%-6s %12s %12s %14s' % ('format', 'create (s)', 'restore (s)', 'size (KiB)'))
+        for fmt in formats:
+            prog = FORMATS[fmt][1].split()[0]
+            if not shutil.which(prog):
+                print('%-6s skipped, %s not found' % (fmt, prog))
+                continue
+            create, restore, size = bench(srcdir, fmt, tmpdir, args.iterations)
+            print('%-6s %12.2f %12.2f %14d' % (fmt, create, restore, size // 1024))
+    finally:
+        shutil.rmtree(tmpdir)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+# Compare the throughput of wic's sparse_copy() copying the mapped extents
+# of a sparse image in the kernel (copy_file_range/sendfile) with copying
+# them through a userspace buffer, as it used to
+#
+# By default a sparse test image is generated in the given directory:
+#   wic-sparse-copy-bench.py --size 4096 /path/on/the/build/filesystem
+# or an existing image can be used with --image.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+scripts_path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(scripts_path, 'lib'))
+
+from wic.filemap import sparse_copy, copy_range, copy_range_readwrite
+
+MiB = 1024 * 1024
+
+def make_image(path, size_mib, extent_mib):
+    # Alternate data extents and holes of extent_mib each
+    block = os.urandom(MiB)
+    with open(path, 'wb') as f:
+        f.truncate(size_mib * MiB)
+        for offset in range(0, size_mib, extent_mib * 2):
+            f.seek(offset * MiB)
+            for _ in range(min(extent_mib, size_mib - offset)):
+                f.write(block)
+
+def digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(4 * MiB), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def mapped_bytes(path):
+    return os.stat(path).st_blocks * 512
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark wic sparse_copy() with in-kernel and userspace copying')
+    parser.add_argument('directory', help='Directory to write the images to, ideally on the build filesystem')
+    parser.add_argument('--image', help='Existing sparse image to copy instead of generating one')
+    parser.add_argument('--size', type=int, default=2048, help='Size of the generated image in MiB (default: %(default)s)')
+    parser.add_argument('--extent', type=int, default=16, help='Size of the data extents and holes of the generated image in MiB (default: %(default)s)')
+    parser.add_argument('--no-verify', action='store_true', help='Don\'t check that the copies are identical')
+    args = parser.parse_args()
+
+    src = args.image
+    if not src:
+        src = os.path.join(args.directory, 'sparse-copy-src.img')
+        print('Generating %d MiB image %s' % (args.size, src))
+        make_image(src, args.size, args.extent)
+
+    data = mapped_bytes(src) / MiB
+    results = []
+    try:
+        for name, func in (('read/write (old)', copy_range_readwrite),
+                           ('copy_range (new)', copy_range)):
+            dst = os.path.join(args.directory, 'sparse-copy-dst.img')
+            if os.path.exists(dst):
+                os.unlink(dst)
+            # Flush the previous run's writes so they don't count against this one
+            os.sync()
+            elapsed = timed(sparse_copy, src, dst, copy_func=func)
+            os.sync()
+            results.append((name, elapsed, dst if args.no_verify else digest(dst)))
+            print('%-20s %8.2fs %10.1f MiB/s (%d MiB mapped)' % (name, elapsed, data / elapsed, data))
+            os.unlink(dst)
+    finally:
+        if not args.image:
+            os.unlink(src)
+
+    if not args.no_verify and len(set(r[2] for r in results)) != 1:
+        print('Copies differ')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -53,16 +53,20 @@ def generate_update_dict(sigfile_new, sigfile_old):
             continue
     return update_dict
 
-def get_sstate_objects(update_dict, sstate_dir):
+# Extensions of the sstate archives, see SSTATE_ARCHIVE_EXT in sstate.bbclass
+SSTATE_ARCHIVE_EXTS = ['.tgz', '.tar.zst']
+
+def get_sstate_objects(update_dict, sstate_dir, extensions=SSTATE_ARCHIVE_EXTS):
     """Return a list containing sstate objects which are to be installed"""
     sstate_objects = []
     for k in update_dict:
         files = set()
         hashval = update_dict[k]
-        p = sstate_dir + '/' + hashval[:2] + '/*' + hashval + '*.tgz'
-        files |= set(glob.glob(p))
-        p = sstate_dir + '/*/' + hashval[:2] + '/*' + hashval + '*.tgz'
-        files |= set(glob.glob(p))
+        for ext in extensions:
+            p = sstate_dir + '/' + hashval[:2] + '/*' + hashval + '*' + ext
+            files |= set(glob.glob(p))
+            p = sstate_dir + '/*/' + hashval[:2] + '/*' + hashval + '*' + ext
+            files |= set(glob.glob(p))
         files = list(files)
         if len(files) == 1:
             sstate_objects.extend(files)
@@ -240,6 +240,10 @@ class Disk:
         self.fstypes = fstypes
         self._partitions = None
         self._partimages = {}
+        # Partition images modified since they were extracted, and the
+        # debugfs commands not yet run on them
+        self._dirty = set()
+        self._debugfs_cmds = {}
         self._lsector_size = None
         self._psector_size = None
         self._ptable_format = None
@@ -313,8 +317,37 @@ class Disk:
         sparse_copy(self._partimages[pnum], self.imagepath,
                     seek=self.partitions[pnum].start)
 
+    def _debugfs(self, pnum, *cmds):
+        """Queue debugfs commands to be run on the partition image."""
+        self._get_part_image(pnum)
+        self._debugfs_cmds.setdefault(pnum, []).extend(cmds)
+        self._dirty.add(pnum)
+
+    def _run_debugfs(self, pnum):
+        """Run the queued debugfs commands for the partition in one go."""
+        cmds = self._debugfs_cmds.pop(pnum, None)
+        if not cmds:
+            return
+        with tempfile.NamedTemporaryFile(prefix="wic-debugfs-", mode='w') as script:
+            script.write('\n'.join(cmds) + '\n')
+            script.flush()
+            exec_cmd("{} -w -f {} {}".format(self.debugfs, script.name,
+                                             self._partimages[pnum]))
+
+    def commit(self):
+        """
+        Write the changes made by copy() and remove() to the image. Each
+        modified partition is written back once, however many changes were
+        made to it.
+        """
+        for pnum in sorted(self._dirty):
+            self._run_debugfs(pnum)
+            self._put_part_image(pnum)
+        self._dirty = set()
+
     def dir(self, pnum, path):
         if self.partitions[pnum].fstype.startswith('ext'):
+            self._run_debugfs(pnum)
             return exec_cmd("{} {} -R 'ls -l {}'".format(self.debugfs,
                                                          self._get_part_image(pnum),
                                                          path), as_shell=True)
@@ -324,25 +357,30 @@ class Disk:
                                                    path))
 
     def copy(self, src, pnum, path):
-        """Copy partition image into wic image."""
+        """
+        Copy files into the partition. 'src' is a path or a list of paths.
+        The image is updated by commit().
+        """
+        srcs = [src] if isinstance(src, str) else list(src)
         if self.partitions[pnum].fstype.startswith('ext'):
-            cmd = "echo -e 'cd {}\nwrite {} {}' | {} -w {}".\
-                      format(path, src, os.path.basename(src),
-                             self.debugfs, self._get_part_image(pnum))
+            for src in srcs:
+                self._debugfs(pnum, "cd /", "cd {}".format(path),
+                              "write {} {}".format(src, os.path.basename(src)))
         else: # fat
             cmd = "{} -i {} -snop {} ::{}".format(self.mcopy,
                                                   self._get_part_image(pnum),
-                                                  src, path)
-        exec_cmd(cmd, as_shell=True)
-        self._put_part_image(pnum)
+                                                  ' '.join(srcs), path)
+            exec_cmd(cmd, as_shell=True)
+            self._dirty.add(pnum)
 
     def remove(self, pnum, path):
-        """Remove files/dirs from the partition."""
+        """
+        Remove files/dirs from the partition. The image is updated by
+        commit().
+        """
         partimg = self._get_part_image(pnum)
         if self.partitions[pnum].fstype.startswith('ext'):
-            exec_cmd("{} {} -wR 'rm {}'".format(self.debugfs,
-                                                self._get_part_image(pnum),
-                                                path), as_shell=True)
+            self._debugfs(pnum, "cd /", "rm {}".format(path))
         else: # fat
             cmd = "{} -i {} ::{}".format(self.mdel, partimg, path)
             try:
@@ -356,7 +394,7 @@ class Disk:
                     exec_cmd(cmd)
                 else:
                     raise err
-        self._put_part_image(pnum)
+            self._dirty.add(pnum)
 
     def write(self, target, expand):
         """Write disk image to the media or file."""
@@ -517,14 +555,20 @@ def wic_cp(args, native_sysroot):
     """
     disk = Disk(args.dest.image, native_sysroot)
     disk.copy(args.src, args.dest.part, args.dest.path)
+    disk.commit()
 
 def wic_rm(args, native_sysroot):
     """
     Remove files or directories from the vfat partition of
     partitioned image.
     """
-    disk = Disk(args.path.image, native_sysroot)
-    disk.remove(args.path.part, args.path.path)
+    images = set(path.image for path in args.path)
+    if len(images) > 1:
+        raise WicError("Can't remove files from more than one image at once")
+    disk = Disk(args.path[0].image, native_sysroot)
+    for path in args.path:
+        disk.remove(path.part, path.path)
+    disk.commit()
 
 def wic_write(args, native_sysroot):
     """
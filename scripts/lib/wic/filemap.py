@@ -22,12 +22,14 @@ and returns an instance of the class.
 #   * Too many instance attributes (R0902)
 # pylint: disable=R0902
 
+import errno
 import os
 import struct
 import array
 import fcntl
 import tempfile
 import logging
+import threading
 
 def get_block_size(file_obj):
     """
@@ -189,9 +191,9 @@ def _lseek(file_obj, offset, whence):
     except OSError as err:
         # The 'lseek' system call returns the ENXIO if there is no data or
         # hole starting from the specified offset.
-        if err.errno == os.errno.ENXIO:
+        if err.errno == errno.ENXIO:
             return -1
-        elif err.errno == os.errno.EINVAL:
+        elif err.errno == errno.EINVAL:
             raise ErrorNotSupp("the kernel or file-system does not support "
                                "\"SEEK_HOLE\" and \"SEEK_DATA\"")
         else:
@@ -330,7 +332,7 @@ _FIEMAP_FLAG_SYNC = 0x00000001
 # Size of the buffer for 'struct fiemap_extent' elements which will be used
 # when invoking the FIEMAP ioctl. The larger is the buffer, the less times the
 # FIEMAP ioctl will be invoked.
-_FIEMAP_BUFFER_SIZE = 256 * 1024
+_FIEMAP_BUFFER_SIZE = 1024 * 1024
 
 class FilemapFiemap(_FilemapBase):
     """
@@ -394,12 +396,12 @@ class FilemapFiemap(_FilemapBase):
         except IOError as err:
             # Note, the FIEMAP ioctl is supported by the Linux kernel starting
             # from version 2.6.28 (year 2008).
-            if err.errno == os.errno.EOPNOTSUPP:
+            if err.errno == errno.EOPNOTSUPP:
                 errstr = "FilemapFiemap: the FIEMAP ioctl is not supported " \
                          "by the file-system"
                 self._log.debug(errstr)
                 raise ErrorNotSupp(errstr)
-            if err.errno == os.errno.ENOTTY:
+            if err.errno == errno.ENOTTY:
                 errstr = "FilemapFiemap: the FIEMAP ioctl is not supported " \
                          "by the kernel"
                 self._log.debug(errstr)
@@ -534,8 +536,86 @@ def filemap(image, log=None):
     except ErrorNotSupp:
         return FilemapSeek(image, log)
 
+# Errors with which copy_file_range() and sendfile() report that they can't
+# be used for a given pair of files, in which case the next method is tried
+_COPY_FALLBACK_ERRNOS = (errno.ENOSYS, errno.EXDEV, errno.EINVAL,
+                         errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF)
+
+def _copy_range_cfr(src_fd, dst_fd, src_off, dst_off, count):
+    """Copy a range using copy_file_range(), without data passing userspace"""
+    copied = 0
+    while copied < count:
+        size = os.copy_file_range(src_fd, dst_fd, count - copied,
+                                  src_off + copied, dst_off + copied)
+        if not size:
+            break
+        copied += size
+    return copied
+
+def _copy_range_sendfile(src_fd, dst_fd, src_off, dst_off, count):
+    """Copy a range using sendfile(), which writes at the current position"""
+    os.lseek(dst_fd, dst_off, os.SEEK_SET)
+    copied = 0
+    while copied < count:
+        size = os.sendfile(dst_fd, src_fd, src_off + copied, count - copied)
+        if not size:
+            break
+        copied += size
+    return copied
+
+def copy_range_readwrite(src_fd, dst_fd, src_off, dst_off, count):
+    """Copy a range through a userspace buffer, 1MiB at a time"""
+    chunk_size = 1024 * 1024
+    copied = 0
+    while copied < count:
+        chunk = os.pread(src_fd, min(chunk_size, count - copied),
+                         src_off + copied)
+        if not chunk:
+            break
+        written = 0
+        while written < len(chunk):
+            written += os.pwrite(dst_fd, chunk[written:],
+                                 dst_off + copied + written)
+        copied += len(chunk)
+    return copied
+
+_copy_methods = []
+_copy_methods_lock = threading.Lock()
+if hasattr(os, "copy_file_range"):
+    _copy_methods.append(_copy_range_cfr)
+if hasattr(os, "sendfile"):
+    _copy_methods.append(_copy_range_sendfile)
+
+def copy_range(src_fd, dst_fd, src_off, dst_off, count):
+    """
+    Copy 'count' bytes at offset 'src_off' of file descriptor 'src_fd' to
+    offset 'dst_off' of 'dst_fd', stopping early at the end of the source.
+    The kernel does the copy if it can, using copy_file_range() or failing
+    that sendfile(), otherwise the data is read and written in chunks.
+    Whatever the kernel leaves out of a short copy is read and written too,
+    so that only the end of the source stops the copy early.
+    Returns the number of bytes copied.
+    """
+    copied = 0
+    for method in list(_copy_methods):
+        try:
+            copied = method(src_fd, dst_fd, src_off, dst_off, count)
+            break
+        except OSError as err:
+            if err.errno not in _COPY_FALLBACK_ERRNOS:
+                raise
+            if err.errno == errno.ENOSYS:
+                # Not implemented by the running kernel, don't try again
+                with _copy_methods_lock:
+                    if method in _copy_methods:
+                        _copy_methods.remove(method)
+    if copied < count:
+        copied += copy_range_readwrite(src_fd, dst_fd, src_off + copied,
+                                       dst_off + copied, count - copied)
+    return copied
+
 def sparse_copy(src_fname, dst_fname, skip=0, seek=0,
-                length=0, api=None):
+                length=0, api=None, copy_func=None):
     """
     Efficiently copy sparse file to or into another file.
 
@@ -545,9 +625,13 @@ def sparse_copy(src_fname, dst_fname, skip=0, seek=0,
     seek: seek N bytes from the start of dst
     length: read N bytes from src and write them to dst
     api: FilemapFiemap or FilemapSeek object
+    copy_func: function copying a range between file descriptors,
+               'copy_range' by default
     """
     if not api:
         api = filemap
+    if not copy_func:
+        copy_func = copy_range
     fmap = api(src_fname)
     try:
         dst_file = open(dst_fname, 'r+b')
@@ -559,42 +643,22 @@ def sparse_copy(src_fname, dst_fname, skip=0, seek=0,
             dst_size = os.path.getsize(src_fname) + seek - skip
         dst_file.truncate(dst_size)
 
-    written = 0
-    for first, last in fmap.get_mapped_ranges(0, fmap.blocks_cnt):
-        start = first * fmap.block_size
-        end = (last + 1) * fmap.block_size
-
-        if skip >= end:
-            continue
-
-        if start < skip < end:
-            start = skip
-
-        fmap._f_image.seek(start, os.SEEK_SET)
-
-        written += start - skip - written
-        if length and written >= length:
-            dst_file.seek(seek + length, os.SEEK_SET)
-            dst_file.close()
-            return
-
-        dst_file.seek(seek + start - skip, os.SEEK_SET)
-
-        chunk_size = 1024 * 1024
-        to_read = end - start
-        read = 0
-
-        while read < to_read:
-            if read + chunk_size > to_read:
-                chunk_size = to_read - read
-            size = chunk_size
-            if length and written + size > length:
-                size = length - written
-            chunk = fmap._f_image.read(size)
-            dst_file.write(chunk)
-            read += size
-            written += size
-            if written == length:
-                dst_file.close()
-                return
-    dst_file.close()
+    with dst_file:
+        src_fd = fmap._f_image.fileno()
+        dst_fd = dst_file.fileno()
+        for first, last in fmap.get_mapped_ranges(0, fmap.blocks_cnt):
+            start = first * fmap.block_size
+            end = (last + 1) * fmap.block_size
+
+            if skip >= end:
+                continue
+
+            if start < skip:
+                start = skip
+
+            if length:
+                if start - skip >= length:
+                    break
+                end = min(end, skip + length)
+
+            copy_func(src_fd, dst_fd, start, seek + start - skip, end - start)
@@ -156,6 +156,7 @@ SYNOPSIS
         [-r, --rootfs-dir] [-b, --bootimg-dir]
         [-k, --kernel-dir] [-n, --native-sysroot] [-f, --build-rootfs]
         [-c, --compress-with] [-m, --bmap] [--no-fstab-update]
+        [-j, --jobs] [--direct-write]
 
 DESCRIPTION
     This command creates an OpenEmbedded image based on the 'OE
@@ -232,6 +233,17 @@ DESCRIPTION
     using this option the final fstab file will be same that in rootfs and
     wic doesn't update file, e.g adding a new mount point. User can control
     the fstab file content in base-files recipe.
+
+    The -j option sets how many partitions are prepared and written into
+    the image concurrently. It defaults to the number of CPUs; -j 1
+    processes the partitions one after another.
+
+    The --direct-write option makes wic create the ext2/3/4 filesystems
+    of partitions using the rootfs source plugin directly in the final
+    image, at the offset of their partition, once the partition table
+    has been written. This avoids writing each filesystem to a separate
+    file and copying it into the image. The offset is added to the -E
+    extended options given in --mkfs-extraopts, if any.
 """
 
 wic_list_usage = """
@@ -358,7 +370,7 @@ wic_cp_usage = """
 
  Copy files and directories to the vfat or ext* partition
 
- usage: wic cp <src> <image>:<partition>[<path>] [--native-sysroot <path>]
+ usage: wic cp <src> [<src>...] <image>:<partition>[<path>] [--native-sysroot <path>]
 
  This command  copies local files or directories to the vfat or ext* partitions
 of partitioned  image.
@@ -375,7 +387,7 @@ NAME
 SYNOPSIS
     wic cp <src> <image>:<partition>
     wic cp <src> <image>:<partition><path>
-    wic cp <src> <image>:<partition><path> --native-sysroot <path>
+    wic cp <src> [<src>...] <image>:<partition><path> --native-sysroot <path>
 
 DESCRIPTION
     This command copies files and directories to the vfat or ext* partition of
@@ -412,6 +424,11 @@ DESCRIPTION
                4 files                   0 bytes
                                 15 675 392 bytes free
 
+    Several sources can be given at once. The partition is then extracted
+    from the image and written back to it only once, which is much faster
+    than copying the files one by one:
+       $ wic cp test.wks test.cfg tmp/deploy/images/qemux86-64/core-image-minimal-qemux86-64.wic:1/efi/
+
     The -n option is used to specify the path to the native sysroot
     containing the tools(parted and mtools) to use.
 """
@@ -420,7 +437,7 @@ wic_rm_usage = """
 
  Remove files or directories from the vfat or ext* partitions
 
- usage: wic rm <image>:<partition><path> [--native-sysroot <path>]
+ usage: wic rm <image>:<partition><path> [<image>:<partition><path>...] [--native-sysroot <path>]
 
  This command  removes files or directories from the vfat or ext* partitions of
  the partitioned image.
@@ -469,6 +486,12 @@ DESCRIPTION
                 4 files           7 140 197 bytes
                                  16 607 232 bytes free
 
+    Several paths in the same image can be removed at once, in which case
+    each partition is written back to the image only once:
+
+        $ wic rm ./tmp/deploy/images/qemux86-64/core-image-minimal-qemux86-64.wic:1/libcom32.c32 \
+                 ./tmp/deploy/images/qemux86-64/core-image-minimal-qemux86-64.wic:1/vesamenu.c32
+
     The -n option is used to specify the path to the native sysroot
     containing the tools(parted and mtools) to use.
 """
@@ -30,10 +30,13 @@ import logging
 import os
 import re
 import subprocess
+import threading
 
 from collections import defaultdict
 from distutils import spawn
 
+import oe.bbenvcache
+
 from wic import WicError
 
 logger = logging.getLogger('wic')
@@ -185,6 +188,8 @@ class BitbakeVars(defaultdict):
         # default_image and vars_dir attributes should be set from outside
         self.default_image = None
         self.vars_dir = None
+        # Partitions may be prepared from several threads
+        self.lock = threading.RLock()
 
     def _parse_line(self, line, image, matcher=re.compile(r"^([a-zA-Z0-9\-_+./~]+)=(.*)")):
         """
@@ -205,6 +210,10 @@ class BitbakeVars(defaultdict):
         This is a lazy method, i.e. it runs bitbake or parses file only when
         only when variable is requested. It also caches results.
         """
+        with self.lock:
+            return self._get_var(var, image, cache)
+
+    def _get_var(self, var, image, cache):
         if not image:
             image = self.default_image
 
@@ -221,24 +230,28 @@ class BitbakeVars(defaultdict):
                     print("File %s doesn't exist." % fname)
                     return
             else:
-                # Get bitbake -e output
-                cmd = "bitbake -e"
-                if image:
-                    cmd += " %s" % image
-
-                log_level = logger.getEffectiveLevel()
-                logger.setLevel(logging.INFO)
-                ret, lines = _exec_cmd(cmd)
-                logger.setLevel(log_level)
-
-                if ret:
-                    logger.error("Couldn't get '%s' output.", cmd)
-                    logger.error("Bitbake failed with error:\n%s\n", lines)
-                    return
-
-                # Parse bitbake -e output
-                for line in lines.split('\n'):
-                    self._parse_line(line, image)
+                # Use the variables of an earlier run of bitbake -e
+                # if nothing they depend on has changed since
+                values = oe.bbenvcache.load(image)
+                if values is None:
+                    # Get bitbake -e output
+                    cmd = "bitbake -e"
+                    if image:
+                        cmd += " %s" % image
+
+                    log_level = logger.getEffectiveLevel()
+                    logger.setLevel(logging.INFO)
+                    ret, lines = _exec_cmd(cmd)
+                    logger.setLevel(log_level)
+
+                    if ret:
+                        logger.error("Couldn't get '%s' output.", cmd)
+                        logger.error("Bitbake failed with error:\n%s\n", lines)
+                        return
+
+                    # Parse bitbake -e output and cache the result
+                    values = oe.bbenvcache.store(image, None, lines)
+                self[image] = dict(values)
 
             # Make first image a default set of variables
             if cache:
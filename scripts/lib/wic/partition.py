@@ -34,6 +34,25 @@ from wic.pluginbase import PluginMgr
 
 logger = logging.getLogger('wic')
 
+def add_extended_option(extraopts, option):
+    """
+    Add 'option' to the -E extended options of the mke2fs options
+    'extraopts', given either as "-E opts" or as "-Eopts". mke2fs only
+    honours the last -E, so the option is appended to that one.
+    """
+    args = extraopts.split()
+    last = None
+    for i, arg in enumerate(args):
+        if arg == "-E" and i + 1 < len(args):
+            last = i + 1
+        elif arg.startswith("-E") and len(arg) > 2:
+            last = i
+    if last is None:
+        args += ["-E", option]
+    else:
+        args[last] += "," + option
+    return " ".join(args)
+
 class Partition():
 
     def __init__(self, args, lineno):
@@ -68,6 +87,11 @@ class Partition():
         self.source_file = ""
         self.sourceparams_dict = {}
 
+        # Set by the imager when filesystems may be created directly in
+        # the final image, see write_rootfs()
+        self.direct_write = False
+        self.deferred_rootfs = None
+
     def get_extra_block_count(self, current_blocks):
         """
         The --size param is reflected in self.size (in kB), and we already
@@ -240,6 +264,10 @@ class Partition():
                 self.size = int(round(float(rsize_bb)))
 
         prefix = "ext" if self.fstype.startswith("ext") else self.fstype
+        if prefix == "ext" and self.direct_write and real_rootfs:
+            self.defer_rootfs_ext(rootfs_dir, native_sysroot, pseudo)
+            return
+
         method = getattr(self, "prepare_rootfs_" + prefix)
         method(rootfs, oe_builddir, rootfs_dir, native_sysroot, pseudo)
         self.source_file = rootfs
@@ -276,6 +304,44 @@ class Partition():
         mkfs_cmd = "fsck.%s -pvfD %s" % (self.fstype, rootfs)
         exec_native_cmd(mkfs_cmd, native_sysroot, pseudo=pseudo)
 
+    def defer_rootfs_ext(self, rootfs_dir, native_sysroot, pseudo):
+        """
+        Size an ext2/3/4 rootfs partition without creating the filesystem,
+        which write_rootfs() then creates in place in the final image. This
+        saves writing the filesystem to a file and copying it into the image.
+        """
+        du_cmd = "du -ks %s" % rootfs_dir
+        out = exec_cmd(du_cmd)
+        actual_rootfs_size = int(out.split()[0])
+
+        fs_bytes = int(self.get_rootfs_size(actual_rootfs_size) * 1024)
+        # The size 'du -Lbks' reported for the filesystem file
+        self.size = (fs_bytes + 1023) // 1024
+        self.deferred_rootfs = (rootfs_dir, native_sysroot, pseudo, fs_bytes)
+
+    def write_rootfs(self, image, offset):
+        """
+        Create the filesystem sized by defer_rootfs_ext() at byte 'offset'
+        of the partitioned image 'image'.
+        """
+        rootfs_dir, native_sysroot, pseudo, fs_bytes = self.deferred_rootfs
+
+        extraopts = add_extended_option(self.mkfs_extraopts or "-F -i 8192",
+                                        "offset=%d" % offset)
+
+        label_str = ""
+        if self.label:
+            label_str = "-L %s" % self.label
+
+        mkfs_cmd = "mkfs.%s -F %s %s %dk %s -U %s -d %s" % \
+            (self.fstype, extraopts, image, fs_bytes // 1024,
+             label_str, self.fsuuid, rootfs_dir)
+        exec_native_cmd(mkfs_cmd, native_sysroot, pseudo=pseudo)
+
+        # e2fsck takes the offset as an option of the device name
+        mkfs_cmd = "fsck.%s -pvfD '%s?offset=%d'" % (self.fstype, image, offset)
+        exec_native_cmd(mkfs_cmd, native_sysroot, pseudo=pseudo)
+
     def prepare_rootfs_btrfs(self, rootfs, oe_builddir, rootfs_dir,
                              native_sysroot, pseudo):
         """
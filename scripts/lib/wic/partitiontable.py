@@ -0,0 +1,253 @@
+# ex:ts=4:sw=4:sts=4:et
+# -*- tab-width: 4; c-basic-offset: 4; indent-tabs-mode: nil -*-
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# DESCRIPTION
+# This module writes MBR (msdos) and GPT partition tables in one pass.
+# It produces the same tables wic used to create by running parted,
+# sgdisk and sfdisk once for every partition and attribute.
+#
+"""Partition table writer."""
+
+import logging
+import struct
+import uuid
+import zlib
+
+from wic import WicError
+
+logger = logging.getLogger('wic')
+
+SECTOR_SIZE = 512
+
+# MBR partition types parted picks for the filesystem types wic uses,
+# with the LBA flag parted sets on new partitions
+MBR_TYPE_EXTENDED = 0x0f
+MBR_TYPE_EXTENDED_LINK = 0x05
+MBR_TYPE_LINUX = 0x83
+MBR_TYPES = {"swap": 0x82,
+             "vfat": 0x0c,
+             "msdos": 0x0e}
+
+MBR_TYPE_GPT_PROTECTIVE = 0xee
+
+# GPT partition type GUIDs parted picks for the filesystem types wic uses
+GPT_TYPE_LINUX = "0FC63DAF-8483-4772-8E79-3D69D8477DE4"
+GPT_TYPES = {"swap": "0657FD6D-A4AB-43C4-84E5-0933C84B4F4F",
+             "vfat": "EBD0A0A2-B9E5-4433-87C0-68B6B72699C7",
+             "msdos": "EBD0A0A2-B9E5-4433-87C0-68B6B72699C7"}
+
+# Name given to GPT partitions by 'parted mkpart primary'
+GPT_DEFAULT_NAME = "primary"
+# Attribute bit set by 'parted set <n> legacy_boot on'
+GPT_ATTR_LEGACY_BOOT = 1 << 2
+
+GPT_ENTRIES = 128
+GPT_ENTRY_SIZE = 128
+GPT_HEADER_SIZE = 92
+GPT_REVISION = 0x00010000
+# Sectors used by the GPT header and partition entries at each end of the disk
+GPT_ENTRY_SECTORS = GPT_ENTRIES * GPT_ENTRY_SIZE // SECTOR_SIZE
+
+# Geometry used for the MBR CHS fields, which nothing reads any more
+CHS_HEADS = 255
+CHS_SECTORS = 63
+
+def _chs(lba):
+    """Encode an LBA as the 3 CHS bytes of an MBR partition entry."""
+    cyl = lba // (CHS_HEADS * CHS_SECTORS)
+    head = (lba // CHS_SECTORS) % CHS_HEADS
+    sect = lba % CHS_SECTORS + 1
+    if cyl > 1023:
+        cyl, head, sect = 1023, CHS_HEADS - 1, CHS_SECTORS
+    return struct.pack("<BBB", head, sect | ((cyl >> 8) << 6), cyl & 0xff)
+
+def _mbr_entry(boot, ptype, start, size, offset=0):
+    """Pack an MBR partition entry. 'offset' is subtracted from 'start'."""
+    return struct.pack("<B3sB3sLL", 0x80 if boot else 0, _chs(start), ptype,
+                       _chs(start + size - 1), start - offset, size)
+
+def _mbr_sector(entries, identifier=0):
+    """Build a boot sector holding up to four partition entries."""
+    sector = bytearray(SECTOR_SIZE)
+    struct.pack_into("<L", sector, 0x1b8, identifier)
+    for i, entry in enumerate(entries):
+        sector[0x1be + i * 16:0x1be + (i + 1) * 16] = entry
+    sector[0x1fe:0x200] = b"\x55\xaa"
+    return bytes(sector)
+
+class PartitionTable():
+    """
+    MBR or GPT partition table of a disk image. Partitions are added with
+    their final number and position, and the whole table is written with
+    write() once they have all been added.
+    """
+
+    def __init__(self, ptable_format, disk_sectors, identifier,
+                 sector_size=SECTOR_SIZE):
+        if ptable_format not in ("msdos", "gpt"):
+            raise WicError("unsupported partition table format: %s" %
+                           ptable_format)
+        if sector_size != SECTOR_SIZE:
+            raise WicError("unsupported sector size: %d" % sector_size)
+        self.ptable_format = ptable_format
+        self.disk_sectors = disk_sectors
+        self.identifier = identifier
+        self.disk_guid = str(uuid.uuid4())
+        self.partitions = {}
+        self.extended = None
+
+    def add_extended(self, start, size):
+        """Add the msdos extended partition holding the logical partitions."""
+        self.extended = (start, size)
+
+    def add_partition(self, num, start, size, fstype=None, system_id=None,
+                      type_guid=None, part_uuid=None, name=None, bootable=False):
+        """
+        Add partition 'num' covering 'size' sectors from sector 'start'.
+        The partition type is derived from 'fstype' unless 'system_id'
+        (msdos) or 'type_guid' (gpt) is given. 'part_uuid' and 'name' are only
+        used for gpt, where 'bootable' sets the legacy BIOS bootable
+        attribute rather than the MBR boot flag.
+        """
+        if num in self.partitions:
+            raise WicError("partition %d added twice" % num)
+        if start < 1 or size < 1 or start + size > self.disk_sectors:
+            raise WicError("partition %d (sectors %d-%d) does not fit on "
+                           "the disk" % (num, start, start + size - 1))
+        self.partitions[num] = {"start": start, "size": size,
+                                "fstype": fstype, "system_id": system_id,
+                                "type_guid": type_guid, "uuid": part_uuid,
+                                "name": name, "bootable": bootable}
+
+    def _msdos_sectors(self):
+        """Return {lba: sector data} for the MBR and the EBR chain."""
+        # Like 'parted set <n> boot on', the boot flag is exclusive and the
+        # partition flagged last keeps it
+        bootable = [num for num, part in self.partitions.items() if part["bootable"]]
+        boot_num = max(bootable) if bootable else None
+
+        sectors = {}
+        primary = []
+        extended = self.extended
+        for num in range(1, 5):
+            part = self.partitions.get(num)
+            if part:
+                primary.append(self._msdos_entry(part, num == boot_num))
+            elif extended:
+                # parted gives the extended partition the first free
+                # primary partition number
+                primary.append(_mbr_entry(False, MBR_TYPE_EXTENDED, *extended))
+                extended = None
+            else:
+                primary.append(bytes(16))
+        if extended:
+            raise WicError("no free primary partition for the extended partition")
+        sectors[0] = _mbr_sector(primary, self.identifier)
+
+        logical = sorted(num for num in self.partitions if num > 4)
+        if logical and not self.extended:
+            raise WicError("logical partitions require an extended partition")
+        if self.extended:
+            ext_start = self.extended[0]
+            for i, num in enumerate(logical):
+                part = self.partitions[num]
+                ebr = ext_start if i == 0 else part["start"] - 1
+                entries = [self._msdos_entry(part, num == boot_num, ebr)]
+                if i + 1 < len(logical):
+                    nxt = self.partitions[logical[i + 1]]
+                    link = nxt["start"] - 1
+                    entries.append(_mbr_entry(False, MBR_TYPE_EXTENDED_LINK,
+                                              link, nxt["start"] + nxt["size"] - link,
+                                              ext_start))
+                sectors[ebr] = _mbr_sector(entries)
+            if not logical:
+                sectors[ext_start] = _mbr_sector([])
+        return sectors
+
+    def _msdos_entry(self, part, boot, offset=0):
+        if part["system_id"]:
+            ptype = int(part["system_id"], 16)
+        else:
+            ptype = MBR_TYPES.get(part["fstype"], MBR_TYPE_LINUX)
+        return _mbr_entry(boot, ptype, part["start"], part["size"], offset)
+
+    def _gpt_entries(self):
+        entries = bytearray(GPT_ENTRIES * GPT_ENTRY_SIZE)
+        for num, part in self.partitions.items():
+            if num > GPT_ENTRIES:
+                raise WicError("too many partitions for gpt: %d" % num)
+            type_guid = part["type_guid"] or \
+                        GPT_TYPES.get(part["fstype"], GPT_TYPE_LINUX)
+            part_guid = part["uuid"] or str(uuid.uuid4())
+            name = (part["name"] or GPT_DEFAULT_NAME).encode("utf-16-le")[:72]
+            attrs = GPT_ATTR_LEGACY_BOOT if part["bootable"] else 0
+            struct.pack_into("<16s16sQQQ72s", entries,
+                             (num - 1) * GPT_ENTRY_SIZE,
+                             uuid.UUID(type_guid).bytes_le,
+                             uuid.UUID(part_guid).bytes_le,
+                             part["start"], part["start"] + part["size"] - 1,
+                             attrs, name)
+        return bytes(entries)
+
+    def _gpt_header(self, my_lba, alt_lba, entries_lba, entries_crc):
+        last_lba = self.disk_sectors - 1
+        fields = [b"EFI PART", GPT_REVISION, GPT_HEADER_SIZE, 0, 0,
+                  my_lba, alt_lba, GPT_ENTRY_SECTORS + 2,
+                  last_lba - GPT_ENTRY_SECTORS - 1,
+                  uuid.UUID(self.disk_guid).bytes_le, entries_lba,
+                  GPT_ENTRIES, GPT_ENTRY_SIZE, entries_crc]
+        fmt = "<8sLLLLQQQQ16sQLLL"
+        fields[3] = zlib.crc32(struct.pack(fmt, *fields))
+        return struct.pack(fmt, *fields).ljust(SECTOR_SIZE, b"\0")
+
+    def _gpt_sectors(self):
+        """Return {lba: data} for the protective MBR and both GPT copies."""
+        last_lba = self.disk_sectors - 1
+        if last_lba < 2 * GPT_ENTRY_SECTORS + 2:
+            raise WicError("disk too small for gpt: %d sectors" %
+                           self.disk_sectors)
+        for num, part in self.partitions.items():
+            if part["start"] < GPT_ENTRY_SECTORS + 2 or \
+               part["start"] + part["size"] > last_lba - GPT_ENTRY_SECTORS:
+                raise WicError("partition %d is outside of the gpt usable "
+                               "area" % num)
+
+        # Protective MBR, as written by 'parted mklabel gpt'
+        pmbr = struct.pack("<BBBBBBBBLL", 0, 0, 2, 0, MBR_TYPE_GPT_PROTECTIVE,
+                           0xff, 0xff, 0xff, 1, min(last_lba, 0xffffffff))
+        entries = self._gpt_entries()
+        crc = zlib.crc32(entries)
+        backup_entries_lba = last_lba - GPT_ENTRY_SECTORS
+        return {0: _mbr_sector([pmbr], self.identifier),
+                1: self._gpt_header(1, last_lba, 2, crc) + entries,
+                backup_entries_lba: entries + \
+                    self._gpt_header(last_lba, 1, backup_entries_lba, crc)}
+
+    def sectors(self):
+        """Return the table as a {lba: data} dict of what to write where."""
+        if self.ptable_format == "msdos":
+            return self._msdos_sectors()
+        return self._gpt_sectors()
+
+    def write(self, path):
+        """Write the partition table to the image file 'path'."""
+        sectors = self.sectors()
+        logger.debug("Writing %s partition table with %d partitions to %s",
+                     self.ptable_format, len(self.partitions), path)
+        with open(path, 'r+b') as img:
+            for lba in sorted(sectors):
+                img.seek(lba * SECTOR_SIZE)
+                img.write(sectors[lba])
@@ -31,12 +31,15 @@ import shutil
 import tempfile
 import uuid
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from time import strftime
 
 from oe.path import copyhardlinktree
 
 from wic import WicError
 from wic.filemap import sparse_copy
+from wic.partitiontable import PartitionTable
 from wic.ksparser import KickStart, KickStartError
 from wic.pluginbase import PluginMgr, ImagerPlugin
 from wic.misc import get_bitbake_var, exec_cmd, exec_native_cmd
@@ -73,6 +76,7 @@ class DirectPlugin(ImagerPlugin):
         self.compressor = options.compressor
         self.bmap = options.bmap
         self.no_fstab_update = options.no_fstab_update
+        self.jobs = getattr(options, 'jobs', None) or os.cpu_count() or 1
 
         self.name = "%s-%s" % (os.path.splitext(os.path.basename(wks_file))[0],
                                strftime("%Y%m%d%H%M"))
@@ -81,6 +85,12 @@ class DirectPlugin(ImagerPlugin):
         self.ptable_format = self.ks.bootloader.ptable
         self.parts = self.ks.partitions
 
+        # ext filesystems of rootfs partitions can be created in place in
+        # the image once the partition table is written
+        if getattr(options, 'direct_write', False):
+            for part in self.parts:
+                part.direct_write = part.source == "rootfs"
+
         # as a convenience, set source to the boot partition source
         # instead of forcing it to be set via bootloader --source
         for part in self.parts:
@@ -90,7 +100,8 @@ class DirectPlugin(ImagerPlugin):
 
         image_path = self._full_path(self.workdir, self.parts[0].disk, "direct")
         self._image = PartitionedImage(image_path, self.ptable_format,
-                                       self.parts, self.native_sysroot)
+                                       self.parts, self.native_sysroot,
+                                       self.jobs)
 
     def do_create(self):
         """
@@ -303,6 +314,23 @@ class DirectPlugin(ImagerPlugin):
         # remove work directory
         shutil.rmtree(self.workdir, ignore_errors=True)
 
+def run_parallel(func, items, jobs):
+    """
+    Call func for each of items using up to jobs threads and return the
+    results in the order of items. If any call fails, the exception of the
+    first failing item is raised once all calls have finished.
+    """
+    items = list(items)
+    if jobs <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(jobs, len(items))) as executor:
+        futures = [executor.submit(func, item) for item in items]
+    return [future.result() for future in futures]
+
+# Source plugins whose files in the work directory are named after the
+# partition, so that several partitions using them can be prepared at once
+PARALLEL_SOURCES = (None, "rootfs", "rawcopy")
+
 # Overhead of the MBR partitioning scheme (just one sector)
 MBR_OVERHEAD = 1
 
@@ -317,7 +345,8 @@ class PartitionedImage():
     Partitioned image in a file.
     """
 
-    def __init__(self, path, ptable_format, partitions, native_sysroot=None):
+    def __init__(self, path, ptable_format, partitions, native_sysroot=None,
+                 jobs=1):
         self.path = path  # Path to the image file
         self.numpart = 0  # Number of allocated partitions
         self.realpart = 0 # Number of partitions in the partition table
@@ -333,6 +362,7 @@ class PartitionedImage():
         # Size of a sector used in calculations
         self.sector_size = SECTOR_SIZE
         self.native_sysroot = native_sysroot
+        self.jobs = jobs  # Number of partitions to process concurrently
 
         # calculate the real partition number, accounting for partitions not
         # in the partition table and logical partitions
@@ -362,15 +392,32 @@ class PartitionedImage():
 
     def prepare(self, imager):
         """Prepare an image. Call prepare method of all image partitions."""
+        def prepare_parts(parts):
+            for part in parts:
+                # need to create the filesystems in order to get their
+                # sizes before we can add them and do the layout.
+                part.prepare(imager, imager.workdir, imager.oe_builddir,
+                             imager.rootfs_dir, imager.bootimg_dir,
+                             imager.kernel_dir, imager.native_sysroot)
+
+                # Converting kB to sectors for parted
+                part.size_sec = part.disk_size * 1024 // self.sector_size
+
+        # Partitions are independent until they are laid out, so prepare
+        # them concurrently. Plugins other than PARALLEL_SOURCES may share
+        # files between partitions (e.g. hdd/boot), as do swap partitions,
+        # so partitions using the same one of those are prepared in turn.
+        groups = OrderedDict()
         for part in self.partitions:
-            # need to create the filesystems in order to get their
-            # sizes before we can add them and do the layout.
-            part.prepare(imager, imager.workdir, imager.oe_builddir,
-                         imager.rootfs_dir, imager.bootimg_dir,
-                         imager.kernel_dir, imager.native_sysroot)
+            if part.source in PARALLEL_SOURCES and part.fstype != "swap":
+                key = id(part)
+            else:
+                key = (part.source, part.fstype if not part.source else None)
+            groups.setdefault(key, []).append(part)
 
-            # Converting kB to sectors for parted
-            part.size_sec = part.disk_size * 1024 // self.sector_size
+        # Load the source plugins before starting any threads
+        PluginMgr.get_plugins('source')
+        run_parallel(prepare_parts, groups.values(), self.jobs)
 
     def layout_partitions(self):
         """ Layout the partitions, meaning calculate the position of every
@@ -469,34 +516,21 @@ class PartitionedImage():
 
         self.min_size *= self.sector_size
 
-    def _create_partition(self, device, parttype, fstype, start, size):
-        """ Create a partition on an image described by the 'device' object. """
-
-        # Start is included to the size so we need to substract one from the end.
-        end = start + size - 1
-        logger.debug("Added '%s' partition, sectors %d-%d, size %d sectors",
-                     parttype, start, end, size)
-
-        cmd = "parted -s %s unit s mkpart %s" % (device, parttype)
-        if fstype:
-            cmd += " %s" % fstype
-        cmd += " %d %d" % (start, end)
-
-        return exec_native_cmd(cmd, self.native_sysroot)
-
     def create(self):
         logger.debug("Creating sparse file %s", self.path)
         with open(self.path, 'w') as sparse:
             os.ftruncate(sparse.fileno(), self.min_size)
 
-        logger.debug("Initializing partition table for %s", self.path)
-        exec_native_cmd("parted -s %s mklabel %s" %
-                        (self.path, self.ptable_format), self.native_sysroot)
+        logger.debug("Initializing %s partition table for %s, disk "
+                     "identifier %x", self.ptable_format, self.path,
+                     self.identifier)
+        table = PartitionTable(self.ptable_format,
+                               self.min_size // self.sector_size,
+                               self.identifier, self.sector_size)
 
-        logger.debug("Set disk identifier %x", self.identifier)
-        with open(self.path, 'r+b') as img:
-            img.seek(0x1B8)
-            img.write(self.identifier.to_bytes(4, 'little'))
+        # Settings the table writer doesn't interpret are applied afterwards
+        # with the tools wic used to run for every partition
+        cmds = []
 
         logger.debug("Creating partitions")
 
@@ -516,21 +550,14 @@ class PartitionedImage():
                 # starts a sector before the first logical partition,
                 # add a sector at the back, so that there is enough
                 # room for all logical partitions.
-                self._create_partition(self.path, "extended",
-                                       None, part.start - 1,
-                                       self.offset - part.start + 1)
-
-            if part.fstype == "swap":
-                parted_fs_type = "linux-swap"
-            elif part.fstype == "vfat":
-                parted_fs_type = "fat32"
-            elif part.fstype == "msdos":
-                parted_fs_type = "fat16"
-                if not part.system_id:
-                    part.system_id = '0x6' # FAT16
-            else:
-                # Type for ext2/ext3/ext4/btrfs
-                parted_fs_type = "ext2"
+                logger.debug("Added 'extended' partition, sectors %d-%d, "
+                             "size %d sectors", part.start - 1,
+                             self.offset - 1, self.offset - part.start + 1)
+                table.add_extended(part.start - 1,
+                                   self.offset - part.start + 1)
+
+            if part.fstype == "msdos" and not part.system_id:
+                part.system_id = '0x6' # FAT16
 
             # Boot ROM of OMAP boards require vfat boot partition to have an
             # even number of sectors.
@@ -541,48 +568,44 @@ class PartitionedImage():
                              part.mountpoint)
                 part.size_sec -= 1
 
-            self._create_partition(self.path, part.type,
-                                   parted_fs_type, part.start, part.size_sec)
-
-            if part.part_name:
-                logger.debug("partition %d: set name to %s",
-                             part.num, part.part_name)
-                exec_native_cmd("sgdisk --change-name=%d:%s %s" % \
-                                         (part.num, part.part_name,
-                                          self.path), self.native_sysroot)
-
-            if part.part_type:
-                logger.debug("partition %d: set type UID to %s",
-                             part.num, part.part_type)
-                exec_native_cmd("sgdisk --typecode=%d:%s %s" % \
-                                         (part.num, part.part_type,
-                                          self.path), self.native_sysroot)
-
-            if part.uuid and self.ptable_format == "gpt":
-                logger.debug("partition %d: set UUID to %s",
-                             part.num, part.uuid)
-                exec_native_cmd("sgdisk --partition-guid=%d:%s %s" % \
-                                (part.num, part.uuid, self.path),
-                                self.native_sysroot)
-
-            if part.label and self.ptable_format == "gpt":
-                logger.debug("partition %d: set name to %s",
-                             part.num, part.label)
-                exec_native_cmd("parted -s %s name %d %s" % \
-                                (self.path, part.num, part.label),
-                                self.native_sysroot)
+            logger.debug("Added '%s' partition, sectors %d-%d, size %d sectors",
+                         part.type, part.start, part.start + part.size_sec - 1,
+                         part.size_sec)
+
+            system_id = None
+            type_guid = None
+            if self.ptable_format == "msdos":
+                system_id = part.system_id
+            else:
+                if part.part_type:
+                    logger.debug("partition %d: set type UID to %s",
+                                 part.num, part.part_type)
+                    try:
+                        type_guid = str(uuid.UUID(part.part_type))
+                    except ValueError:
+                        # sgdisk also accepts its own short type codes
+                        cmds.append("sgdisk --typecode=%d:%s %s" % \
+                                    (part.num, part.part_type, self.path))
+                if part.system_id:
+                    cmds.append("sfdisk --part-type %s %s %s" % \
+                                (self.path, part.num, part.system_id))
 
             if part.active:
-                flag_name = "legacy_boot" if self.ptable_format == 'gpt' else "boot"
                 logger.debug("Set '%s' flag for partition '%s' on disk '%s'",
-                             flag_name, part.num, self.path)
-                exec_native_cmd("parted -s %s set %d %s on" % \
-                                (self.path, part.num, flag_name),
-                                self.native_sysroot)
-            if part.system_id:
-                exec_native_cmd("sfdisk --part-type %s %s %s" % \
-                                (self.path, part.num, part.system_id),
-                                self.native_sysroot)
+                             "legacy_boot" if self.ptable_format == 'gpt' \
+                             else "boot", part.num, self.path)
+
+            table.add_partition(part.num, part.start, part.size_sec,
+                                fstype=part.fstype, system_id=system_id,
+                                type_guid=type_guid,
+                                part_uuid=part.uuid or None,
+                                name=part.label or part.part_name or None,
+                                bootable=part.active)
+
+        table.write(self.path)
+
+        for cmd in cmds:
+            exec_native_cmd(cmd, self.native_sysroot)
 
     def cleanup(self):
         # remove partition images
@@ -592,16 +615,39 @@ class PartitionedImage():
     def assemble(self):
         logger.debug("Installing partitions")
 
-        for part in self.partitions:
-            source = part.source_file
-            if source:
+        parts = [part for part in self.partitions
+                 if part.source_file or part.deferred_rootfs]
+
+        # Partitions are written at fixed, non-overlapping offsets so they can
+        # be copied concurrently, unless a partition image is larger than its
+        # partition. Then the order of writes matters and is kept serial.
+        jobs = self.jobs
+        for part in parts:
+            if part.source_file and \
+               os.path.getsize(part.source_file) > part.size_sec * self.sector_size:
+                logger.debug("%s is larger than partition %d, installing "
+                             "partitions serially", part.source_file, part.num)
+                jobs = 1
+                break
+
+        def install(part):
+            if part.deferred_rootfs:
+                # create the filesystem in place
+                part.write_rootfs(self.path, part.start * self.sector_size)
+                source = part.deferred_rootfs[0]
+            else:
+                source = part.source_file
                 # install source_file contents into a partition
                 sparse_copy(source, self.path, seek=part.start * self.sector_size)
 
-                logger.debug("Installed %s in partition %d, sectors %d-%d, "
-                             "size %d sectors", source, part.num, part.start,
-                             part.start + part.size_sec - 1, part.size_sec)
+            logger.debug("Installed %s in partition %d, sectors %d-%d, "
+                         "size %d sectors", source, part.num, part.start,
+                         part.start + part.size_sec - 1, part.size_sec)
+
+        run_parallel(install, parts, jobs)
 
-                partimage = self.path + '.p%d' % part.num
-                os.rename(source, partimage)
-                self.partimages.append(partimage)
+        parts = [part for part in parts if part.source_file]
+        for part in parts:
+            partimage = self.path + '.p%d' % part.num
+            os.rename(part.source_file, partimage)
+            self.partimages.append(partimage)